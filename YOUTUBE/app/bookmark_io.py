@@ -0,0 +1,244 @@
+from datetime import datetime, timezone
+from html import escape
+from html.parser import HTMLParser
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import codecs
+import json
+import re
+
+from pydantic import ValidationError
+
+from app.responses import dumps
+
+# orjson is optional; without it import lines are decoded with the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# A parsed import record: its line number, the record, or the reason it could not be read
+ImportRecord = Tuple[int, Optional[dict], Optional[str]]
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAM_RE = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid)$", re.IGNORECASE)
+
+EXPORT_FIELDS = ("id", "title", "url", "description", "tags", "created_at")
+
+NETSCAPE_HEADER = (
+    "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+    '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+    "<TITLE>Bookmarks</TITLE>\n"
+    "<H1>Bookmarks</H1>\n"
+    "<DL><p>\n"
+)
+NETSCAPE_FOOTER = "</DL><p>\n"
+
+def normalize_url(url: str) -> str:
+    """
+    Key used to detect duplicate bookmarks: scheme and host lowercased,
+    default port, fragment, trailing slash and tracking parameters dropped,
+    remaining query parameters sorted
+    """
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    scheme = scheme.lower()
+    host = netloc.rpartition("@")[2].lower()
+    default_port = DEFAULT_PORTS.get(scheme)
+    if default_port and host.endswith(f":{default_port}"):
+        host = host[:-len(str(default_port)) - 1]
+    if query:
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not TRACKING_PARAM_RE.match(k)
+        ))
+    return urlunsplit((scheme, host, path.rstrip("/"), query, ""))
+
+def parse_created_at(value) -> Optional[datetime]:
+    """
+    Read an import timestamp: Unix seconds (Netscape ADD_DATE) or ISO 8601,
+    returned as naive UTC like the stored dates; anything else is ignored
+    """
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            return datetime.fromtimestamp(int(value), tz=timezone.utc).replace(tzinfo=None)
+        parsed = datetime.fromisoformat(str(value))
+    except (ValueError, OverflowError, OSError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'record'}: {e['msg']}" for e in error.errors())
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Decode a streamed NDJSON body one line at a time
+    """
+    buffer = b""
+    line_no = 0
+
+    def decode(line: bytes) -> ImportRecord:
+        try:
+            record = orjson.loads(line) if orjson is not None else json.loads(line)
+        except ValueError as e:
+            return line_no, None, f"Invalid JSON: {e}"
+        if not isinstance(record, dict):
+            return line_no, None, "Expected a JSON object"
+        return line_no, record, None
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield decode(line)
+    if buffer.strip():
+        line_no += 1
+        yield decode(buffer)
+
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    Incremental parser for the Netscape bookmark file format exported by
+    browsers and bookmarking services. Each <A> becomes a record; its TAGS
+    attribute and the names of the folders around it become its tags, and a
+    following <DD> its description. Records are collected in `records` once
+    nothing more can be added to them.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records: List[ImportRecord] = []
+        self.folders: List[Optional[str]] = []
+        self.folder_title: Optional[str] = None
+        self.in_folder_title = False
+        self.anchor: Optional[dict] = None
+        self.anchor_line = 0
+        # Last record read, kept open while its <DD> description may follow
+        self.last: Optional[Tuple[int, dict]] = None
+        self.description: Optional[List[str]] = None
+
+    def _close_last(self):
+        if self.last is not None:
+            line_no, record = self.last
+            if self.description:
+                record["description"] = " ".join("".join(self.description).split())[:500] or None
+            self.records.append((line_no, record, None))
+        self.last = None
+        self.description = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("dt", "h3", "dl", "a"):
+            self._close_last()
+        if tag == "a":
+            attrs = dict(attrs)
+            tags = [t.strip() for t in (attrs.get("tags") or "").split(",") if t.strip()]
+            tags += [f for f in self.folders if f and f not in tags]
+            self.anchor = {
+                "url": (attrs.get("href") or "").strip(),
+                "title": "",
+                "tags": tags,
+                "created_at": attrs.get("add_date")
+            }
+            self.anchor_line = self.getpos()[0]
+        elif tag == "h3":
+            self.in_folder_title = True
+            self.folder_title = ""
+        elif tag == "dl":
+            self.folders.append((self.folder_title or "").strip() or None)
+            self.folder_title = None
+        elif tag == "dd" and self.last is not None:
+            self.description = []
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self.anchor is not None:
+            record = self.anchor
+            title = " ".join(record["title"].split())
+            record["title"] = (title or record["url"])[:200]
+            self.last = (self.anchor_line, record)
+            self.anchor = None
+        elif tag == "h3":
+            self.in_folder_title = False
+        elif tag == "dl":
+            self._close_last()
+            if self.folders:
+                self.folders.pop()
+
+    def handle_data(self, data):
+        if self.anchor is not None:
+            self.anchor["title"] += data
+        elif self.in_folder_title:
+            self.folder_title += data
+        elif self.description is not None:
+            self.description.append(data)
+
+    def close(self):
+        super().close()
+        self._close_last()
+
+async def netscape_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Parse a streamed Netscape bookmark file, yielding records as they complete
+    """
+    parser = NetscapeBookmarkParser()
+    # Decodes UTF-8 sequences split between two chunks
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        for record in parser.records:
+            yield record
+        parser.records.clear()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    for record in parser.records:
+        yield record
+
+def detect_format(content_type: Optional[str], first_chunk: bytes) -> str:
+    """
+    Pick the import format from the Content-Type, or from the first bytes of the body
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "text/html":
+        return "html"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/json"):
+        return "ndjson"
+    return "html" if first_chunk.lstrip().startswith(b"<") else "ndjson"
+
+async def bookmark_records(
+    chunks: AsyncIterator[bytes],
+    fmt: Optional[str] = None,
+    content_type: Optional[str] = None
+) -> AsyncIterator[ImportRecord]:
+    """
+    Read import records from a streamed NDJSON or Netscape HTML body
+    """
+    first = b""
+    async for chunk in chunks:
+        if chunk:
+            first = chunk
+            break
+
+    async def body():
+        if first:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+
+    parse = netscape_records if (fmt or detect_format(content_type, first)) == "html" else ndjson_records
+    async for record in parse(body()):
+        yield record
+
+def ndjson_line(document: dict) -> bytes:
+    return dumps({f: document.get("_id" if f == "id" else f) for f in EXPORT_FIELDS}) + b"\n"
+
+def netscape_entry(document: dict) -> str:
+    created_at = document.get("created_at")
+    add_date = f' ADD_DATE="{int(created_at.replace(tzinfo=timezone.utc).timestamp())}"' if created_at else ""
+    tags = document.get("tags") or []
+    tag_attr = f' TAGS="{escape(",".join(tags))}"' if tags else ""
+    entry = f'<DT><A HREF="{escape(document.get("url") or "")}"{add_date}{tag_attr}>{escape(document.get("title") or "")}</A>\n'
+    if document.get("description"):
+        entry += f"<DD>{escape(document['description'])}\n"
+    return entry
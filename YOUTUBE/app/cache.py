@@ -0,0 +1,209 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import json
+import logging
+import os
+import time
+
+from odmantic import query
+
+from app.db import db
+from app.metrics import SUMMARY_CACHE_ENTRIES
+from app.schema import SummaryCacheEntry, SUMMARY_CACHE_DB_TTL
+from app.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# In-process and shared layer settings; the persisted layer expires after
+# SUMMARY_CACHE_DB_TTL and is pruned of other prompt versions on startup
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "1024"))
+SUMMARY_CACHE_TTL = float(os.environ.get("SUMMARY_CACHE_TTL", "3600"))
+# How long a summary found in the in-process layer is trusted before the
+# shared layer is asked again; only used when several workers share state,
+# and bounds how long an invalidation in one worker goes unseen by the others
+SUMMARY_CACHE_LOCAL_TTL = float(os.environ.get("SUMMARY_CACHE_LOCAL_TTL", "5"))
+
+class SummaryCache:
+    """
+    Layered summary cache: an in-process LRU with TTL in front of the
+    SummaryCacheEntry collection in db.engine. When several workers share
+    state, the shared store sits between the two and the in-process layer
+    only keeps entries for a few seconds.
+    """
+
+    def __init__(self, maxsize: int = SUMMARY_CACHE_SIZE, ttl: float = SUMMARY_CACHE_TTL, state: Optional[SharedState] = None):
+        self.state = state or shared_state
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local_ttl = min(ttl, SUMMARY_CACHE_LOCAL_TTL) if self.state.distributed else ttl
+        self._entries: "OrderedDict[str, tuple[float, str, Optional[str]]]" = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _get_local(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, summary, model = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return summary, model
+
+    def _set_local(self, key: str, summary: str, model: Optional[str]):
+        self._entries[key] = (time.monotonic() + self.local_ttl, summary, model)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_shared(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Look up a summary in the shared layer only
+        """
+        if not self.state.distributed:
+            return None
+        try:
+            value = await self.state.get(f"summary:{key}")
+        except Exception as e:
+            logger.error("Error reading shared summary cache: %s", e)
+            return None
+        if value is None:
+            return None
+        summary, model = json.loads(value)
+        return summary, model
+
+    async def get(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Look up a summary and the model that wrote it, checking memory first,
+        then the shared store and then the database
+        """
+        cached = self._get_local(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        cached = await self.get_shared(key)
+        if cached is not None:
+            self.shared_hits += 1
+            self._set_local(key, *cached)
+            return cached
+
+        try:
+            entry = await db.engine.find_one(SummaryCacheEntry, SummaryCacheEntry.key == key)
+        except Exception as e:
+            logger.error("Error reading summary cache: %s", e)
+            entry = None
+
+        if entry is not None and self._expired(entry):
+            await self._remove_expired(entry)
+            entry = None
+
+        if entry is not None:
+            self.db_hits += 1
+            self._set_local(key, entry.summary, entry.model)
+            await self._set_shared(key, entry.summary, entry.model)
+            return entry.summary, entry.model
+
+        self.misses += 1
+        return None
+
+    def _expired(self, entry: SummaryCacheEntry) -> bool:
+        # MongoDB's TTL monitor only runs every minute, and the mock database has none
+        return bool(SUMMARY_CACHE_DB_TTL) and entry.created_at < datetime.utcnow() - timedelta(seconds=SUMMARY_CACHE_DB_TTL)
+
+    async def _remove_expired(self, entry: SummaryCacheEntry):
+        try:
+            await db.engine.remove(SummaryCacheEntry, SummaryCacheEntry.key == entry.key)
+        except Exception as e:
+            logger.error("Error removing expired summary cache entry: %s", e)
+
+    async def _set_shared(self, key: str, summary: str, model: Optional[str]):
+        if not self.state.distributed:
+            return
+        try:
+            await self.state.set(f"summary:{key}", json.dumps([summary, model]), self.ttl)
+        except Exception as e:
+            logger.error("Error writing shared summary cache: %s", e)
+
+    async def set(self, key: str, video_id: str, summary: str, prompt_version: str, model: str):
+        """
+        Store a summary in every cache layer
+        """
+        self._set_local(key, summary, model)
+        await self._set_shared(key, summary, model)
+        try:
+            await db.engine.save(SummaryCacheEntry(
+                key=key,
+                video_id=video_id,
+                summary=summary,
+                prompt_version=prompt_version,
+                model=model,
+                created_at=datetime.utcnow()
+            ))
+        except Exception as e:
+            logger.error("Error writing summary cache: %s", e)
+
+    async def invalidate(self, video_id: Optional[str] = None) -> int:
+        """
+        Drop cached summaries for one video, or everything when no video is given
+        """
+        if video_id is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            keys = [k for k in self._entries if k.split(":", 1)[0] == video_id]
+            for k in keys:
+                del self._entries[k]
+            dropped = len(keys)
+
+        if self.state.distributed:
+            try:
+                prefix = "summary:" if video_id is None else f"summary:{video_id}:"
+                dropped = max(dropped, await self.state.delete_prefix(prefix))
+            except Exception as e:
+                logger.error("Error invalidating shared summary cache: %s", e)
+
+        try:
+            if video_id is None:
+                dropped = max(dropped, await db.engine.remove(SummaryCacheEntry))
+            else:
+                dropped = max(dropped, await db.engine.remove(
+                    SummaryCacheEntry, SummaryCacheEntry.video_id == video_id
+                ))
+        except Exception as e:
+            logger.error("Error invalidating summary cache: %s", e)
+        return dropped
+
+    async def prune(self, prompt_version: str) -> int:
+        """
+        Delete persisted entries written under another prompt version, which
+        no key can reach any more, and entries past SUMMARY_CACHE_DB_TTL
+        """
+        stale = [SummaryCacheEntry.prompt_version != prompt_version]
+        if SUMMARY_CACHE_DB_TTL:
+            stale.append(SummaryCacheEntry.created_at < datetime.utcnow() - timedelta(seconds=SUMMARY_CACHE_DB_TTL))
+        try:
+            removed = await db.engine.remove(SummaryCacheEntry, query.or_(*stale))
+        except Exception as e:
+            logger.error("Error pruning summary cache: %s", e)
+            return 0
+        if removed:
+            logger.info("Pruned %d stale summary cache entries", removed)
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses
+        }
+
+summary_cache = SummaryCache()
+SUMMARY_CACHE_ENTRIES.set_function(lambda: len(summary_cache._entries))
@@ -0,0 +1,102 @@
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+
+from app.chunking import count_tokens, SUMMARY_CHUNK_TOKENS
+
+# Length of a chapter window; windows are aligned to multiples of it, so a
+# change in one part of a transcript leaves the other windows untouched
+CHAPTER_WINDOW_SECONDS = float(os.environ.get("CHAPTER_WINDOW_SECONDS", "300"))
+CHAPTER_SUMMARY_WORDS = int(os.environ.get("CHAPTER_SUMMARY_WORDS", "60"))
+CHAPTER_MAX_TOKENS = int(os.environ.get("CHAPTER_MAX_TOKENS", "200"))
+
+TITLE_PREFIX_RE = re.compile(r"^(?:#+\s*|\*\*|title\s*:\s*|chapter\s*(?:title)?\s*:\s*)+", re.IGNORECASE)
+SUMMARY_PREFIX_RE = re.compile(r"^summary\s*:\s*", re.IGNORECASE)
+
+def format_timestamp(seconds: Optional[float]) -> str:
+    """
+    Format seconds as m:ss or h:mm:ss, like YouTube chapter markers
+    """
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def window_hash(timed_texts: List[Tuple[Optional[float], str]]) -> str:
+    """
+    Fingerprint of a window's segments and their timing
+    """
+    return hashlib.sha1(json.dumps(timed_texts, separators=(",", ":")).encode()).hexdigest()[:16]
+
+def window_segments(
+    segments: List[dict],
+    seconds: float = CHAPTER_WINDOW_SECONDS,
+    max_tokens: int = SUMMARY_CHUNK_TOKENS
+) -> List[dict]:
+    """
+    Group timed transcript segments into chapter windows of `seconds`, split
+    further if a window would exceed max_tokens. Segments without timing only
+    split on tokens. Each window has its start, end, text and hash.
+    """
+    windows = []
+    current = None
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        start = segment.get("start")
+        slot = int(start // seconds) if start is not None else None
+        tokens = count_tokens(text) + 1
+        if (
+            current is None
+            or (slot is not None and slot != current["slot"])
+            or current["tokens"] + tokens > max_tokens
+        ):
+            current = {"slot": slot, "start": start, "end": start, "texts": [], "timed": [], "tokens": 0}
+            windows.append(current)
+        current["texts"].append(text)
+        current["timed"].append((round(start, 2) if start is not None else None, text))
+        current["tokens"] += tokens
+        if start is not None:
+            current["end"] = start + float(segment.get("duration") or 0)
+
+    return [
+        {
+            "start": w["start"],
+            "end": w["end"],
+            "text": " ".join(w["texts"]),
+            "tokens": w["tokens"],
+            "hash": window_hash(w["timed"])
+        }
+        for w in windows
+    ]
+
+def chapter_messages(window: dict) -> list:
+    """
+    Build the chat messages asking for the title and summary of one window
+    """
+    span = f"{format_timestamp(window['start'])} to {format_timestamp(window['end'])}"
+    return [
+        {"role": "system", "content": "You are a helpful assistant that summarizes YouTube video transcripts."},
+        {"role": "user", "content": (
+            f"The following is the part of a YouTube video transcript from {span}. "
+            f"Write a short chapter title on the first line, then summarize this part in about {CHAPTER_SUMMARY_WORDS} words:\n\n"
+            f"{window['text']}"
+        )}
+    ]
+
+def parse_chapter(text: str, start: Optional[float]) -> Tuple[str, str]:
+    """
+    Split an LLM answer into a title and a summary; an answer without a
+    separate title line is titled by its start time
+    """
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return f"Chapter at {format_timestamp(start)}", text.strip()
+    title = TITLE_PREFIX_RE.sub("", lines[0]).strip("*\"' ")
+    summary = SUMMARY_PREFIX_RE.sub("", " ".join(lines[1:]))
+    return title or f"Chapter at {format_timestamp(start)}", summary
@@ -0,0 +1,94 @@
+from functools import lru_cache
+from typing import List
+import os
+
+# Local tokenizer used for token counts; tiktoken is optional and the
+# character-based estimate is used when it (or its encoding data) is missing
+TOKENIZER_ENCODING = os.environ.get("TOKENIZER_ENCODING", "cl100k_base")
+
+# Transcripts longer than this are summarized chunk by chunk
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "3000"))
+# Maximum number of chunk summaries requested from the LLM at once
+SUMMARY_CHUNK_CONCURRENCY = int(os.environ.get("SUMMARY_CHUNK_CONCURRENCY", "4"))
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English text (about four characters per token)
+    """
+    return (len(text) + 3) // 4
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """
+    Load the tiktoken encoding once, or return None when it is unavailable
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+def tokenizer_name() -> str:
+    return TOKENIZER_ENCODING if get_tokenizer() is not None else "estimate"
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with the local tokenizer, falling back to estimate_tokens
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a single oversized piece of text on word boundaries
+    """
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(word) + 1
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def chunk_segments(segments: List[dict], max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Group transcript segments into chunks of at most max_tokens, keeping
+    segments whole unless a single segment is larger than a chunk
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        text_tokens = count_tokens(text) + 1
+
+        if text_tokens > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            chunks.extend(split_text(text, max_tokens))
+            continue
+
+        if current and current_tokens + text_tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += text_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
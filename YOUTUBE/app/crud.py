@@ -1,15 +1,87 @@
-from app.schema import Note, NoteCreate, YouTubeSummary, YouTubeSummaryCreate, Bookmark, BookmarkCreate
-from app.db import db, fix_mongo_ids
+from app.schema import Note, NoteCreate, YouTubeSummary, SummaryChapter, YouTubeSummaryCreate, YouTubeSummaryBatchCreate, Bookmark, BookmarkCreate, SummaryJob
+from app.db import db, fix_mongo_ids, bulk_save, find_documents, insert_documents, iter_documents, BulkSaveError, MockEngine
+from app.bookmark_io import (
+    bookmark_records, normalize_url, parse_created_at, validation_message,
+    ndjson_line, netscape_entry, EXPORT_FIELDS, NETSCAPE_HEADER, NETSCAPE_FOOTER
+)
+from app.shared_state import shared_state
+from app.search import SEARCH_FIELDS, make_snippet, field_text
+from app.cache import summary_cache
+from app.singleflight import summary_flights
+from app.http_cache import collection_versions
+from app.related import related_summaries
+from app.http_client import post_with_retries, stream_with_retries, get_http_client
+from odmantic import query
+from app.transcripts import get_transcript_segments
+from app.chunking import chunk_segments, count_tokens, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_CONCURRENCY
+from app.chapters import window_segments, chapter_messages, parse_chapter, CHAPTER_MAX_TOKENS
+from app.preprocess import prepare_transcript, record_prompt_report, prompt_totals
+from app.llm_limits import get_llm_guards, llm_guard_stats, LLMUnavailable
+from app.llm_routing import ModelProfile, MODEL_PROFILES, ROUTING_VERSION, DETAIL_LEVELS, DEFAULT_DETAIL, route, acceptable_summary
+from app.metrics import SUMMARY_STAGE_SECONDS, OPENAI_REQUESTS, OPENAI_REQUEST_SECONDS, record_openai_usage
+import asyncio
+from datetime import datetime
+import json
+import logging
+import re
+import time
 import uuid
-import httpx
 import os
-from typing import Optional, List
-from youtube_transcript_api import YouTubeTranscriptApi
+import hashlib
+from typing import AsyncIterator, Optional, List, Tuple
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import DuplicateKeyError
 
-# Centralized OpenAI API configuration
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+logger = logging.getLogger(__name__)
+
+# Page sizes for list endpoints
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "500"))
+
+SUMMARY_FIELDS = ("id", "url", "summary", "model")
+BOOKMARK_FIELDS = ("id", "title", "url", "description", "tags", "created_at")
+
+# Maximum number of videos summarized at once by the batch endpoint
+BATCH_SUMMARY_CONCURRENCY = int(os.environ.get("BATCH_SUMMARY_CONCURRENCY", "8"))
+BATCH_SUMMARY_MAX_VIDEOS = int(os.environ.get("BATCH_SUMMARY_MAX_VIDEOS", "500"))
+
+# Bookmarks validated and written per insert_many by the import endpoint, and
+# documents encoded per chunk by the export endpoint
+BOOKMARK_IMPORT_BATCH = int(os.environ.get("BOOKMARK_IMPORT_BATCH", "1000"))
+BOOKMARK_EXPORT_BATCH = int(os.environ.get("BOOKMARK_EXPORT_BATCH", "1000"))
+# Invalid import records reported with their line number; the rest are only counted
+BOOKMARK_IMPORT_MAX_ERRORS = int(os.environ.get("BOOKMARK_IMPORT_MAX_ERRORS", "100"))
+# Imports run one at a time, in any worker, so duplicates can't slip in between
+# two of them; the lease frees itself after this long if a worker dies
+BOOKMARK_IMPORT_LEASE_SECONDS = float(os.environ.get("BOOKMARK_IMPORT_LEASE_SECONDS", "600"))
+
+YOUTUBE_PLAYLIST_URL = "https://www.youtube.com/playlist"
+
+# Bump whenever the prompt in generate_summary_with_llm changes so that
+# cached summaries produced by the old prompt are no longer served
+SUMMARY_PROMPT_VERSION = "3"
+# Bump when the chapter prompt changes; stored chapters of another version are recomputed
+CHAPTER_PROMPT_VERSION = "1"
+
+class SummaryGenerationError(Exception):
+    """
+    The LLM did not produce a summary; nothing is cached or saved
+    """
+
+class EmptyTranscript(Exception):
+    """
+    Nothing is left of the transcript to summarize once it has been cleaned
+    """
+
+class BookmarkImportInProgress(Exception):
+    """
+    Another bookmark import holds the import lease
+    """
+
+# Completion token limit for partial (per-chunk) summaries; full summaries
+# take theirs from the requested detail level
+SUMMARY_CHUNK_MAX_TOKENS = int(os.environ.get("SUMMARY_CHUNK_MAX_TOKENS", "300"))
 
 async def create_note(note_data: NoteCreate) -> Note:
     """
@@ -18,141 +90,887 @@ async def create_note(note_data: NoteCreate) -> Note:
     note = Note(content=note_data.content)
     return await db.engine.save(note)
 
+async def fetch_youtube_transcript_segments(video_id: str) -> Optional[List[dict]]:
+    """
+    Get the timed transcript segments of a YouTube video, from the transcript store when possible
+    """
+    return await get_transcript_segments(video_id)
+
 async def fetch_youtube_transcript(video_id: str) -> Optional[str]:
     """
-    Fetch transcript from a YouTube video using youtube-transcript-api
+    Fetch transcript from a YouTube video as a single string
     """
-    try:
-        # This library is synchronous, so run in a thread pool
-        import asyncio
-        loop = asyncio.get_event_loop()
-        transcript_list = await loop.run_in_executor(
-            None, lambda: YouTubeTranscriptApi.get_transcript(video_id)
-        )
-        transcript = " ".join([item['text'] for item in transcript_list])
-        return transcript
-    except Exception as e:
-        print(f"Error fetching transcript: {str(e)}")
+    transcript_list = await fetch_youtube_transcript_segments(video_id)
+    if not transcript_list:
         return None
+    return " ".join([item['text'] for item in transcript_list])
 
-async def make_openai_request(messages: list, max_tokens: int = 500) -> Optional[str]:
+def request_cost(messages: list, max_tokens: int) -> int:
     """
-    Make a generic OpenAI API request with error handling
+    Tokens a request may consume: the prompt plus the completion limit
     """
-    if not OPENAI_API_KEY:
-        print("OpenAI API key is not set")
+    return sum(count_tokens(m["content"]) + 4 for m in messages) + max_tokens
+
+def request_headers(profile: ModelProfile) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if profile.key():
+        headers["Authorization"] = f"Bearer {profile.key()}"
+    return headers
+
+def missing_api_key(profile: ModelProfile) -> bool:
+    """
+    OpenAI itself needs a key; other OpenAI-compatible servers may not
+    """
+    if not profile.key() and "api.openai.com" in profile.url:
+        logger.warning("OpenAI API key is not set for model profile %s", profile.name)
+        return True
+    return False
+
+async def make_openai_request(messages: list, max_tokens: int = 500, profile: Optional[ModelProfile] = None) -> Optional[str]:
+    """
+    Make a chat completion request to a model profile (the first one by
+    default) with error handling. Calls share the request/token budget of the
+    profile, and raise LLMUnavailable without calling out while its circuit
+    breaker is open.
+    """
+    profile = profile or MODEL_PROFILES[0]
+    if missing_api_key(profile):
         return None
 
+    limiter, breaker = get_llm_guards(profile.name, profile.rpm, profile.tpm)
+    breaker.check()
+    cost = request_cost(messages, max_tokens)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                OPENAI_API_URL,
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
+        with OPENAI_REQUEST_SECONDS.labels(model=profile.model, stream="false").time():
+            response = await post_with_retries(
+                profile.url,
+                limiter=limiter,
+                cost=cost,
+                headers=request_headers(profile),
                 json={
-                    "model": "gpt-3.5-turbo",
+                    "model": profile.model,
                     "messages": messages,
                     "temperature": 0.7,
                     "max_tokens": max_tokens
-                },
-                timeout=30.0
+                }
             )
-            
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
-            else:
-                print(f"OpenAI API Error: {response.status_code} - {response.text}")
-                return None
-    
+        OPENAI_REQUESTS.labels(model=profile.model, status=str(response.status_code)).inc()
+        breaker.record(response.status_code)
+
+        if response.status_code == 200:
+            body = response.json()
+            usage = body.get("usage") or {}
+            record_openai_usage(profile.model, usage)
+            limiter.settle(cost, usage.get("total_tokens"))
+            return body["choices"][0]["message"]["content"]
+        else:
+            logger.error("LLM API Error from %s: %s - %s", profile.name, response.status_code, response.text)
+            return None
+
     except Exception as e:
-        print(f"Request to OpenAI failed: {e}")
+        OPENAI_REQUESTS.labels(model=profile.model, status="error").inc()
+        breaker.record(None)
+        logger.error("Request to %s failed: %s", profile.name, e)
         return None
 
-async def generate_summary_with_llm(transcript: str, video_id: str) -> str:
+async def stream_openai_request(messages: list, max_tokens: int = 500, profile: Optional[ModelProfile] = None) -> AsyncIterator[str]:
+    """
+    Stream a chat completion from a model profile, yielding content deltas as
+    they arrive. Yields nothing if the request fails.
+    """
+    profile = profile or MODEL_PROFILES[0]
+    if missing_api_key(profile):
+        return
+
+    limiter, breaker = get_llm_guards(profile.name, profile.rpm, profile.tpm)
+    breaker.check()
+    cost = request_cost(messages, max_tokens)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        async with stream_with_retries(
+            profile.url,
+            limiter=limiter,
+            cost=cost,
+            headers=request_headers(profile),
+            json={
+                "model": profile.model,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": max_tokens,
+                "stream": True
+            }
+        ) as response:
+            OPENAI_REQUEST_SECONDS.labels(model=profile.model, stream="true").observe(time.perf_counter() - started)
+            status = str(response.status_code)
+            breaker.record(response.status_code)
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error("LLM API Error from %s: %s - %s", profile.name, response.status_code, body.decode(errors='replace'))
+                return
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    record_openai_usage(profile.model, chunk["usage"])
+                    limiter.settle(cost, chunk["usage"].get("total_tokens"))
+                choices = chunk.get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    except Exception as e:
+        if status == "error":
+            breaker.record(None)
+        logger.error("Streaming request to %s failed: %s", profile.name, e)
+    finally:
+        OPENAI_REQUESTS.labels(model=profile.model, status=status).inc()
+
+def summary_messages(transcript: str, words: int = 250) -> list:
+    """
+    Build the chat messages asking for a summary of a whole transcript
+    """
+    return [
+        {"role": "system", "content": "You are a helpful assistant that summarizes YouTube video transcripts."},
+        {"role": "user", "content": f"Please summarize the following YouTube video transcript in about {words} words:\n\n{transcript}"}
+    ]
+
+def merged_summary_messages(partials: List[str], words: int = 250) -> list:
+    """
+    Build the chat messages asking to merge partial summaries into one
     """
-    Generate a summary using OpenAI's GPT model
+    combined = "\n\n".join(f"Part {i}: {partial}" for i, partial in enumerate(partials, 1))
+    return [
+        {"role": "system", "content": "You are a helpful assistant that summarizes YouTube video transcripts."},
+        {"role": "user", "content": f"The following are summaries of consecutive parts of one YouTube video. Combine them into a single coherent summary of the whole video in about {words} words:\n\n{combined}"}
+    ]
+
+async def request_summary_from_llm(transcript: str, profile: Optional[ModelProfile] = None, detail: str = DEFAULT_DETAIL) -> Optional[str]:
+    """
+    Ask the LLM for a summary of a transcript, returning None on failure
+    """
+    level = DETAIL_LEVELS[detail]
+    return await make_openai_request(summary_messages(transcript, level["words"]), max_tokens=level["max_tokens"], profile=profile)
+
+async def request_chunk_summary_from_llm(chunk: str, index: int, total: int, profile: Optional[ModelProfile] = None) -> Optional[str]:
+    """
+    Ask the LLM for a partial summary of one chunk of a long transcript
     """
     messages = [
         {"role": "system", "content": "You are a helpful assistant that summarizes YouTube video transcripts."},
-        {"role": "user", "content": f"Please summarize the following YouTube video transcript in about 250 words:\n\n{transcript}"}
+        {"role": "user", "content": f"The following is part {index} of {total} of a YouTube video transcript. Summarize the key points of this part in about 150 words:\n\n{chunk}"}
     ]
-    
-    summary = await make_openai_request(messages)
-    return summary or f"Failed to generate summary for video {video_id}"
+
+    return await make_openai_request(messages, max_tokens=SUMMARY_CHUNK_MAX_TOKENS, profile=profile)
+
+async def request_merged_summary_from_llm(partials: List[str], profile: Optional[ModelProfile] = None, detail: str = DEFAULT_DETAIL) -> Optional[str]:
+    """
+    Ask the LLM to merge partial summaries into one summary
+    """
+    level = DETAIL_LEVELS[detail]
+    return await make_openai_request(merged_summary_messages(partials, level["words"]), max_tokens=level["max_tokens"], profile=profile)
+
+async def summarize_chunks(chunks: List[str], profile: Optional[ModelProfile] = None) -> Optional[List[str]]:
+    """
+    Summarize chunks concurrently, bounded by SUMMARY_CHUNK_CONCURRENCY
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+
+    async def summarize_chunk(index: int, chunk: str) -> Optional[str]:
+        async with semaphore:
+            return await request_chunk_summary_from_llm(chunk, index, len(chunks), profile)
+
+    partials = await asyncio.gather(*[
+        summarize_chunk(i, chunk) for i, chunk in enumerate(chunks, 1)
+    ])
+    if not all(partials):
+        return None
+    return list(partials)
+
+async def condense_partial_summaries(partials: List[str], profile: Optional[ModelProfile] = None) -> Optional[List[str]]:
+    """
+    Summarize partial summaries in groups until they fit in one merge prompt
+    """
+    while count_tokens(" ".join(partials)) > SUMMARY_CHUNK_TOKENS and len(partials) > 1:
+        groups = chunk_segments([{"text": partial} for partial in partials])
+        if len(groups) >= len(partials):
+            break
+        partials = await summarize_chunks(groups, profile)
+        if partials is None:
+            return None
+    return partials
+
+async def reduce_partial_summaries(partials: List[str], profile: Optional[ModelProfile] = None, detail: str = DEFAULT_DETAIL) -> Optional[str]:
+    """
+    Merge partial summaries, first condensing them in groups if they don't fit one prompt
+    """
+    partials = await condense_partial_summaries(partials, profile)
+    if partials is None:
+        return None
+    return await request_merged_summary_from_llm(partials, profile, detail)
+
+async def summarize_transcript(segments: List[dict], profile: Optional[ModelProfile] = None, detail: str = DEFAULT_DETAIL) -> Optional[str]:
+    """
+    Summarize prepared transcript segments with one model profile, splitting
+    long ones into chunks that are summarized in parallel and then merged
+    (map-reduce)
+    """
+    chunks = chunk_segments(segments)
+    if len(chunks) <= 1:
+        return await request_summary_from_llm(chunks[0] if chunks else "", profile, detail)
+
+    partials = await summarize_chunks(chunks, profile)
+    if partials is None:
+        return None
+    return await reduce_partial_summaries(partials, profile, detail)
+
+def route_transcript(segments: List[dict], detail: str = DEFAULT_DETAIL) -> Tuple[List[dict], List[ModelProfile]]:
+    """
+    Prepare transcript segments for the LLM and pick the model profiles to
+    try, by prepared size and detail level
+    """
+    segments, report = prepare_transcript(segments)
+    record_prompt_report(report)
+    return segments, route(report["tokens_after"], detail)
+
+async def summarize_routed(segments: List[dict], detail: str = DEFAULT_DETAIL, check_quality: bool = True) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Summarize a transcript with the cheapest suitable model, escalating to the
+    next profile when a model fails, is unavailable or returns a summary that
+    fails the quality check. Returns the summary and the model that wrote it;
+    raises LLMUnavailable if every profile was unavailable.
+    """
+    segments, profiles = route_transcript(segments, detail)
+    unavailable = None
+    fallback = (None, None)
+    for profile in profiles:
+        try:
+            summary = await summarize_transcript(segments, profile, detail)
+        except LLMUnavailable as e:
+            unavailable = e
+            continue
+        if summary and (not check_quality or acceptable_summary(summary, detail)):
+            return summary, profile.model
+        if summary:
+            logger.info("Summary from %s failed the quality check, escalating", profile.name)
+            fallback = (summary, profile.model)
+    if fallback[0] is None and unavailable is not None:
+        raise unavailable
+    # A short summary beats none when no better model could be reached
+    return fallback
+
+async def generate_summary_with_llm(transcript: str, video_id: str, detail: str = DEFAULT_DETAIL) -> Tuple[str, str]:
+    """
+    Generate a summary of a plain transcript, returning it with the model used
+    """
+    summary, model = await summarize_routed([{"text": transcript}], detail, check_quality=False)
+    if not summary:
+        raise SummaryGenerationError(f"Failed to generate summary for video {video_id}")
+    return summary, model
+
+def extract_video_id(url: str) -> str:
+    """
+    Extract the YouTube video ID from a URL, falling back to the raw value
+    """
+    url = url.strip()
+    if "v=" in url:
+        return url.split("v=")[1].split("&")[0]
+    elif "youtu.be/" in url:
+        return url.split("youtu.be/")[1].split("?")[0]
+    return url
+
+def summary_cache_key(video_id: str, detail: str = DEFAULT_DETAIL) -> str:
+    """
+    Build the cache key for a video under the current prompt, routing table and detail level
+    """
+    return f"{video_id}:{SUMMARY_PROMPT_VERSION}:{ROUTING_VERSION}:{detail}"
+
+async def summarize_video(video_id: str, detail: str = DEFAULT_DETAIL) -> Tuple[str, Optional[str]]:
+    """
+    Return a summary for a video and the model that wrote it, serving it from
+    the summary cache when possible
+    """
+    cache_key = summary_cache_key(video_id, detail)
+    with SUMMARY_STAGE_SECONDS.labels(stage="cache_lookup").time():
+        cached = await summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Concurrent requests for the same video, in any worker, share one transcript fetch and LLM call
+    return await summary_flights.do(
+        cache_key,
+        lambda: compute_summary(video_id, cache_key, detail),
+        lookup=lambda: summary_cache.get_shared(cache_key)
+    )
+
+async def compute_summary(video_id: str, cache_key: str, detail: str = DEFAULT_DETAIL) -> Tuple[str, str]:
+    """
+    Fetch the transcript, summarize it and store the result in the summary cache
+    """
+    # Fetch real transcript
+    with SUMMARY_STAGE_SECONDS.labels(stage="transcript").time():
+        segments = await fetch_youtube_transcript_segments(video_id)
+    if not segments:
+        # Don't cache this: the transcript may become available later
+        with SUMMARY_STAGE_SECONDS.labels(stage="llm").time():
+            return await generate_summary_with_llm(f"No transcript available for video {video_id}.", video_id, detail)
+
+    # Generate summary using LLM
+    with SUMMARY_STAGE_SECONDS.labels(stage="llm").time():
+        summary, model = await summarize_routed(segments, detail)
+    if not summary:
+        raise SummaryGenerationError(f"Failed to generate summary for video {video_id}")
+
+    await summary_cache.set(cache_key, video_id, summary, SUMMARY_PROMPT_VERSION, model)
+    return summary, model
+
+def get_summary_stats() -> dict:
+    """
+    Report summary cache, request coalescing, prompt token and LLM limiter counters
+    """
+    return {
+        "cache": summary_cache.stats(),
+        "coalescing": summary_flights.stats(),
+        "prompt": dict(prompt_totals),
+        "llm": llm_guard_stats(),
+        "related": related_summaries.stats()
+    }
+
+async def prune_summary_cache() -> int:
+    """
+    Drop persisted cache entries of earlier prompt versions and expired ones
+    """
+    return await summary_cache.prune(SUMMARY_PROMPT_VERSION)
+
+async def invalidate_summary_cache(video_id: Optional[str] = None) -> int:
+    """
+    Drop cached summaries for a video, or all of them
+    """
+    return await summary_cache.invalidate(video_id)
+
+def prepare_youtube_summary(
+    existing: Optional[YouTubeSummary],
+    video_id: str,
+    url: str,
+    summary: str,
+    model: Optional[str] = None,
+    chapters: Optional[List[SummaryChapter]] = None,
+    chapters_version: Optional[str] = None
+) -> YouTubeSummary:
+    """
+    Update the stored summary of a video, or create it; there is one summary
+    per video. Chapters are only replaced when given.
+    """
+    now = datetime.utcnow()
+    if existing is None:
+        existing = YouTubeSummary(video_id=video_id, url=url, summary=summary, model=model, created_at=now)
+    existing.url = url
+    existing.summary = summary
+    existing.model = model
+    existing.updated_at = now
+    if chapters is not None:
+        existing.chapters = chapters
+        existing.chapters_version = chapters_version
+    return existing
+
+async def save_youtube_summary(
+    video_id: str,
+    url: str,
+    summary: str,
+    model: Optional[str] = None,
+    chapters: Optional[List[SummaryChapter]] = None,
+    chapters_version: Optional[str] = None
+) -> YouTubeSummary:
+    """
+    Upsert the summary of a video by its video ID
+    """
+    for attempt in range(2):
+        existing = await db.engine.find_one(YouTubeSummary, YouTubeSummary.video_id == video_id)
+        try:
+            saved = await db.engine.save(prepare_youtube_summary(
+                existing, video_id, url, summary, model, chapters, chapters_version
+            ))
+        except DuplicateKeyError:
+            # Another request created this video's summary in the meantime; update that one
+            if attempt:
+                raise
+            continue
+        await collection_versions.bump(YouTubeSummary)
+        await related_summaries.add([saved])
+        return saved
+
+def summary_response(saved_summary: YouTubeSummary) -> dict:
+    response = {
+        "id": str(getattr(saved_summary, "id", None)),
+        "url": saved_summary.url,
+        "summary": saved_summary.summary,
+        "model": saved_summary.model,
+        "updated_at": (saved_summary.updated_at or saved_summary.created_at).isoformat()
+    }
+    if saved_summary.chapters:
+        response["chapters"] = [
+            chapter.model_dump(include={"start", "end", "title", "summary", "model"})
+            for chapter in saved_summary.chapters
+        ]
+    return fix_mongo_ids(response)
+
+async def build_youtube_summary(summary_data: YouTubeSummaryCreate) -> dict:
+    """
+    Summarize a video and save the result, letting errors propagate
+    """
+    with SUMMARY_STAGE_SECONDS.labels(stage="total").time():
+        video_id = extract_video_id(summary_data.url)
+        summary, model = await summarize_video(video_id, summary_data.detail)
+
+        with SUMMARY_STAGE_SECONDS.labels(stage="db_write").time():
+            saved_summary = await save_youtube_summary(video_id, summary_data.url, summary, model)
+
+    # Return the saved summary with fixed IDs
+    return summary_response(saved_summary)
+
+async def stream_summary_tokens(segments: List[dict], profile: ModelProfile, detail: str) -> AsyncIterator[str]:
+    """
+    Stream a summary from one model profile. Long transcripts are mapped chunk
+    by chunk first; only the final merge is streamed.
+    """
+    level = DETAIL_LEVELS[detail]
+    chunks = chunk_segments(segments)
+    if len(chunks) <= 1:
+        messages = summary_messages(chunks[0] if chunks else "", level["words"])
+    else:
+        partials = await summarize_chunks(chunks, profile)
+        if partials is not None:
+            partials = await condense_partial_summaries(partials, profile)
+        if partials is None:
+            return
+        messages = merged_summary_messages(partials, level["words"])
+
+    async for content in stream_openai_request(messages, max_tokens=level["max_tokens"], profile=profile):
+        yield content
+
+async def stream_youtube_summary(summary_data: YouTubeSummaryCreate) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Summarize a video, yielding ("token", ...) events as the LLM produces text and
+    a final ("done", ...) event once the summary has been saved
+    """
+    video_id = extract_video_id(summary_data.url)
+    detail = summary_data.detail
+    cache_key = summary_cache_key(video_id, detail)
+    with SUMMARY_STAGE_SECONDS.labels(stage="cache_lookup").time():
+        cached = await summary_cache.get(cache_key)
+
+    if cached is not None:
+        summary, model = cached
+        yield "token", {"text": summary}
+    else:
+        with SUMMARY_STAGE_SECONDS.labels(stage="transcript").time():
+            segments = await fetch_youtube_transcript_segments(video_id)
+        cacheable = bool(segments)
+        if not segments:
+            segments = [{"text": f"No transcript available for video {video_id}."}]
+
+        llm_started = time.perf_counter()
+        segments, profiles = route_transcript(segments, detail)
+        # Tokens already sent cannot be taken back, so only a profile that
+        # produced nothing is escalated; there is no quality retry here
+        parts = []
+        model = None
+        unavailable = None
+        for profile in profiles:
+            try:
+                async for content in stream_summary_tokens(segments, profile, detail):
+                    parts.append(content)
+                    yield "token", {"text": content}
+            except LLMUnavailable as e:
+                if parts:
+                    raise
+                unavailable = e
+                continue
+            if parts:
+                model = profile.model
+                break
+        SUMMARY_STAGE_SECONDS.labels(stage="llm").observe(time.perf_counter() - llm_started)
+
+        summary = "".join(parts)
+        if not summary:
+            if unavailable is not None:
+                raise unavailable
+            raise SummaryGenerationError(f"Failed to generate summary for video {video_id}")
+        if cacheable:
+            await summary_cache.set(cache_key, video_id, summary, SUMMARY_PROMPT_VERSION, model)
+
+    with SUMMARY_STAGE_SECONDS.labels(stage="db_write").time():
+        saved_summary = await save_youtube_summary(video_id, summary_data.url, summary, model)
+    yield "done", summary_response(saved_summary)
 
 async def create_youtube_summary(summary_data: YouTubeSummaryCreate) -> dict:
+    """
+    Summarize a video, turning errors into an error response; LLMUnavailable
+    is raised so the caller can ask the client to retry later
+    """
     try:
-        # Extract video ID from URL
-        video_id = None
-        if "v=" in summary_data.url:
-            video_id = summary_data.url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in summary_data.url:
-            video_id = summary_data.url.split("youtu.be/")[1].split("?")[0]
-        else:
-            video_id = summary_data.url
+        return await build_youtube_summary(summary_data)
+    except LLMUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Error creating summary: %s", e)
+        return {
+            "url": summary_data.url,
+            "summary": f"Error creating summary: {str(e)}"
+        }
 
-        # Fetch real transcript
-        transcript = await fetch_youtube_transcript(video_id)
-        if not transcript:
-            transcript = f"No transcript available for video {video_id}."
+def chapters_version(detail: str) -> str:
+    """
+    Version stored with chapters: what the chapters depend on, then the detail
+    level of the summary merged from them
+    """
+    return f"{CHAPTER_PROMPT_VERSION}:{ROUTING_VERSION}:{detail}"
 
-        # Generate summary using LLM
-        summary = await generate_summary_with_llm(transcript, video_id)
+async def summarize_chapter(window: dict) -> Optional[SummaryChapter]:
+    """
+    Title and summarize one transcript window with the cheapest suitable
+    model, escalating to the next profile on failure
+    """
+    unavailable = None
+    for profile in route(window["tokens"], "brief"):
+        try:
+            text = await make_openai_request(chapter_messages(window), max_tokens=CHAPTER_MAX_TOKENS, profile=profile)
+        except LLMUnavailable as e:
+            unavailable = e
+            continue
+        if text:
+            title, summary = parse_chapter(text, window["start"])
+            return SummaryChapter(
+                start=window["start"], end=window["end"], title=title, summary=summary,
+                window_hash=window["hash"], model=profile.model
+            )
+    if unavailable is not None:
+        raise unavailable
+    return None
 
-        youtube_summary = YouTubeSummary(url=summary_data.url, summary=summary)
-        saved_summary = await db.engine.save(youtube_summary)
+async def merge_chapters(chapters: List[SummaryChapter], detail: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Merge chapter summaries into a summary of the whole video, escalating like summarize_routed
+    """
+    partials = [f"{chapter.title}: {chapter.summary}" for chapter in chapters]
+    unavailable = None
+    for profile in route(count_tokens(" ".join(partials)), detail):
+        try:
+            summary = await reduce_partial_summaries(partials, profile, detail)
+        except LLMUnavailable as e:
+            unavailable = e
+            continue
+        if summary:
+            return summary, profile.model
+    if unavailable is not None:
+        raise unavailable
+    return None, None
 
-        # Return the saved summary with fixed IDs
-        return fix_mongo_ids({
-            "id": str(getattr(saved_summary, "id", None)),
-            "url": saved_summary.url,
-            "summary": saved_summary.summary
-        })
+async def compute_chapter_summary(video_id: str, url: str, detail: str) -> dict:
+    """
+    Summarize a video chapter by chapter. Windows whose transcript is unchanged
+    since the stored chapters were made are reused; only the others go to the
+    LLM, concurrently. The whole-video summary is merged from the chapters and
+    only recomputed when a chapter changed.
+    """
+    existing = await db.engine.find_one(YouTubeSummary, YouTubeSummary.video_id == video_id)
+    version = chapters_version(detail)
+    reusable = {}
+    stored_version = existing.chapters_version if existing is not None else None
+    if stored_version and stored_version.rsplit(":", 1)[0] == version.rsplit(":", 1)[0]:
+        reusable = {chapter.window_hash: chapter for chapter in existing.chapters}
+
+    with SUMMARY_STAGE_SECONDS.labels(stage="transcript").time():
+        segments = await fetch_youtube_transcript_segments(video_id)
+    if not segments:
+        raise SummaryGenerationError(f"No transcript available for video {video_id}")
+    # Clean captions without trimming, so every part of the video gets a chapter
+    segments, report = prepare_transcript(segments, budget=0)
+    record_prompt_report(report)
+    windows = window_segments(segments)
+    if not windows:
+        raise EmptyTranscript(f"The transcript of video {video_id} has no text left to summarize")
+
+    semaphore = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+
+    async def chapter_for(window: dict) -> Optional[SummaryChapter]:
+        if window["hash"] in reusable:
+            return reusable[window["hash"]]
+        async with semaphore:
+            return await summarize_chapter(window)
+
+    with SUMMARY_STAGE_SECONDS.labels(stage="llm").time():
+        chapters = await asyncio.gather(*[chapter_for(window) for window in windows])
+        if not all(chapters):
+            raise SummaryGenerationError(f"Failed to summarize the chapters of video {video_id}")
+        recomputed = sum(1 for window in windows if window["hash"] not in reusable)
+
+        changed = bool(recomputed) or stored_version != version or len(chapters) != len(existing.chapters)
+        if changed:
+            summary, model = await merge_chapters(chapters, detail)
+            if not summary:
+                raise SummaryGenerationError(f"Failed to generate summary for video {video_id}")
+        else:
+            summary, model = existing.summary, existing.model
+
+    if changed or existing.url != url:
+        with SUMMARY_STAGE_SECONDS.labels(stage="db_write").time():
+            saved_summary = await save_youtube_summary(video_id, url, summary, model, list(chapters), version)
+    else:
+        # Nothing changed: leave the document (and its ETag) as it is
+        saved_summary = existing
+    logger.info("Chapters of %s: %d recomputed, %d reused", video_id, recomputed, len(chapters) - recomputed)
+    return {**summary_response(saved_summary), "recomputed_chapters": recomputed}
+
+async def create_chapter_summary(summary_data: YouTubeSummaryCreate) -> dict:
+    """
+    Summarize a video in chapter mode, turning errors into an error response
+    like create_youtube_summary; LLMUnavailable and EmptyTranscript are raised
+    """
+    video_id = extract_video_id(summary_data.url)
+    try:
+        # Concurrent requests for the same video share one run
+        return await summary_flights.do(
+            f"chapters:{video_id}:{summary_data.detail}",
+            lambda: compute_chapter_summary(video_id, summary_data.url, summary_data.detail)
+        )
+    except (LLMUnavailable, EmptyTranscript):
+        raise
     except Exception as e:
-        print(f"Error creating summary: {str(e)}")
+        logger.error("Error creating chapter summary: %s", e)
         return {
             "url": summary_data.url,
             "summary": f"Error creating summary: {str(e)}"
         }
 
-async def get_youtube_summaries() -> list[dict]:
+async def fetch_playlist_video_ids(playlist_id: str) -> List[str]:
     """
-    Get all YouTube summaries
+    List the video IDs of a public playlist by reading the playlist page
     """
     try:
-        summaries = await db.engine.find(YouTubeSummary)
-        return fix_mongo_ids([
-            {
-                "id": str(getattr(s, "id", None)),
-                "url": s.url,
-                "summary": s.summary
-            }
-            for s in summaries
-        ])
+        response = await get_http_client().get(
+            YOUTUBE_PLAYLIST_URL,
+            params={"list": playlist_id},
+            headers={"Accept-Language": "en-US,en"}
+        )
+        if response.status_code != 200:
+            logger.error("Error fetching playlist %s: %s", playlist_id, response.status_code)
+            return []
+        video_ids = re.findall(r'"videoId":"([\w-]{11})"', response.text)
+        return list(dict.fromkeys(video_ids))
     except Exception as e:
-        print(f"Error fetching summaries: {str(e)}")
+        logger.error("Error fetching playlist %s: %s", playlist_id, e)
         return []
 
+async def stream_batch_summaries(batch: YouTubeSummaryBatchCreate) -> AsyncIterator[dict]:
+    """
+    Summarize many videos with bounded concurrency, yielding one result per
+    video as it completes, then write all summaries with a single bulk write
+    """
+    # Deduplicate by video ID, keeping the first URL given for each video
+    videos = {}
+    for url in batch.urls:
+        videos.setdefault(extract_video_id(url), url.strip())
+    if batch.playlist_id:
+        for video_id in await fetch_playlist_video_ids(batch.playlist_id):
+            videos.setdefault(video_id, f"https://www.youtube.com/watch?v={video_id}")
+
+    if len(videos) > BATCH_SUMMARY_MAX_VIDEOS:
+        yield {"status": "error", "detail": f"A batch can contain at most {BATCH_SUMMARY_MAX_VIDEOS} videos"}
+        return
+
+    # Videos that already have a summary are updated in place
+    existing = {
+        s.video_id: s for s in await db.engine.find(
+            YouTubeSummary, YouTubeSummary.video_id.in_(list(videos))
+        )
+    }
+    semaphore = asyncio.Semaphore(BATCH_SUMMARY_CONCURRENCY)
+
+    async def summarize_one(video_id: str, url: str) -> Tuple[dict, Optional[YouTubeSummary]]:
+        async with semaphore:
+            try:
+                summary, model = await summarize_video(video_id, batch.detail)
+            except Exception as e:
+                logger.error("Error summarizing %s: %s", video_id, e)
+                return {"video_id": video_id, "url": url, "status": "error", "detail": str(e)}, None
+        youtube_summary = prepare_youtube_summary(existing.get(video_id), video_id, url, summary, model)
+        return {
+            "video_id": video_id,
+            "id": str(youtube_summary.id),
+            "url": url,
+            "summary": summary,
+            "model": model,
+            "status": "ok"
+        }, youtube_summary
+
+    tasks = [asyncio.create_task(summarize_one(video_id, url)) for video_id, url in videos.items()]
+    documents = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item, document = await next_done
+            if document is not None:
+                documents.append(document)
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    written = []
+    try:
+        written = await save_batch_summaries(documents)
+        if len(written) < len(documents):
+            yield {"status": "error", "detail": f"{len(documents) - len(written)} summaries could not be saved"}
+        if written:
+            await collection_versions.bump(YouTubeSummary)
+            await related_summaries.add(written)
+    except Exception as e:
+        logger.error("Error saving batch summaries: %s", e)
+        yield {"status": "error", "detail": f"Error saving summaries: {str(e)}"}
+    yield {"status": "done", "videos": len(videos), "saved": len(written)}
+
+async def save_batch_summaries(documents: List[YouTubeSummary]) -> List[YouTubeSummary]:
+    """
+    Bulk write the summaries of a batch and return the ones written. A video
+    whose summary another request created meanwhile breaks the unique
+    video_id index; its summary is written again onto that document.
+    """
+    try:
+        await bulk_save(documents)
+        return documents
+    except BulkSaveError as e:
+        logger.error("Error saving batch summaries: %s", e)
+        written, duplicates = e.written, e.duplicates
+    if not duplicates:
+        return written
+
+    stored = {
+        s.video_id: s for s in await db.engine.find(
+            YouTubeSummary, YouTubeSummary.video_id.in_([d.video_id for d in duplicates])
+        )
+    }
+    retried = [
+        prepare_youtube_summary(stored[d.video_id], d.video_id, d.url, d.summary, d.model)
+        for d in duplicates if d.video_id in stored
+    ]
+    try:
+        await bulk_save(retried)
+        return written + retried
+    except BulkSaveError as e:
+        logger.error("Error saving batch summaries again: %s", e)
+        return written + e.written
+
+def parse_fields(fields: Optional[str], allowed: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated field projection; the id is always included
+    """
+    if not fields:
+        return allowed
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(f for f in allowed if f == "id" or f in requested)
+
+def parse_cursor(after: Optional[str]) -> Optional[ObjectId]:
+    """
+    Parse an `after` cursor, which is the id of the last item of the previous page
+    """
+    if not after:
+        return None
+    try:
+        return ObjectId(after)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {after}")
+
+def stored_fields(fields: Tuple[str, ...]) -> List[str]:
+    """
+    Map API field names to stored field names for a projection
+    """
+    return ["_id" if f == "id" else f for f in fields]
+
+def project(document: dict, fields: Tuple[str, ...]) -> dict:
+    """
+    Shape a raw document for a list response; values keep their BSON types
+    and are converted by the response encoder
+    """
+    return {f: document.get("_id" if f == "id" else f) for f in fields}
+
+async def get_youtube_summaries(
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None
+) -> Tuple[list[dict], Optional[str]]:
+    """
+    Get a page of YouTube summaries, newest first, and the cursor of the next page.
+    Items hold raw BSON values; encode them with app.responses.RawJSONResponse.
+    """
+    cursor = parse_cursor(after)
+    selected = parse_fields(fields, SUMMARY_FIELDS)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        queries = [YouTubeSummary.id < cursor] if cursor else []
+        # Read raw documents (no model rebuild) and fetch one extra to learn whether another page exists
+        summaries = await find_documents(
+            YouTubeSummary, *queries, sort=query.desc(YouTubeSummary.id), limit=limit + 1,
+            projection=stored_fields(selected)
+        )
+        page = [project(s, selected) for s in summaries[:limit]]
+        next_cursor = str(page[-1]["id"]) if len(summaries) > limit else None
+        return page, next_cursor
+    except Exception as e:
+        # Raised rather than answered with an empty page, which would be tagged
+        # with the current collection version and revalidated until the next write
+        logger.error("Error fetching summaries: %s", e)
+        raise
+
 async def get_youtube_summary(summary_id: str) -> dict:
     """
     Get a specific YouTube summary by ID
     """
     try:
-        summary = await db.engine.find_one(YouTubeSummary, YouTubeSummary.id == summary_id)
+        try:
+            obj_id = ObjectId(summary_id)
+        except Exception:
+            logger.warning("Invalid summary_id format: %s", summary_id)
+            return None
+
+        summary = await db.engine.find_one(YouTubeSummary, YouTubeSummary.id == obj_id)
         if summary:
-            return fix_mongo_ids({
-                "id": str(getattr(summary, "id", None)),
-                "url": summary.url,
-                "summary": summary.summary
-            })
+            return summary_response(summary)
         return None
     except Exception as e:
-        print(f"Error fetching summary {summary_id}: {str(e)}")
+        logger.error("Error fetching summary %s: %s", summary_id, e)
         return None
 
-from bson import ObjectId
+async def get_related_summaries(summary_id: str, limit: int = 10) -> Optional[List[dict]]:
+    """
+    Get the summaries most similar to a summary, best first, or None if the
+    summary does not exist
+    """
+    try:
+        ObjectId(summary_id)
+    except Exception:
+        return None
+
+    matches = await related_summaries.related(summary_id, limit)
+    if matches is None:
+        return None
+    documents = await find_documents(
+        YouTubeSummary, YouTubeSummary.id.in_([ObjectId(i) for i, _ in matches]),
+        projection=["_id", "url", "video_id"]
+    )
+    by_id = {str(d["_id"]): d for d in documents}
+    return [
+        {"id": i, "url": by_id[i]["url"], "video_id": by_id[i].get("video_id"), "score": round(score, 4)}
+        for i, score in matches if i in by_id
+    ]
 
 async def delete_youtube_summary(summary_id: str) -> bool:
     """
@@ -163,19 +981,21 @@ async def delete_youtube_summary(summary_id: str) -> bool:
         try:
             obj_id = ObjectId(summary_id)
         except Exception as e:
-            print(f"Invalid summary_id format: {summary_id}")
+            logger.warning("Invalid summary_id format: %s", summary_id)
             return False
 
         summary = await db.engine.find_one(YouTubeSummary, YouTubeSummary.id == obj_id)
         if summary:
             await db.engine.delete(summary)
-            print(f"Deleted summary with ID: {summary_id}")
+            await collection_versions.bump(YouTubeSummary)
+            await related_summaries.remove(summary_id)
+            logger.info("Deleted summary with ID: %s", summary_id)
             return True
         else:
-            print(f"No summary found with ID: {summary_id}")
+            logger.warning("No summary found with ID: %s", summary_id)
             return False
     except Exception as e:
-        print(f"Error deleting summary {summary_id}: {str(e)}")
+        logger.error("Error deleting summary %s: %s", summary_id, e)
         return False
 
 async def create_bookmark(bookmark_data: BookmarkCreate) -> dict:
@@ -188,11 +1008,13 @@ async def create_bookmark(bookmark_data: BookmarkCreate) -> dict:
             title=bookmark_data.title,
             url=str(bookmark_data.url),
             description=bookmark_data.description,
-            tags=bookmark_data.tags or []
+            tags=bookmark_data.tags or [],
+            url_key=normalize_url(str(bookmark_data.url))
         )
         
         # Save to database
         saved_bookmark = await db.engine.save(bookmark)
+        await collection_versions.bump(Bookmark)
         
         # Return fixed mongo IDs
         return fix_mongo_ids({
@@ -204,34 +1026,100 @@ async def create_bookmark(bookmark_data: BookmarkCreate) -> dict:
             "created_at": saved_bookmark.created_at.isoformat()
         })
     except Exception as e:
-        print(f"Error creating bookmark: {str(e)}")
+        logger.error("Error creating bookmark: %s", e)
         raise
 
-async def get_bookmarks(tag: Optional[str] = None) -> List[dict]:
+async def get_bookmarks(
+    tag: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
     """
-    Retrieve bookmarks, optionally filtered by tag
+    Retrieve a page of bookmarks, newest first, optionally filtered by tag,
+    and the cursor of the next page. Items hold raw BSON values; encode them
+    with app.responses.RawJSONResponse.
     """
+    cursor = parse_cursor(after)
+    selected = parse_fields(fields, BOOKMARK_FIELDS)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
     try:
+        queries = []
         # If tag is provided, filter bookmarks
         if tag:
-            bookmarks = await db.engine.find(Bookmark, Bookmark.tags.contains(tag))
-        else:
-            bookmarks = await db.engine.find(Bookmark)
-        
-        # Convert to list of dicts with fixed mongo IDs
-        return fix_mongo_ids([
-            {
-                "id": str(getattr(b, "id", None)),
-                "title": b.title,
-                "url": b.url,
-                "description": b.description,
-                "tags": b.tags,
-                "created_at": b.created_at.isoformat()
-            }
-            for b in bookmarks
-        ])
+            queries.append(Bookmark.tags.in_([tag]))
+        if cursor:
+            queries.append(Bookmark.id < cursor)
+
+        # Read raw documents (no model rebuild) and fetch one extra to learn whether another page exists
+        bookmarks = await find_documents(
+            Bookmark, *queries, sort=query.desc(Bookmark.id), limit=limit + 1,
+            projection=stored_fields(selected)
+        )
+
+        page = [project(b, selected) for b in bookmarks[:limit]]
+        next_cursor = str(page[-1]["id"]) if len(bookmarks) > limit else None
+        return page, next_cursor
     except Exception as e:
-        print(f"Error fetching bookmarks: {str(e)}")
+        logger.error("Error fetching bookmarks: %s", e)
+        raise
+
+SEARCH_MODELS = {"summary": YouTubeSummary, "bookmark": Bookmark, "note": Note}
+
+def search_hit(kind: str, doc_id: str, score: float, document: dict, q: str) -> dict:
+    """
+    Shape a search result with a highlighted snippet of its main text field
+    """
+    _, weights = SEARCH_FIELDS[SEARCH_MODELS[kind].__name__]
+    text_field = next(f for f in ("summary", "description", "content") if f in weights)
+    hit = {
+        "type": kind,
+        "id": doc_id,
+        "score": round(score, 4),
+        "snippet": make_snippet(field_text(document.get(text_field)) or field_text(document.get("title")), q)
+    }
+    for field in ("title", "url"):
+        if field in weights:
+            hit[field] = document.get(field)
+    return hit
+
+async def search_documents(
+    q: str,
+    types: Optional[List[str]] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0
+) -> List[dict]:
+    """
+    Full-text search across summaries, bookmarks and notes, best matches first
+    """
+    kinds = types or list(SEARCH_MODELS)
+    unknown = [k for k in kinds if k not in SEARCH_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown types: {', '.join(unknown)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        if isinstance(db.engine, MockEngine):
+            # Over-fetch when filtering by type since the in-memory index covers every type
+            matches = db.engine.search_index.search(q, limit=offset + limit if types is None else len(db.engine.search_index.documents))
+            hits = [search_hit(kind, doc_id, score, document, q) for score, kind, doc_id, document in matches if kind in kinds]
+            return hits[offset:offset + limit]
+
+        # Each collection has its own text index; merge their top results by score
+        hits = []
+        for kind in kinds:
+            collection = db.engine.get_collection(SEARCH_MODELS[kind])
+            cursor = collection.find(
+                {"$text": {"$search": q}},
+                {"score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(offset + limit)
+            async for document in cursor:
+                hits.append(search_hit(kind, str(document["_id"]), document["score"], document, q))
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[offset:offset + limit]
+    except Exception as e:
+        logger.error("Error searching for %r: %s", q, e)
         return []
 
 async def delete_bookmark(bookmark_id: str) -> bool:
@@ -243,18 +1131,201 @@ async def delete_bookmark(bookmark_id: str) -> bool:
         try:
             obj_id = ObjectId(bookmark_id)
         except Exception:
-            print(f"Invalid bookmark_id format: {bookmark_id}")
+            logger.warning("Invalid bookmark_id format: %s", bookmark_id)
             return False
 
         # Find and delete the bookmark
         bookmark = await db.engine.find_one(Bookmark, Bookmark.id == obj_id)
         if bookmark:
             await db.engine.delete(bookmark)
-            print(f"Deleted bookmark with ID: {bookmark_id}")
+            await collection_versions.bump(Bookmark)
+            logger.info("Deleted bookmark with ID: %s", bookmark_id)
             return True
         else:
-            print(f"No bookmark found with ID: {bookmark_id}")
+            logger.warning("No bookmark found with ID: %s", bookmark_id)
             return False
     except Exception as e:
-        print(f"Error deleting bookmark {bookmark_id}: {str(e)}")
-        return False
\ No newline at end of file
+        logger.error("Error deleting bookmark %s: %s", bookmark_id, e)
+        return False
+
+async def import_bookmarks(
+    chunks: AsyncIterator[bytes],
+    fmt: Optional[str] = None,
+    content_type: Optional[str] = None
+) -> dict:
+    """
+    Import a streamed NDJSON or Netscape HTML bookmark file. Records are
+    validated with BookmarkCreate and written with one insert_many per batch
+    while the next batch is read. A bookmark whose normalized URL is already
+    stored, or came earlier in the file, is counted as a duplicate.
+    """
+    now = datetime.utcnow()
+    token = await shared_state.acquire_lease("bookmarks:import", BOOKMARK_IMPORT_LEASE_SECONDS)
+    if token is None:
+        raise BookmarkImportInProgress("Another bookmark import is running")
+
+    report = {"received": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    # Digests rather than URLs keep the memory per imported bookmark small
+    seen = set()
+    batch: List[dict] = []
+    writing: Optional[asyncio.Task] = None
+
+    def reject(line_no: int, error: str):
+        report["invalid"] += 1
+        if len(report["errors"]) < BOOKMARK_IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": line_no, "error": error})
+
+    async def write(bookmarks: List[dict]):
+        stored = {d["url_key"] for d in await find_documents(
+            Bookmark, Bookmark.url_key.in_([b["url_key"] for b in bookmarks]), projection=["url_key"]
+        )}
+        # Bookmarks saved before url_key existed only match on their exact URL
+        stored_urls = {d["url"] for d in await find_documents(
+            Bookmark, Bookmark.url.in_([b["url"] for b in bookmarks]), projection=["url"]
+        )}
+        fresh = [b for b in bookmarks if b["url_key"] not in stored and b["url"] not in stored_urls]
+        report["duplicates"] += len(bookmarks) - len(fresh)
+        report["imported"] += await insert_documents(Bookmark, fresh)
+
+    try:
+        async for line_no, record, error in bookmark_records(chunks, fmt, content_type):
+            report["received"] += 1
+            if error is not None:
+                reject(line_no, error)
+                continue
+            try:
+                data = BookmarkCreate.model_validate(record)
+            except ValidationError as e:
+                reject(line_no, validation_message(e))
+                continue
+
+            url = str(data.url)
+            url_key = normalize_url(url)
+            digest = hashlib.blake2b(url_key.encode(), digest_size=12).digest()
+            if digest in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(digest)
+
+            # Already validated by BookmarkCreate, so stored as a raw Bookmark document
+            batch.append({
+                "_id": ObjectId(),
+                "title": data.title,
+                "url": url,
+                "description": data.description,
+                "tags": data.tags or [],
+                "created_at": parse_created_at(record.get("created_at")) or now,
+                "url_key": url_key
+            })
+            if len(batch) >= BOOKMARK_IMPORT_BATCH:
+                if writing is not None:
+                    await writing
+                writing = asyncio.create_task(write(batch))
+                batch = []
+
+        if writing is not None:
+            await writing
+            writing = None
+        if batch:
+            await write(batch)
+    except Exception as e:
+        # Batches written so far stay imported
+        logger.error("Error importing bookmarks: %s", e)
+        report["error"] = str(e)
+    finally:
+        if writing is not None:
+            writing.cancel()
+        if report["imported"]:
+            await collection_versions.bump(Bookmark)
+        await shared_state.release_lease("bookmarks:import", token)
+
+    logger.info(
+        "Imported %d bookmarks (%d duplicates, %d invalid)",
+        report["imported"], report["duplicates"], report["invalid"]
+    )
+    return report
+
+async def export_bookmarks(fmt: str = "ndjson", tag: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Stream all bookmarks, oldest first, as NDJSON or a Netscape bookmark file,
+    reading them from a cursor rather than loading them all
+    """
+    html = fmt == "html"
+    queries = [Bookmark.tags.in_([tag])] if tag else []
+    if html:
+        yield NETSCAPE_HEADER.encode()
+    chunk = []
+    async for doc in iter_documents(
+        Bookmark, *queries,
+        projection=[f for f in EXPORT_FIELDS if f != "id"],
+        batch_size=BOOKMARK_EXPORT_BATCH
+    ):
+        chunk.append(netscape_entry(doc).encode() if html else ndjson_line(doc))
+        if len(chunk) >= BOOKMARK_EXPORT_BATCH:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+    if html:
+        yield NETSCAPE_FOOTER.encode()
+
+# Hot queries reported by the query plan endpoint, with representative values
+HOT_QUERIES = {
+    "summaries_page": (YouTubeSummary, [], query.desc(YouTubeSummary.id), DEFAULT_PAGE_SIZE),
+    "summaries_by_created_at": (YouTubeSummary, [], query.desc(YouTubeSummary.created_at), DEFAULT_PAGE_SIZE),
+    "summary_by_video_id": (YouTubeSummary, [YouTubeSummary.video_id == "dQw4w9WgXcQ"], None, 1),
+    "bookmarks_by_tag": (Bookmark, [Bookmark.tags.in_(["example"])], query.desc(Bookmark.id), DEFAULT_PAGE_SIZE),
+    # The duplicate checks of the bookmark import; bookmarks saved before
+    # url_key existed are matched on their exact URL
+    "bookmarks_by_url_key": (Bookmark, [Bookmark.url_key.in_([normalize_url("https://example.com/")])], None, None),
+    "bookmarks_by_url": (Bookmark, [Bookmark.url.in_(["https://example.com/"])], None, None),
+    "unfinished_jobs": (SummaryJob, [SummaryJob.status.in_(["pending", "running"])], None, None),
+}
+
+def plan_stages(plan: dict) -> List[str]:
+    """
+    Flatten a Mongo winning plan into its stages, outermost first
+    """
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+async def explain_hot_queries() -> dict:
+    """
+    Report the query plan of each hot query so missing indexes show up as collection scans
+    """
+    plans = {}
+    for name, (model, queries, sort, limit) in HOT_QUERIES.items():
+        try:
+            if isinstance(db.engine, MockEngine):
+                plans[name] = db.engine.explain(model, *queries, sort=sort)
+                continue
+
+            cursor = db.engine.get_collection(model).find(
+                dict(query.and_(*queries)) if len(queries) > 1 else (dict(queries[0]) if queries else {})
+            )
+            if sort is not None:
+                cursor = cursor.sort(list(dict(sort).items()))
+            if limit is not None:
+                cursor = cursor.limit(limit)
+            explained = await cursor.explain()
+            planner = explained.get("queryPlanner", {})
+            stats = explained.get("executionStats", {})
+            plans[name] = {
+                "engine": "mongo",
+                "stages": plan_stages(planner.get("winningPlan", {})),
+                "collection_scan": "COLLSCAN" in str(planner.get("winningPlan", {})),
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+                "returned": stats.get("nReturned"),
+                "millis": stats.get("executionTimeMillis")
+            }
+        except Exception as e:
+            logger.error("Error explaining %s: %s", name, e)
+            plans[name] = {"error": str(e)}
+    return plans
@@ -0,0 +1,83 @@
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional
+import logging
+import math
+import os
+import zlib
+
+import numpy as np
+
+from app.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Local sentence-transformers model used to embed summaries, e.g.
+# "sentence-transformers/all-MiniLM-L6-v2"; empty (or not installed) uses hashed TF-IDF
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "")
+# Dimensions of the hashed TF-IDF vectors
+EMBEDDING_HASH_DIM = int(os.environ.get("EMBEDDING_HASH_DIM", "256"))
+
+class HashedTfidfEmbedder:
+    """
+    Hashing-trick term vectors: unigrams and bigrams hashed into a fixed number
+    of buckets with sublinear term frequency. The IDF part is applied by the
+    vector index, which knows the document frequency of every bucket.
+    """
+
+    weighting = "idf"
+
+    def __init__(self, dim: int = EMBEDDING_HASH_DIM):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+
+    def embed_one(self, text: str) -> np.ndarray:
+        terms = tokenize(text)
+        features = Counter(terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])])
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in features.items():
+            # crc32 rather than hash(): vectors are stored, so buckets must not change between runs
+            vector[zlib.crc32(feature.encode()) % self.dim] += 1 + math.log(count)
+        return vector
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self.embed_one(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+class SentenceEmbedder:
+    """
+    Small local transformer model run on the CPU, producing normalized vectors
+    """
+
+    weighting = None
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """
+    Return the configured embedder, falling back to hashed TF-IDF when the
+    model is not set or sentence-transformers is not installed
+    """
+    if EMBEDDING_MODEL:
+        try:
+            return SentenceEmbedder(EMBEDDING_MODEL)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, using hashed TF-IDF embeddings")
+    return HashedTfidfEmbedder()
+
+def vector_to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+def vector_from_bytes(blob: bytes, dim: Optional[int] = None) -> np.ndarray:
+    vector = np.frombuffer(blob, dtype="<f4")
+    if dim is not None and vector.shape[0] != dim:
+        raise ValueError(f"Stored vector has {vector.shape[0]} dimensions, expected {dim}")
+    return vector.astype(np.float32)
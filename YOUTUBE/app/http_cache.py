@@ -0,0 +1,75 @@
+from typing import List, Optional, Type
+import hashlib
+import os
+import uuid
+
+from fastapi import Response
+from odmantic import Model
+
+from app.shared_state import SharedState, shared_state
+
+# Summaries are updated in place when a video is summarized again or gains
+# chapters, so like lists they are revalidated with their ETag on every use
+SUMMARY_CACHE_CONTROL = "no-cache"
+LIST_CACHE_CONTROL = "no-cache"
+
+class CollectionVersions:
+    """
+    Per-collection write counters kept in the shared state, so every worker
+    tags lists alike. Every write made through the API bumps its collection
+    after it completes, so a list response tagged with the current version can
+    be revalidated without querying the database. Each worker start sets a new
+    epoch, so tags from before a restart never match.
+    """
+
+    def __init__(self, state: Optional[SharedState] = None):
+        self.state = state or shared_state
+        self.epoch = uuid.uuid4().hex[:8]
+
+    async def start(self):
+        """
+        Publish this worker's epoch, called from the application lifespan
+        """
+        await self.state.set("versions:epoch", self.epoch)
+
+    async def get(self, model: Type[Model]) -> int:
+        return int(await self.state.get(f"versions:{model.__collection__}") or 0)
+
+    async def bump(self, model: Type[Model]) -> int:
+        return await self.state.incr(f"versions:{model.__collection__}")
+
+    async def tag(self, model: Type[Model]) -> str:
+        epoch, version = await self.state.get_many(["versions:epoch", f"versions:{model.__collection__}"])
+        return f"{epoch or self.epoch}.{version or 0}"
+
+    async def stats(self, models: List[Type[Model]]) -> dict:
+        keys = ["versions:epoch", *(f"versions:{m.__collection__}" for m in models)]
+        epoch, *versions = await self.state.get_many(keys)
+        return {
+            "epoch": epoch,
+            "versions": {m.__collection__: int(v or 0) for m, v in zip(models, versions)}
+        }
+
+collection_versions = CollectionVersions()
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong entity tag from the values that identify a representation
+    """
+    key = "\x1f".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate If-None-Match against an entity tag; GET uses the weak comparison,
+    so a W/ prefix on the client's tag is ignored
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (t.strip() for t in if_none_match.split(","))
+    return etag in (t[2:] if t.startswith("W/") else t for t in candidates)
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,188 @@
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Connection pool and retry settings for outbound API calls
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+HTTP_PER_HOST_CONCURRENCY = int(os.environ.get("HTTP_PER_HOST_CONCURRENCY", "16"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BASE_DELAY = float(os.environ.get("HTTP_RETRY_BASE_DELAY", "0.5"))
+HTTP_RETRY_MAX_DELAY = float(os.environ.get("HTTP_RETRY_MAX_DELAY", "20"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class HTTPClients:
+    client: httpx.AsyncClient = None
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+
+http = HTTPClients()
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build a pooled client that keeps connections alive between calls
+    """
+    use_http2 = HTTP2_ENABLED and http2_available()
+    if HTTP2_ENABLED and not use_http2:
+        logger.warning("h2 is not installed, falling back to HTTP/1.1")
+
+    return httpx.AsyncClient(
+        http2=use_http2,
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+async def start_http_client():
+    """
+    Create the shared client, called from the application lifespan
+    """
+    if http.client is None:
+        http.client = create_http_client()
+        logger.info("Started shared HTTP client")
+
+async def close_http_client():
+    """
+    Close the shared client and its pooled connections
+    """
+    try:
+        if http.client is not None:
+            await http.client.aclose()
+            logger.info("Closed shared HTTP client")
+    except Exception as e:
+        logger.error("Error closing HTTP client: %s", e)
+    finally:
+        http.client = None
+        http.host_limits = {}
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client, creating it lazily outside of the app lifespan
+    """
+    if http.client is None:
+        http.client = create_http_client()
+    return http.client
+
+def host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    if host not in http.host_limits:
+        http.host_limits[host] = asyncio.Semaphore(HTTP_PER_HOST_CONCURRENCY)
+    return http.host_limits[host]
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def retry_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Exponential backoff with full jitter, never shorter than the server's Retry-After
+    """
+    backoff = random.uniform(0, min(HTTP_RETRY_MAX_DELAY, HTTP_RETRY_BASE_DELAY * (2 ** attempt)))
+    if retry_after is not None:
+        return max(retry_after, backoff)
+    return backoff
+
+async def post_with_retries(url: str, max_retries: int = HTTP_MAX_RETRIES, limiter=None, cost: int = 1, **kwargs) -> httpx.Response:
+    """
+    POST through the shared client, retrying on 429/5xx and transport errors.
+    The last response is returned (or the last error raised) once retries run out.
+    An optional limiter (acquire(cost) / observe(response)) is consulted before
+    and after every attempt.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        try:
+            if limiter is not None:
+                await limiter.acquire(cost)
+            async with host_limit(url):
+                response = await client.post(url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt >= max_retries:
+                raise
+            delay = retry_delay(attempt)
+            logger.warning("Request to %s failed (%s), retrying in %.2fs", url, type(e).__name__, delay)
+        else:
+            if limiter is not None:
+                limiter.observe(response)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                return response
+            delay = retry_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            logger.warning("Request to %s returned %d, retrying in %.2fs", url, response.status_code, delay)
+
+        attempt += 1
+        await asyncio.sleep(delay)
+
+@asynccontextmanager
+async def stream_with_retries(url: str, max_retries: int = HTTP_MAX_RETRIES, limiter=None, cost: int = 1, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    POST through the shared client and yield the response without reading its body.
+    Retries happen only before the first byte of a successful response. The
+    per-host slot is taken for each attempt, released during the backoff and
+    held from the successful response until the stream is closed. The
+    optional limiter is used as in post_with_retries.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire(cost)
+        async with host_limit(url):
+            try:
+                response = await client.send(client.build_request("POST", url, **kwargs), stream=True)
+            except httpx.TransportError as e:
+                if attempt >= max_retries:
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning("Request to %s failed (%s), retrying in %.2fs", url, type(e).__name__, delay)
+            else:
+                if limiter is not None:
+                    limiter.observe(response)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    try:
+                        yield response
+                    finally:
+                        await response.aclose()
+                    return
+                await response.aclose()
+                delay = retry_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                logger.warning("Request to %s returned %d, retrying in %.2fs", url, response.status_code, delay)
+
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,327 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+import asyncio
+import logging
+import os
+
+from bson import ObjectId
+
+from app.crud import build_youtube_summary
+from app.llm_limits import LLMUnavailable
+from app.db import db
+from app.log import request_id_var
+from app.metrics import SUMMARY_JOBS_QUEUED
+from app.schema import SummaryJob, YouTubeSummaryCreate
+from app.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Number of summaries processed concurrently in the background
+SUMMARY_JOB_WORKERS = int(os.environ.get("SUMMARY_JOB_WORKERS", "4"))
+# Maximum number of jobs waiting for a worker
+SUMMARY_JOB_QUEUE_SIZE = int(os.environ.get("SUMMARY_JOB_QUEUE_SIZE", "1000"))
+# Number of jobs kept in memory for status polling
+SUMMARY_JOB_HISTORY = int(os.environ.get("SUMMARY_JOB_HISTORY", "10000"))
+# How long a worker process may hold its claim on a running job; a job whose
+# worker died is run again by a worker started after the claim expired
+SUMMARY_JOB_LEASE_SECONDS = float(os.environ.get("SUMMARY_JOB_LEASE_SECONDS", "600"))
+# How often a worker process looks for running or pending jobs whose lease
+# has expired, left behind by a worker process that died; 0 disables it
+SUMMARY_JOB_SWEEP_SECONDS = float(os.environ.get("SUMMARY_JOB_SWEEP_SECONDS", "60"))
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+class JobQueueFull(Exception):
+    pass
+
+class JobQueue:
+    """
+    In-memory queue of summary jobs drained by a pool of async workers.
+    Every state change is also saved through db.engine so unfinished jobs
+    can be picked up again after a restart. When several worker processes
+    share state, a worker claims a job with a lease before running it, so
+    jobs requeued by every worker on startup still run once, and a periodic
+    sweep requeues the jobs of a worker that died once their lease expires.
+    """
+
+    def __init__(self, workers: int = SUMMARY_JOB_WORKERS, maxsize: int = SUMMARY_JOB_QUEUE_SIZE,
+                 state: Optional[SharedState] = None):
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.state = state or shared_state
+        self.queue: Optional[asyncio.Queue] = None
+        self.jobs: "OrderedDict[str, SummaryJob]" = OrderedDict()
+        self.workers: List[asyncio.Task] = []
+        self.retries: Set[asyncio.Task] = set()
+        self.feeder: Optional[asyncio.Task] = None
+        self.sweeper: Optional[asyncio.Task] = None
+        # Jobs the sweep has queued that no worker has taken yet
+        self.swept: Set[str] = set()
+
+    async def start(self):
+        """
+        Start the workers and requeue jobs left unfinished by a previous run
+        """
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        try:
+            unfinished = await db.engine.find(
+                SummaryJob, SummaryJob.status.in_([JOB_PENDING, JOB_RUNNING])
+            )
+        except Exception as e:
+            logger.error("Error loading unfinished jobs: %s", e)
+            unfinished = []
+
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+        ]
+        logger.info("Started %d summary job workers", self.worker_count)
+
+        if unfinished:
+            # More jobs may be unfinished than fit in the queue: feed them in
+            # as the workers make room instead of failing the startup
+            self.feeder = asyncio.create_task(self._requeue(unfinished))
+            logger.info("Requeueing %d unfinished summary jobs", len(unfinished))
+        if self.state.distributed and SUMMARY_JOB_SWEEP_SECONDS > 0:
+            self.sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def _requeue(self, jobs: List[SummaryJob]):
+        for job in jobs:
+            job.status = JOB_PENDING
+            self._remember(job)
+            await self.queue.put(str(job.id))
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(SUMMARY_JOB_SWEEP_SECONDS)
+            await self.sweep()
+
+    async def sweep(self) -> int:
+        """
+        Requeue running or pending jobs that have not changed for a lease
+        period and whose lease has expired; returns how many were requeued.
+        A job another worker still has queued may be requeued too, but the
+        claim before running it keeps it from running twice.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=SUMMARY_JOB_LEASE_SECONDS)
+        try:
+            stale = await db.engine.find(
+                SummaryJob,
+                SummaryJob.status.in_([JOB_PENDING, JOB_RUNNING]),
+                SummaryJob.updated_at < cutoff
+            )
+            stale = [job for job in stale if str(job.id) not in self.swept]
+            leases = await self.state.get_many([f"job:{job.id}" for job in stale]) if stale else []
+        except Exception as e:
+            logger.error("Error sweeping summary jobs: %s", e)
+            return 0
+
+        orphaned = [job for job, lease in zip(stale, leases) if lease is None]
+        for job in orphaned:
+            job_id = str(job.id)
+            self._remember(job)
+            self.swept.add(job_id)
+            await self.queue.put(job_id)
+        if orphaned:
+            logger.warning("Requeued %d summary jobs whose lease expired", len(orphaned))
+        return len(orphaned)
+
+    async def stop(self):
+        """
+        Cancel the workers; jobs still pending stay persisted for the next start
+        """
+        tasks = [*self.workers, *self.retries, *(t for t in (self.feeder, self.sweeper) if t)]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.retries = set()
+        self.feeder = None
+        self.sweeper = None
+        logger.info("Stopped summary job workers")
+
+    def _remember(self, job: SummaryJob):
+        self.jobs[str(job.id)] = job
+        self.jobs.move_to_end(str(job.id))
+        while len(self.jobs) > SUMMARY_JOB_HISTORY:
+            self.jobs.popitem(last=False)
+
+    async def _persist(self, job: SummaryJob):
+        try:
+            await db.engine.save(job)
+        except Exception as e:
+            logger.error("Error saving job %s: %s", job.id, e)
+
+    async def _forget(self, job: SummaryJob):
+        try:
+            await db.engine.delete(job)
+        except Exception as e:
+            logger.error("Error deleting job %s: %s", job.id, e)
+
+    async def submit(self, summary_data: YouTubeSummaryCreate) -> SummaryJob:
+        """
+        Queue a summary job and return it immediately
+        """
+        if self.queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self.queue.full():
+            raise JobQueueFull("Too many summary jobs are waiting")
+
+        job = SummaryJob(url=summary_data.url, detail=summary_data.detail)
+        self._remember(job)
+        await self._persist(job)
+        try:
+            self.queue.put_nowait(str(job.id))
+        except asyncio.QueueFull:
+            # Concurrent submits filled the queue while this job was saved:
+            # drop it rather than leave a pending job nobody will run
+            self.jobs.pop(str(job.id), None)
+            await self._forget(job)
+            raise JobQueueFull("Too many summary jobs are waiting")
+        return job
+
+    async def get(self, job_id: str) -> Optional[SummaryJob]:
+        """
+        Look up a job in memory, falling back to the database. With several
+        workers another worker may be running it, so the database comes first.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None and not self.state.distributed:
+            return job
+        try:
+            return await db.engine.find_one(SummaryJob, SummaryJob.id == ObjectId(job_id)) or job
+        except Exception as e:
+            logger.error("Error fetching job %s: %s", job_id, e)
+            return job
+
+    async def _load(self, job_id: str) -> Optional[SummaryJob]:
+        """
+        Read a queued job that has been evicted from the in-memory history;
+        None when it is gone or already finished
+        """
+        try:
+            job = await db.engine.find_one(SummaryJob, SummaryJob.id == ObjectId(job_id))
+        except Exception as e:
+            logger.error("Error loading job %s: %s", job_id, e)
+            return None
+        if job is None or job.status in (JOB_DONE, JOB_FAILED):
+            return None
+        self._remember(job)
+        return job
+
+    async def _set_status(self, job: SummaryJob, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.updated_at = datetime.utcnow()
+        await self._persist(job)
+
+    def _retry_later(self, job_id: str, delay: float):
+        """
+        Put a job back on the queue once the LLM is expected to be available again
+        """
+        async def requeue():
+            await asyncio.sleep(delay)
+            await self.queue.put(job_id)
+
+        task = asyncio.create_task(requeue())
+        self.retries.add(task)
+        task.add_done_callback(self.retries.discard)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self.swept.discard(job_id)
+            try:
+                job = self.jobs.get(job_id) or await self._load(job_id)
+                if job is None:
+                    continue
+                token = await self._claim(job)
+                if token is None:
+                    continue
+                try:
+                    await self._run(job)
+                finally:
+                    if token is not True:
+                        await self._release(job_id, token)
+            finally:
+                self.queue.task_done()
+
+    async def _claim(self, job: SummaryJob):
+        """
+        Claim a job for this worker process: True when state is not shared,
+        the lease token when it is, None when another worker has the job or
+        has already finished it
+        """
+        if not self.state.distributed:
+            return True
+        job_id = str(job.id)
+        try:
+            token = await self.state.acquire_lease(f"job:{job_id}", SUMMARY_JOB_LEASE_SECONDS)
+        except Exception as e:
+            logger.error("Error claiming job %s: %s", job_id, e)
+            return None
+        if token is None:
+            return None
+        try:
+            current = await db.engine.find_one(SummaryJob, SummaryJob.id == job.id)
+        except Exception as e:
+            logger.error("Error fetching job %s: %s", job_id, e)
+            current = None
+        if current is not None and current.status in (JOB_DONE, JOB_FAILED):
+            self._remember(current)
+            await self._release(job_id, token)
+            return None
+        return token
+
+    async def _release(self, job_id: str, token: str):
+        try:
+            await self.state.release_lease(f"job:{job_id}", token)
+        except Exception as e:
+            logger.error("Error releasing job %s: %s", job_id, e)
+
+    async def _run(self, job: SummaryJob):
+        job_id = str(job.id)
+        # Log lines written while the job runs carry its ID
+        request_id_var.set(f"job-{job_id}")
+        await self._set_status(job, JOB_RUNNING)
+        try:
+            result = await build_youtube_summary(YouTubeSummaryCreate(url=job.url, detail=job.detail))
+        except LLMUnavailable as e:
+            # The LLM circuit is open: keep the job pending and try again after the cooldown
+            logger.warning("Summary job %s deferred: %s", job_id, e)
+            await self._set_status(job, JOB_PENDING)
+            self._retry_later(job_id, e.retry_after)
+        except Exception as e:
+            logger.error("Summary job %s failed: %s", job_id, e)
+            await self._set_status(job, JOB_FAILED, error=str(e))
+        else:
+            await self._set_status(job, JOB_DONE, result=result)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.workers),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "deferred": len(self.retries),
+            "requeueing": self.feeder is not None and not self.feeder.done(),
+            "swept": len(self.swept),
+            "tracked": len(self.jobs)
+        }
+
+def job_to_dict(job: SummaryJob) -> dict:
+    return {
+        "id": str(job.id),
+        "url": job.url,
+        "detail": job.detail,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat()
+    }
+
+summary_jobs = JobQueue()
+SUMMARY_JOBS_QUEUED.set_function(lambda: summary_jobs.queue.qsize() if summary_jobs.queue is not None else 0)
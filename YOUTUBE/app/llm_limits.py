@@ -0,0 +1,301 @@
+from typing import Dict, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import re
+import time
+
+import httpx
+
+from app.http_client import parse_retry_after
+from app.metrics import OPENAI_BREAKER_STATE, OPENAI_RATE_LIMIT_WAIT_SECONDS
+from app.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Default quota of a model profile; both buckets also adapt to the x-ratelimit-* response headers. 0 disables a bucket.
+OPENAI_RPM = int(os.environ.get("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.environ.get("OPENAI_TPM", "200000"))
+# Consecutive upstream failures that open the circuit, and how long it stays open
+OPENAI_BREAKER_FAILURES = int(os.environ.get("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_COOLDOWN = float(os.environ.get("OPENAI_BREAKER_COOLDOWN", "30"))
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+class LLMUnavailable(Exception):
+    """
+    Raised instead of calling the LLM while its circuit is open
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"The summarization service is unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse OpenAI reset durations such as "1s", "6m0s" or "120ms" into seconds
+    """
+    if not value:
+        return None
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        return parse_retry_after(value)
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at per_minute / 60 per second. Callers
+    wait in line for their amount instead of failing; the bucket can be paused,
+    resized and drained from what the upstream reports. With a shared_key and
+    state shared between workers, the level lives in the shared store so all
+    workers draw from one budget; pauses also apply locally right away.
+    """
+
+    def __init__(self, per_minute: int, shared_key: Optional[str] = None, state: Optional[SharedState] = None):
+        self.state = state or shared_state
+        self.quota = float(per_minute)
+        self.capacity = self.quota
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+        self.shared_key = shared_key if self.state.distributed else None
+        self._updates: Set[asyncio.Task] = set()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        if self.capacity <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.shared_key:
+                    try:
+                        wait = await self.state.take_tokens(
+                            self.shared_key, min(amount, self.capacity), self.capacity, self.rate
+                        )
+                    except Exception as e:
+                        # Fall back to this worker's own bucket
+                        logger.error("Error taking from shared rate limit %s: %s", self.shared_key, e)
+                        wait = None
+                    if wait is not None:
+                        if wait <= 0:
+                            return
+                        await asyncio.sleep(wait)
+                        continue
+                self._refill()
+                # A request larger than the whole bucket waits for a full bucket
+                needed = min(amount, self.capacity)
+                if self.level >= needed:
+                    self.level -= needed
+                    return
+                await asyncio.sleep((needed - self.level) / self.rate)
+
+    def _update_shared(self, **changes):
+        """
+        Apply a change to the shared level in the background; these are called
+        from synchronous code and an update arriving a moment late is harmless
+        """
+        async def update():
+            try:
+                await self.state.adjust_bucket(self.shared_key, self.capacity, self.rate, **changes)
+            except Exception as e:
+                logger.error("Error updating shared rate limit %s: %s", self.shared_key, e)
+
+        task = asyncio.get_running_loop().create_task(update())
+        self._updates.add(task)
+        task.add_done_callback(self._updates.discard)
+
+    def credit(self, amount: float):
+        """
+        Give back tokens reserved but not used
+        """
+        if self.capacity <= 0:
+            return
+        if self.shared_key:
+            self._update_shared(credit=amount)
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float]):
+        """
+        Adopt the limit and remaining budget reported by the upstream, never
+        going above our own quota (the upstream limit may be shared)
+        """
+        if self.capacity <= 0:
+            return
+        self._refill()
+        if limit:
+            self.capacity = min(self.quota, float(limit))
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            if self.shared_key:
+                self._update_shared(cap_level=float(remaining))
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        if self.shared_key and self.capacity > 0:
+            self._update_shared(pause_until=time.time() + seconds)
+
+class LLMRateLimiter:
+    """
+    Shared request and token budget for the calls to one LLM endpoint. Each
+    attempt reserves one request and its estimated tokens; rate-limit headers
+    and 429s from the upstream resize, drain or pause the buckets for all
+    callers at once. A named limiter shares its budget across workers.
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM, name: Optional[str] = None,
+                 state: Optional[SharedState] = None):
+        self.requests = TokenBucket(rpm, f"llm:{name}:requests" if name else None, state)
+        self.tokens = TokenBucket(tpm, f"llm:{name}:tokens" if name else None, state)
+        self.throttled = 0
+
+    async def acquire(self, cost: int):
+        started = time.monotonic()
+        await self.requests.acquire(1)
+        await self.tokens.acquire(cost)
+        OPENAI_RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - started)
+
+    def observe(self, response: httpx.Response):
+        headers = response.headers
+
+        def header(name: str) -> Optional[float]:
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        self.requests.observe(header("x-ratelimit-limit-requests"), header("x-ratelimit-remaining-requests"))
+        self.tokens.observe(header("x-ratelimit-limit-tokens"), header("x-ratelimit-remaining-tokens"))
+
+        if response.status_code == 429:
+            self.throttled += 1
+            wait = parse_retry_after(headers.get("retry-after"))
+            if wait is None:
+                wait = max(
+                    parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0
+                ) or 1.0
+            self.requests.pause(wait)
+            self.tokens.pause(wait)
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """
+        Return the unused part of a token reservation once the real usage is known
+        """
+        if used is not None and used < reserved:
+            self.tokens.credit(reserved - used)
+
+    def stats(self) -> dict:
+        self.requests._refill()
+        self.tokens._refill()
+        # The level of a shared bucket is in the shared store, not here
+        shared = self.requests.shared_key is not None
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "requests_available": None if shared else round(self.requests.level, 1),
+            "tokens_per_minute": self.tokens.capacity,
+            "tokens_available": None if shared else round(self.tokens.level),
+            "shared": shared,
+            "throttled": self.throttled
+        }
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream after repeated failures. While open, calls fail
+    fast with LLMUnavailable; after the cooldown a single probe call is let
+    through and its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failures: int = OPENAI_BREAKER_FAILURES, cooldown: float = OPENAI_BREAKER_COOLDOWN):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        # Start of the half-open probe; a probe that never reports back expires after the cooldown
+        self.probe_started: Optional[float] = None
+        self.rejected = 0
+
+    def check(self):
+        """
+        Raise LLMUnavailable unless a call may go through now
+        """
+        if self.state == BREAKER_CLOSED or self.threshold <= 0:
+            return
+        now = time.monotonic()
+        if self.state == BREAKER_OPEN:
+            remaining = self.opened_at + self.cooldown - now
+            if remaining > 0:
+                self.rejected += 1
+                raise LLMUnavailable(remaining)
+            self.state = BREAKER_HALF_OPEN
+        if self.probe_started is not None and now - self.probe_started < self.cooldown:
+            self.rejected += 1
+            raise LLMUnavailable(1.0)
+        self.probe_started = now
+
+    def record(self, status_code: Optional[int]):
+        """
+        Record the outcome of a call: None for a transport error, otherwise the
+        final status code. 429 and 5xx count as failures.
+        """
+        self.probe_started = None
+        if status_code is not None and status_code != 429 and status_code < 500:
+            if self.state != BREAKER_CLOSED:
+                logger.info("LLM circuit closed")
+            self.state = BREAKER_CLOSED
+            self.failures = 0
+            return
+
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN or (self.state == BREAKER_CLOSED and self.failures >= self.threshold > 0):
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+            logger.warning("LLM circuit opened after %d failures, cooling down for %.0fs", self.failures, self.cooldown)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+# One limiter and breaker per model profile, so a throttled or failing
+# endpoint does not hold back the others. Limiters share their budget across
+# workers when state is shared; breakers stay per worker, each worker learns
+# of a failing endpoint from its own calls.
+llm_guards: Dict[str, Tuple[LLMRateLimiter, CircuitBreaker]] = {}
+
+def get_llm_guards(profile: str, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM) -> Tuple[LLMRateLimiter, CircuitBreaker]:
+    """
+    Return the rate limiter and circuit breaker of a model profile, creating them on first use
+    """
+    guards = llm_guards.get(profile)
+    if guards is None:
+        breaker = CircuitBreaker()
+        guards = llm_guards[profile] = (LLMRateLimiter(rpm, tpm, name=profile), breaker)
+        OPENAI_BREAKER_STATE.labels(profile=profile).set_function(
+            lambda: {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 1, BREAKER_OPEN: 2}[breaker.state]
+        )
+    return guards
+
+def llm_guard_stats() -> dict:
+    return {
+        profile: {"rate_limit": limiter.stats(), "circuit": breaker.stats()}
+        for profile, (limiter, breaker) in llm_guards.items()
+    }
@@ -0,0 +1,98 @@
+from typing import List, Optional
+import hashlib
+import json
+import logging
+import os
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.llm_limits import OPENAI_RPM, OPENAI_TPM
+
+logger = logging.getLogger(__name__)
+
+# Single-endpoint configuration, used when LLM_MODELS is not set
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+OPENAI_API_URL = os.environ.get("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# JSON list of model profiles, cheapest first, or the path of a file holding it
+LLM_MODELS = os.environ.get("LLM_MODELS", "")
+# Summaries shorter than this many words are retried on the next profile
+LLM_MIN_SUMMARY_WORDS = int(os.environ.get("LLM_MIN_SUMMARY_WORDS", "40"))
+
+# Target length and completion limit of each detail level
+DETAIL_LEVELS = {
+    "brief": {"words": 120, "max_tokens": 300},
+    "standard": {"words": 250, "max_tokens": int(os.environ.get("SUMMARY_MAX_TOKENS", "500"))},
+    "detailed": {"words": 500, "max_tokens": 1000},
+}
+DEFAULT_DETAIL = "standard"
+
+class ModelProfile(BaseModel):
+    """
+    One OpenAI-compatible chat completions endpoint and the requests it should serve
+    """
+    name: str
+    model: str
+    url: str = OPENAI_API_URL
+    # Either the key itself or the name of the environment variable holding it;
+    # local model servers usually need neither
+    api_key: str = ""
+    api_key_env: Optional[str] = None
+    # Largest prepared transcript, in tokens, routed to this profile; 0 means any size
+    max_input_tokens: int = 0
+    details: List[str] = Field(default_factory=lambda: list(DETAIL_LEVELS))
+    rpm: int = OPENAI_RPM
+    tpm: int = OPENAI_TPM
+
+    def key(self) -> str:
+        return self.api_key or os.environ.get(self.api_key_env or "", "")
+
+def load_profiles(config: str = LLM_MODELS) -> List[ModelProfile]:
+    """
+    Read the model profiles from LLM_MODELS, or build the single OPENAI_* profile
+    """
+    if not config.strip():
+        return [ModelProfile(name="default", model=OPENAI_MODEL, url=OPENAI_API_URL, api_key=OPENAI_API_KEY)]
+    if not config.lstrip().startswith("["):
+        with open(config) as f:
+            config = f.read()
+    profiles = TypeAdapter(List[ModelProfile]).validate_json(config)
+    if not profiles:
+        raise ValueError("LLM_MODELS must list at least one model profile")
+    return profiles
+
+MODEL_PROFILES = load_profiles()
+
+def routing_version(profiles: List[ModelProfile]) -> str:
+    """
+    Fingerprint of the routing table, part of the summary cache key so that
+    changing the models or their thresholds does not serve stale summaries
+    """
+    table = [p.model_dump(include={"name", "model", "url", "max_input_tokens", "details"}) for p in profiles]
+    return hashlib.sha1(json.dumps(table, sort_keys=True).encode()).hexdigest()[:8]
+
+ROUTING_VERSION = routing_version(MODEL_PROFILES)
+
+def route(tokens: int, detail: str = DEFAULT_DETAIL, profiles: Optional[List[ModelProfile]] = None) -> List[ModelProfile]:
+    """
+    Return the profiles to try for a transcript, in order: the first (cheapest)
+    profile that takes this detail level and transcript size, followed by every
+    later one to escalate to
+    """
+    profiles = profiles if profiles is not None else MODEL_PROFILES
+    eligible = [p for p in profiles if detail in p.details] or profiles
+    for i, profile in enumerate(eligible):
+        if not profile.max_input_tokens or tokens <= profile.max_input_tokens:
+            return eligible[i:]
+    # Too long for every profile: the transcript is chunked anyway, use the largest
+    return eligible[-1:]
+
+def acceptable_summary(summary: Optional[str], detail: str = DEFAULT_DETAIL) -> bool:
+    """
+    Cheap quality check deciding whether to escalate to the next profile
+    """
+    if not summary:
+        return False
+    minimum = min(LLM_MIN_SUMMARY_WORDS, DETAIL_LEVELS[detail]["words"] // 3)
+    return len(summary.split()) >= minimum
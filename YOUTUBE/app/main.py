@@ -1,20 +1,45 @@
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
+from app.log import configure_logging
+configure_logging()
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
-from app.router import router
-from app.db import initialize_database, close_mongo_connection
+from app.router import router, debug_router, DEBUG_ENDPOINTS
+from app.crud import prune_summary_cache
+from app.db import db, initialize_database, close_mongo_connection, MockEngine
+from app.http_cache import collection_versions
+from app.http_client import start_http_client, close_http_client
+from app.jobs import summary_jobs
+from app.transcripts import close_transcript_provider
+from app.middleware import RequestContextMiddleware
+from app.shared_state import shared_state
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Runs once in every worker process: the database client, HTTP client and
+# job workers are created here, after the worker has started, never at import
 async def lifespan(app: FastAPI):
-    print("Starting up...")
+    logger.info("Starting up worker %d...", os.getpid())
     await initialize_database()
+    if shared_state.distributed and isinstance(db.engine, MockEngine):
+        logger.warning("The mock database is private to each worker process; use MongoDB when running several workers")
+    await collection_versions.start()
+    await prune_summary_cache()
+    await start_http_client()
+    await summary_jobs.start()
     yield
-    print("Shutting down...")
+    logger.info("Shutting down...")
+    await summary_jobs.stop()
+    await close_transcript_provider()
+    await close_http_client()
     await close_mongo_connection()
+    await shared_state.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -25,9 +50,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID", "ETag"],
 )
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(router)
+if DEBUG_ENDPOINTS:
+    app.include_router(debug_router)
 
 # Add a root endpoint to redirect to the frontend
 @app.get("/", include_in_schema=False)
@@ -0,0 +1,79 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Latency buckets in seconds, from sub-millisecond DB reads up to multi-minute map-reduce summaries
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling API requests",
+    ["method", "route", "status"],
+    buckets=SLOW_BUCKETS
+)
+
+SUMMARY_STAGE_SECONDS = Histogram(
+    "summary_stage_duration_seconds",
+    "Time spent in each stage of creating a summary: cache_lookup, transcript, llm, db_write, total",
+    ["stage"],
+    buckets=SLOW_BUCKETS
+)
+
+OPENAI_REQUEST_SECONDS = Histogram(
+    "openai_request_duration_seconds",
+    "Time until an OpenAI response (or the first streamed byte) is received, retries included",
+    ["model", "stream"],
+    buckets=SLOW_BUCKETS
+)
+
+OPENAI_REQUESTS = Counter(
+    "openai_requests_total",
+    "OpenAI requests by final HTTP status code, or 'error' if no response was received",
+    ["model", "status"]
+)
+
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total",
+    "Tokens reported in OpenAI usage, by kind (prompt or completion)",
+    ["model", "kind"]
+)
+
+OPENAI_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "openai_rate_limit_wait_seconds",
+    "Time LLM calls waited for the shared request/token budget",
+    buckets=FAST_BUCKETS + (10.0, 30.0, 60.0)
+)
+
+OPENAI_BREAKER_STATE = Gauge(
+    "openai_circuit_state",
+    "LLM circuit breaker state per model profile: 0 closed, 1 half-open, 2 open",
+    ["profile"]
+)
+
+TRANSCRIPT_TOKENS = Counter(
+    "transcript_tokens_total",
+    "Transcript tokens before preprocessing (raw) and after (sent to the LLM)",
+    ["stage"]
+)
+
+DB_OPERATION_SECONDS = Histogram(
+    "db_operation_duration_seconds",
+    "Time spent in database operations",
+    ["operation", "collection"],
+    buckets=FAST_BUCKETS
+)
+
+SUMMARY_CACHE_ENTRIES = Gauge("summary_cache_entries", "Summaries held in the in-process cache")
+SUMMARY_FLIGHTS_IN_FLIGHT = Gauge("summary_flights_in_flight", "Summaries being computed right now")
+SUMMARY_JOBS_QUEUED = Gauge("summary_jobs_queued", "Background summary jobs waiting for a worker")
+
+def record_openai_usage(model: str, usage: dict):
+    """
+    Count the prompt and completion tokens of an OpenAI response
+    """
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            OPENAI_TOKENS.labels(model=model, kind=kind).inc(tokens)
+
+def metrics_payload() -> bytes:
+    return generate_latest()
@@ -0,0 +1,61 @@
+import logging
+import re
+import time
+import uuid
+
+from app.log import request_id_var
+from app.metrics import HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "x-request-id"
+# Accept caller-provided IDs only if they are short and printable
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+class RequestContextMiddleware:
+    """
+    Give every request an ID (taken from X-Request-ID or generated), make it
+    available to log records, echo it in the response and record the request
+    latency by route template
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        token = request_id_var.set(request_id)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Label by route template rather than raw path to keep the number of series bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(elapsed)
+            logger.info(
+                "%s %s %d %.1fms", scope["method"], scope["path"], status, elapsed * 1000,
+                extra={"method": scope["method"], "path": scope["path"], "status": status, "duration_ms": round(elapsed * 1000, 1)}
+            )
+            request_id_var.reset(token)
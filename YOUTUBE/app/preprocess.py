@@ -0,0 +1,172 @@
+from collections import Counter
+from typing import List, Tuple
+import math
+import os
+import logging
+import re
+
+
+from app.chunking import count_tokens, tokenizer_name
+from app.metrics import TRANSCRIPT_TOKENS
+from app.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Transcripts above this many tokens (after cleanup) are cut down to their most
+# salient sentences before summarization; 0 disables trimming
+TRANSCRIPT_TOKEN_BUDGET = int(os.environ.get("TRANSCRIPT_TOKEN_BUDGET", "24000"))
+# How many preceding caption lines are checked for repeats
+CAPTION_DEDUPE_WINDOW = int(os.environ.get("CAPTION_DEDUPE_WINDOW", "3"))
+
+# Non-speech markers: [Music], [Applause], (laughter), ♪ lyrics ♪, >> speaker changes
+MARKER_RE = re.compile(r"\[[^\]]*\]|♪[^♪]*♪|\((?:music|applause|laughter|laughs|inaudible|silence|cheering)\)|[♪♫]+|>>", re.IGNORECASE)
+# Timestamps spoken or pasted into the caption text, e.g. 01:23 or 1:02:03
+TIMESTAMP_RE = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b")
+FILLER_RE = re.compile(r"\b(?:um+|uh+|uhm|erm|hmm+|mhm)\b[,.]?\s*", re.IGNORECASE)
+SPACE_RE = re.compile(r"\s+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*$")
+
+# Running totals over all prepared transcripts, reported by /youtube-summary-stats/
+prompt_totals = {"transcripts": 0, "trimmed": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+
+def clean_caption(text: str) -> str:
+    """
+    Remove non-speech markers, timestamps and filler words from one caption line
+    """
+    text = MARKER_RE.sub(" ", text)
+    text = TIMESTAMP_RE.sub(" ", text)
+    text = FILLER_RE.sub("", text)
+    return SPACE_RE.sub(" ", text).strip()
+
+def drop_overlap(previous: List[str], words: List[str]) -> List[str]:
+    """
+    Drop the words of a rolling caption that repeat the end of the previous
+    line; single-word overlaps are left alone as they are usually genuine
+    """
+    for size in range(min(len(previous), len(words)), 1, -1):
+        if [w.lower() for w in previous[-size:]] == [w.lower() for w in words[:size]]:
+            return words[size:]
+    return words
+
+def dedupe_captions(segments: List[dict]) -> Tuple[List[dict], int]:
+    """
+    Remove caption lines that repeat one of the last few lines, and the
+    overlapping words of rolling auto-captions. Returns the kept segments and
+    the number of dropped ones.
+    """
+    kept = []
+    recent: List[str] = []
+    dropped = 0
+    for segment in segments:
+        key = segment["text"].lower()
+        if key in recent:
+            dropped += 1
+            continue
+        recent = (recent + [key])[-CAPTION_DEDUPE_WINDOW:]
+
+        words = segment["text"].split()
+        if kept:
+            words = drop_overlap(kept[-1]["text"].split(), words)
+        if not words:
+            dropped += 1
+            continue
+        kept.append({**segment, "text": " ".join(words)})
+    return kept, dropped
+
+def split_sentences(segments: List[dict]) -> List[dict]:
+    """
+    Regroup caption segments into sentences, keeping the start time of each.
+    Mostly unpunctuated auto-captions are kept one unit per caption line.
+    """
+    punctuated = sum(1 for s in segments if SENTENCE_END_RE.search(s["text"]))
+    if punctuated * 5 < len(segments):
+        return [{"text": s["text"], "start": s.get("start")} for s in segments]
+
+    units = []
+    pending = []
+    start = None
+    for segment in segments:
+        pieces = SENTENCE_RE.split(segment["text"])
+        for i, piece in enumerate(pieces):
+            if start is None:
+                start = segment.get("start")
+            pending.append(piece)
+            if i < len(pieces) - 1 or SENTENCE_END_RE.search(piece):
+                units.append({"text": " ".join(pending), "start": start})
+                pending = []
+                start = None
+    if pending:
+        units.append({"text": " ".join(pending), "start": start})
+    return units
+
+def select_salient(units: List[dict], budget: int) -> List[dict]:
+    """
+    Keep the highest-scoring sentences that fit in the token budget, in their
+    original order. A sentence scores by the average document frequency of its
+    terms, so sentences about the video's recurring topics win over asides.
+    """
+    terms = [tokenize(u["text"]) for u in units]
+    frequencies = Counter(t for unit_terms in terms for t in set(unit_terms))
+    costs = [count_tokens(u["text"]) + 1 for u in units]
+
+    def score(i: int) -> float:
+        if not terms[i]:
+            return 0.0
+        return sum(frequencies[t] for t in terms[i]) / math.sqrt(len(terms[i]))
+
+    chosen = set()
+    used = 0
+    for i in sorted(range(len(units)), key=score, reverse=True):
+        if used + costs[i] <= budget:
+            chosen.add(i)
+            used += costs[i]
+    return [units[i] for i in sorted(chosen)]
+
+def prepare_transcript(segments: List[dict], budget: int = TRANSCRIPT_TOKEN_BUDGET) -> Tuple[List[dict], dict]:
+    """
+    Clean transcript segments before they are sent to the LLM: strip markers
+    and fillers, drop repeated captions and, above the token budget, keep only
+    the most salient sentences. Returns the segments and a report of the
+    tokens saved.
+    """
+    tokens_before = sum(count_tokens(s.get("text", "")) for s in segments)
+
+    cleaned = []
+    for segment in segments:
+        text = clean_caption(segment.get("text", ""))
+        if text:
+            cleaned.append({**segment, "text": text})
+    cleaned, duplicates = dedupe_captions(cleaned)
+    tokens_cleaned = sum(count_tokens(s["text"]) for s in cleaned)
+
+    trimmed = False
+    if budget and tokens_cleaned > budget:
+        cleaned = select_salient(split_sentences(cleaned), budget)
+        trimmed = True
+
+    tokens_after = sum(count_tokens(s["text"]) for s in cleaned)
+    return cleaned, {
+        "tokenizer": tokenizer_name(),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "duplicate_segments": duplicates,
+        "trimmed": trimmed
+    }
+
+def record_prompt_report(report: dict):
+    """
+    Log the tokens saved for one transcript and add them to the running totals
+    """
+    prompt_totals["transcripts"] += 1
+    prompt_totals["trimmed"] += int(report["trimmed"])
+    for key in ("tokens_before", "tokens_after", "tokens_saved"):
+        prompt_totals[key] += report[key]
+    TRANSCRIPT_TOKENS.labels(stage="raw").inc(report["tokens_before"])
+    TRANSCRIPT_TOKENS.labels(stage="sent").inc(report["tokens_after"])
+    logger.info(
+        "Prepared transcript: %d -> %d tokens (%d saved)",
+        report["tokens_before"], report["tokens_after"], report["tokens_saved"],
+        extra=report
+    )
@@ -0,0 +1,428 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+from app.db import db, bulk_save, find_documents
+from app.embeddings import get_embedder, vector_to_bytes, vector_from_bytes
+from app.http_cache import collection_versions
+from app.schema import SummaryEmbedding, YouTubeSummary
+from app.shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Indexes with at least this many vectors are partitioned into IVF lists; 0 disables IVF
+RELATED_IVF_MIN_VECTORS = int(os.environ.get("RELATED_IVF_MIN_VECTORS", "20000"))
+# Lists searched per query; more lists means better recall and slower queries
+RELATED_IVF_PROBES = int(os.environ.get("RELATED_IVF_PROBES", "8"))
+# How stale the normalized matrix may get before a query rebuilds it; vectors
+# added in the meantime are still found, by a brute-force pass over them
+RELATED_REBUILD_SECONDS = float(os.environ.get("RELATED_REBUILD_SECONDS", "10"))
+RELATED_MAX_RESULTS = int(os.environ.get("RELATED_MAX_RESULTS", "50"))
+# How long the marker of a deleted summary's vector is kept for other workers
+# to sync; a worker that has not synced for longer checks every stored ID
+RELATED_TOMBSTONE_SECONDS = float(os.environ.get("RELATED_TOMBSTONE_SECONDS", "86400"))
+
+# Rows scored at once when assigning vectors to IVF lists, to bound memory
+ASSIGN_BLOCK = 8192
+# Overlap between syncs with other workers, covering clock skew and slow writes
+SYNC_OVERLAP = timedelta(seconds=30)
+
+class VectorIndex:
+    """
+    In-memory cosine similarity index over float32 vectors. Raw vectors live
+    in one growable matrix; queries run against a weighted, L2-normalized
+    snapshot of it, optionally partitioned into IVF lists by spherical k-means.
+    With IDF weighting, each dimension is scaled by its inverse document
+    frequency across the indexed vectors.
+    """
+
+    def __init__(self, dim: int, weighting: Optional[str] = None, ivf_min_vectors: int = RELATED_IVF_MIN_VECTORS,
+                 probes: int = RELATED_IVF_PROBES, rebuild_seconds: float = RELATED_REBUILD_SECONDS):
+        self.dim = dim
+        self.weighting = weighting
+        self.ivf_min_vectors = ivf_min_vectors
+        self.probes = probes
+        self.rebuild_seconds = rebuild_seconds
+
+        self.raw = np.zeros((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.df = np.zeros(dim, dtype=np.float64)
+
+        # Snapshot used by queries, and the rows changed since it was built;
+        # `building` holds the changed rows a build in progress will take in
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.weights = np.ones(dim, dtype=np.float32)
+        self.changed: set = set()
+        self.building: set = set()
+        self.built_at = 0.0
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self.trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.rows
+
+    def add(self, doc_id: str, vector: np.ndarray):
+        """
+        Add a vector, replacing the previous vector of the same ID
+        """
+        self.remove(doc_id)
+        if self.free:
+            row = self.free.pop()
+        else:
+            row = len(self.ids)
+            if row >= self.raw.shape[0]:
+                capacity = max(1024, 2 * self.raw.shape[0])
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:row] = self.raw[:row]
+                self.raw = grown
+                self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+            self.ids.append(None)
+        self.raw[row] = vector
+        self.alive[row] = True
+        self.ids[row] = doc_id
+        self.rows[doc_id] = row
+        self.df += vector != 0
+        self.changed.add(row)
+
+    def remove(self, doc_id: str):
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        self.df -= self.raw[row] != 0
+        self.raw[row] = 0
+        self.alive[row] = False
+        self.ids[row] = None
+        self.free.append(row)
+        self.changed.add(row)
+
+    def _weigh(self, vectors: np.ndarray) -> np.ndarray:
+        weighted = vectors * self.weights
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return weighted / norms
+
+    def stale(self) -> bool:
+        return bool(self.changed) and time.monotonic() - self.built_at > self.rebuild_seconds
+
+    def snapshot(self) -> tuple:
+        """
+        Take what a build reads. The raw rows are not copied: rows written
+        while the build runs stay in `changed`, so queries never use their
+        entries in the new matrix.
+        """
+        size = len(self.ids)
+        self.building, self.changed = self.changed, set()
+        return self.raw[:size], self.alive[:size].copy(), self.df.copy(), len(self.rows)
+
+    def compute(self, raw: np.ndarray, alive: np.ndarray, df: np.ndarray, live: int) -> dict:
+        """
+        Build the normalized snapshot, and the IVF lists when the index is
+        large enough, without touching the index; safe to run in a thread
+        """
+        weights = self.weights
+        if self.weighting == "idf":
+            weights = (np.log((1 + live) / (1 + df)) + 1).astype(np.float32)
+        weighted = raw * weights
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        built = {"weights": weights, "matrix": weighted / norms, "centroids": None, "lists": [],
+                 "trained_size": self.trained_size}
+
+        if not self.ivf_min_vectors or live < self.ivf_min_vectors:
+            return built
+        # Centroids are retrained when the index has doubled, otherwise only reassigned
+        centroids = self.centroids
+        if centroids is None or live > 2 * self.trained_size:
+            centroids = self._train(built["matrix"], alive, int(np.sqrt(live)))
+            built["trained_size"] = live
+        built["centroids"] = centroids
+        built["lists"] = self._assign(built["matrix"], centroids)
+        return built
+
+    def apply(self, built: dict):
+        self.weights = built["weights"]
+        self.matrix = built["matrix"]
+        self.centroids = built["centroids"]
+        self.lists = built["lists"]
+        self.trained_size = built["trained_size"]
+        self.building = set()
+        self.built_at = time.monotonic()
+
+    def abort(self):
+        """
+        Give back the rows of a build that failed
+        """
+        self.changed |= self.building
+        self.building = set()
+
+    def build(self):
+        """
+        Rebuild the normalized snapshot and IVF lists in place
+        """
+        self.apply(self.compute(*self.snapshot()))
+
+    def _train(self, matrix: np.ndarray, alive: np.ndarray, n_lists: int, iterations: int = 8) -> np.ndarray:
+        """
+        Spherical k-means on a sample of the live rows
+        """
+        rng = np.random.default_rng(0)
+        live = np.flatnonzero(alive)
+        sample = matrix[rng.choice(live, size=min(len(live), 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=n_lists)
+            filled = np.flatnonzero(counts)
+            sums = np.add.reduceat(sample[order], np.concatenate(([0], np.cumsum(counts)[:-1]))[filled])
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            # Empty lists keep their previous centroid
+            centroids[filled] = sums / norms
+        return centroids
+
+    def _assign(self, matrix: np.ndarray, centroids: np.ndarray) -> List[np.ndarray]:
+        assignment = np.concatenate([
+            np.argmax(matrix[start:start + ASSIGN_BLOCK] @ centroids.T, axis=1)
+            for start in range(0, len(matrix), ASSIGN_BLOCK)
+        ]) if len(matrix) else np.zeros(0, dtype=np.int64)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(centroids))
+        return np.split(order, np.cumsum(counts)[:-1])
+
+    def search(self, doc_id: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Return the k IDs most similar to an indexed vector, best first, with
+        their cosine similarity. The snapshot is not rebuilt here; see stale().
+        """
+        row = self.rows[doc_id]
+        query = self._weigh(self.raw[row:row + 1])[0]
+
+        if self.centroids is not None:
+            probes = np.argsort(self.centroids @ query)[-self.probes:]
+            candidates = np.concatenate([self.lists[p] for p in probes])
+            scores = self.matrix[candidates] @ query
+        else:
+            candidates = np.arange(len(self.matrix))
+            scores = self.matrix @ query
+
+        # Rows added, replaced or removed since the snapshot are scored from the raw vectors
+        pending = self.changed | self.building
+        if pending:
+            changed = np.fromiter(pending, dtype=np.int64, count=len(pending))
+            keep = ~np.isin(candidates, changed)
+            candidates = np.concatenate([candidates[keep], changed])
+            scores = np.concatenate([scores[keep], self._weigh(self.raw[changed]) @ query])
+
+        valid = self.alive[candidates] & (candidates != row)
+        candidates, scores = candidates[valid], scores[valid]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.ids[r], float(s)) for r, s in zip(candidates[order], scores[order])]
+
+    def stats(self) -> dict:
+        return {
+            "vectors": len(self.rows),
+            "dim": self.dim,
+            "ivf_lists": len(self.lists),
+            "pending": len(self.changed | self.building)
+        }
+
+class RelatedSummaries:
+    """
+    Embeds summaries when they are saved, persists the vectors as
+    SummaryEmbedding documents and answers related-summary queries from a
+    VectorIndex loaded on first use. Embedding and index builds run in
+    threads. With several workers, each keeps its own index and picks up the
+    vectors other workers stored or deleted whenever the summaries
+    collection version has moved.
+    """
+
+    def __init__(self):
+        self.index: Optional[VectorIndex] = None
+        self.lock = asyncio.Lock()
+        self.build_lock = asyncio.Lock()
+        # Vectors saved (or deleted, None) while the index is loading
+        self.pending: List[Tuple[str, Optional[np.ndarray]]] = []
+        self.synced_version: Optional[int] = None
+        self.synced_at = datetime.utcnow()
+
+    async def load(self) -> VectorIndex:
+        """
+        Load the stored vectors, embedding summaries that have none yet or
+        whose vector came from another embedder
+        """
+        if self.index is not None:
+            return self.index
+        async with self.lock:
+            if self.index is not None:
+                return self.index
+            started = time.perf_counter()
+            if shared_state.distributed:
+                self.synced_version = await collection_versions.get(YouTubeSummary)
+                self.synced_at = datetime.utcnow()
+            try:
+                await db.engine.remove(
+                    SummaryEmbedding, SummaryEmbedding.deleted == True,
+                    SummaryEmbedding.created_at < datetime.utcnow() - timedelta(seconds=RELATED_TOMBSTONE_SECONDS)
+                )
+            except Exception as e:
+                logger.error("Error pruning deleted summary vectors: %s", e)
+
+            embedder = get_embedder()
+            index = VectorIndex(embedder.dim, embedder.weighting)
+            for doc in await find_documents(SummaryEmbedding):
+                if not doc.get("deleted") and doc["embedder"] == embedder.name and doc["dim"] == embedder.dim:
+                    index.add(doc["_id"], vector_from_bytes(doc["vector"], embedder.dim))
+
+            missing = [
+                s for s in await find_documents(YouTubeSummary, projection=["_id", "summary"])
+                if str(s["_id"]) not in index
+            ]
+            if missing:
+                logger.info("Embedding %d summaries without a vector", len(missing))
+                for summary_id, vector in await self._embed([(str(s["_id"]), s["summary"]) for s in missing]):
+                    index.add(summary_id, vector)
+            await asyncio.to_thread(index.build)
+
+            # Summaries saved or deleted while loading, which the reads above may have missed
+            self._apply_changes(index, self.pending)
+            self.pending = []
+            self.index = index
+            logger.info("Loaded %d summary vectors in %.2fs", len(index), time.perf_counter() - started)
+            return index
+
+    def _apply_changes(self, index: VectorIndex, changes: List[Tuple[str, Optional[np.ndarray]]]):
+        for summary_id, vector in changes:
+            if vector is None:
+                index.remove(summary_id)
+            else:
+                index.add(summary_id, vector)
+
+    def _changed(self, changes: List[Tuple[str, Optional[np.ndarray]]]):
+        """
+        Apply saved or deleted vectors to the index, or keep them for the
+        load in progress; without either, load() reads them from the database
+        """
+        if self.index is not None:
+            self._apply_changes(self.index, changes)
+        elif self.lock.locked():
+            self.pending.extend(changes)
+
+    async def _sync(self, index: VectorIndex):
+        """
+        Apply the vectors other workers stored or deleted since the last sync
+        """
+        version = await collection_versions.get(YouTubeSummary)
+        if version == self.synced_version:
+            return
+        now = datetime.utcnow()
+        since = self.synced_at - SYNC_OVERLAP
+        self.synced_version, self.synced_at = version, now
+        embedder = get_embedder()
+        added = removed = 0
+        for doc in await find_documents(SummaryEmbedding, SummaryEmbedding.created_at >= since):
+            if doc.get("deleted"):
+                index.remove(doc["_id"])
+                removed += 1
+            elif doc["embedder"] == embedder.name and doc["dim"] == embedder.dim:
+                index.add(doc["_id"], vector_from_bytes(doc["vector"], embedder.dim))
+                added += 1
+        if since < now - timedelta(seconds=RELATED_TOMBSTONE_SECONDS):
+            # Markers of deletions made since then may be pruned already
+            stored = {
+                doc["_id"] for doc in await find_documents(SummaryEmbedding, projection=["_id", "deleted"])
+                if not doc.get("deleted")
+            }
+            for summary_id in [i for i in index.rows if i not in stored]:
+                index.remove(summary_id)
+                removed += 1
+        logger.debug("Synced %d summary vectors, removed %d", added, removed)
+
+    async def _embed(self, items: List[Tuple[str, str]]) -> List[Tuple[str, np.ndarray]]:
+        """
+        Embed summaries in a thread and persist their vectors
+        """
+        embedder = get_embedder()
+        vectors = await asyncio.to_thread(embedder.embed, [text for _, text in items])
+        await bulk_save([
+            SummaryEmbedding(summary_id=summary_id, embedder=embedder.name, dim=embedder.dim, vector=vector_to_bytes(vector))
+            for (summary_id, _), vector in zip(items, vectors)
+        ])
+        return [(summary_id, vector) for (summary_id, _), vector in zip(items, vectors)]
+
+    async def _rebuild(self, index: VectorIndex):
+        """
+        Rebuild a stale snapshot in a thread; queries meanwhile use the old
+        one, plus the changed rows scored directly
+        """
+        if self.build_lock.locked():
+            return
+        async with self.build_lock:
+            state = index.snapshot()
+            try:
+                built = await asyncio.to_thread(index.compute, *state)
+            except Exception:
+                index.abort()
+                raise
+            index.apply(built)
+
+    async def add(self, summaries: List[YouTubeSummary]):
+        """
+        Embed saved summaries and store their vectors, whether or not the
+        index is loaded; failures are logged, the summaries stay saved
+        """
+        if not summaries:
+            return
+        try:
+            self._changed(await self._embed([(str(s.id), s.summary) for s in summaries]))
+        except Exception as e:
+            logger.error("Error embedding summaries: %s", e)
+
+    async def remove(self, summary_id: str):
+        """
+        Drop a summary's vector, leaving a marker other workers sync
+        """
+        self._changed([(summary_id, None)])
+        try:
+            await db.engine.save(SummaryEmbedding(summary_id=summary_id, embedder="", dim=0, vector=b"", deleted=True))
+        except Exception as e:
+            logger.error("Error deleting embedding of %s: %s", summary_id, e)
+
+    async def related(self, summary_id: str, limit: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """
+        IDs and similarities of the summaries closest to a summary, or None if it is not indexed
+        """
+        index = await self.load()
+        if shared_state.distributed:
+            try:
+                await self._sync(index)
+            except Exception as e:
+                logger.error("Error syncing summary vectors: %s", e)
+        if summary_id not in index:
+            return None
+        if index.stale():
+            try:
+                await self._rebuild(index)
+            except Exception as e:
+                logger.error("Error rebuilding the summary index: %s", e)
+        return index.search(summary_id, max(1, min(limit, RELATED_MAX_RESULTS)))
+
+    def stats(self) -> dict:
+        return self.index.stats() if self.index is not None else {"vectors": None}
+
+related_summaries = RelatedSummaries()
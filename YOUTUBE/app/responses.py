@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Any
+import json
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# orjson is optional; without it responses are encoded with the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def bson_default(value: Any):
+    """
+    Encode the BSON types left in raw documents: ObjectIds as strings, datetimes as ISO 8601
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=bson_default)
+    return json.dumps(content, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class RawJSONResponse(JSONResponse):
+    """
+    JSON response for raw MongoDB documents. It skips FastAPI's response
+    validation and jsonable_encoder pass; ObjectId and datetime values are
+    handled by the encoder itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
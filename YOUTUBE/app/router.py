@@ -1,18 +1,57 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.schema import NoteCreate, YouTubeSummaryCreate, BookmarkCreate
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.schema import NoteCreate, YouTubeSummary, YouTubeSummaryCreate, YouTubeSummaryBatchCreate, BookmarkCreate, Bookmark
 from app.crud import (
     create_note, 
     create_youtube_summary, 
+    stream_youtube_summary,
+    create_chapter_summary,
+    stream_batch_summaries,
     get_youtube_summaries, 
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
     get_youtube_summary, 
+    get_related_summaries,
     delete_youtube_summary,
+    invalidate_summary_cache,
+    get_summary_stats,
     create_bookmark, 
     get_bookmarks, 
-    delete_bookmark
+    delete_bookmark,
+    import_bookmarks,
+    export_bookmarks,
+    BookmarkImportInProgress,
+    EmptyTranscript,
+    search_documents,
+    explain_hot_queries
+)
+from app.jobs import summary_jobs, job_to_dict, JobQueueFull
+from app.llm_limits import LLMUnavailable
+from app.metrics import CONTENT_TYPE_LATEST, metrics_payload
+from app.responses import RawJSONResponse
+from app.related import RELATED_MAX_RESULTS
+from app.shared_state import shared_state
+from app.http_cache import (
+    collection_versions,
+    make_etag,
+    etag_matches,
+    not_modified,
+    LIST_CACHE_CONTROL,
+    SUMMARY_CACHE_CONTROL
 )
 from typing import List, Optional
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Serve the /debug endpoints, which expose internal query plans; off by default
+DEBUG_ENDPOINTS = os.environ.get("DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
 
 router = APIRouter()
+# Included by app.main only when DEBUG_ENDPOINTS is set
+debug_router = APIRouter()
 
 @router.post("/notes/")
 async def create_new_note(note_data: NoteCreate):
@@ -22,28 +61,161 @@ async def create_new_note(note_data: NoteCreate):
     return await create_note(note_data)
 
 @router.post("/youtube-summary/")
-async def create_summary(summary_data: YouTubeSummaryCreate):
+async def create_summary(
+    summary_data: YouTubeSummaryCreate,
+    response: Response,
+    background: bool = Query(False, description="Queue the summary and return a job ID immediately")
+):
     """
     Create a YouTube video summary
+
+    - **background**: When true, respond with 202 and a job ID to poll at `/jobs/{job_id}`
+    """
+    if background:
+        try:
+            job = await summary_jobs.submit(summary_data)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        response.status_code = 202
+        return job_to_dict(job)
+    try:
+        return await create_youtube_summary(summary_data)
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+@router.post("/youtube-summary/stream")
+async def create_summary_stream(summary_data: YouTubeSummaryCreate):
+    """
+    Create a YouTube video summary, streaming it as Server-Sent Events
+
+    - **token** events carry summary text as the LLM produces it
+    - a final **done** event carries the saved summary
     """
-    return await create_youtube_summary(summary_data)
+    async def events():
+        try:
+            async for event, data in stream_youtube_summary(summary_data):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except LLMUnavailable as e:
+            logger.warning("Summary stream rejected: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e), 'retry_after': e.retry_after})}\n\n"
+        except Exception as e:
+            logger.exception("Error streaming summary")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@router.get("/youtube-summaries/")
-async def list_summaries():
+@router.post("/youtube-summary/chapters")
+async def create_summary_chapters(summary_data: YouTubeSummaryCreate):
     """
-    Get all YouTube summaries
+    Summarize a YouTube video chapter by chapter
+
+    - The timed transcript is split into fixed windows, summarized concurrently
+    - Each chapter has its `start`/`end` in seconds, a `title` and a `summary`
+    - Asking again only recomputes chapters whose transcript window changed
+    - Answers 422 when cleaning the transcript leaves no text to summarize
+    """
+    try:
+        return await create_chapter_summary(summary_data)
+    except EmptyTranscript as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+@router.post("/youtube-summaries/batch")
+async def create_summaries_batch(batch: YouTubeSummaryBatchCreate):
+    """
+    Summarize a list of videos and/or a playlist, streaming results as NDJSON
+
+    - **urls**: YouTube URLs or video IDs; duplicates of the same video are summarized once
+    - **playlist_id**: Optional playlist whose videos are added to the batch
+    - **detail**: brief, standard or detailed; picks the summary length and the model
+
+    Each line is one video's result as it completes; the last line has `"status": "done"`.
     """
-    return await get_youtube_summaries()
+    if not batch.urls and not batch.playlist_id:
+        raise HTTPException(status_code=400, detail="Provide urls or a playlist_id")
+
+    async def lines():
+        async for item in stream_batch_summaries(batch):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status of a background summary job
+
+    - **job_id**: The ID returned by `POST /youtube-summary/?background=true`
+    """
+    job = await summary_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.get("/youtube-summaries/", response_class=RawJSONResponse)
+async def list_summaries(
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of summaries to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,url"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get YouTube summaries, newest first
+
+    - **after**: Return summaries older than this cursor
+    - **limit**: Page size
+    - **fields**: Optional projection; `id` is always included
+    - Answers 304 to a matching `If-None-Match` without querying the database
+    """
+    etag = make_etag("summaries", await collection_versions.tag(YouTubeSummary), after, limit, fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, LIST_CACHE_CONTROL)
+    try:
+        summaries, next_cursor = await get_youtube_summaries(after, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # No ETag: an error must not be cached as the current list
+        raise HTTPException(status_code=503, detail="Summaries are temporarily unavailable")
+    headers = {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return RawJSONResponse(summaries, headers=headers)
 
 @router.get("/youtube-summary/{id}")
-async def get_summary(id: str):
+async def get_summary(id: str, if_none_match: Optional[str] = Header(None)):
     """
     Get a specific YouTube summary by ID
+
+    - Answers 304 to a matching `If-None-Match`
     """
     summary = await get_youtube_summary(id)
     if not summary:
         raise HTTPException(status_code=404, detail="Summary not found")
-    return summary
+    etag = make_etag(summary["id"], summary["updated_at"])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, SUMMARY_CACHE_CONTROL)
+    return RawJSONResponse(summary, headers={"ETag": etag, "Cache-Control": SUMMARY_CACHE_CONTROL})
+
+@router.get("/youtube-summary/{id}/related")
+async def list_related_summaries(
+    id: str,
+    limit: int = Query(10, ge=1, le=RELATED_MAX_RESULTS, description="Maximum number of related summaries to return")
+):
+    """
+    Get the summaries most similar in content to a summary, best first
+
+    - Each item has the summary `id`, `url`, `video_id` and its cosine similarity `score`
+    """
+    related = await get_related_summaries(id, limit)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return related
 
 @router.delete("/youtube-summaries/{id}")
 async def remove_summary(id: str):
@@ -55,6 +227,29 @@ async def remove_summary(id: str):
         raise HTTPException(status_code=404, detail="Summary not found")
     return {"message": "Summary deleted successfully"}
 
+@router.delete("/youtube-summary-cache/")
+async def clear_summary_cache(
+    video_id: Optional[str] = Query(None, description="Only drop cached summaries for this video")
+):
+    """
+    Invalidate cached summaries, e.g. after changing the summary prompt
+    """
+    dropped = await invalidate_summary_cache(video_id)
+    return {"message": "Summary cache invalidated", "dropped": dropped}
+
+@router.get("/youtube-summary-stats/")
+async def summary_stats():
+    """
+    Get summary cache, request coalescing and job queue statistics
+    """
+    return {
+        **get_summary_stats(),
+        "jobs": summary_jobs.stats(),
+        "collections": await collection_versions.stats([YouTubeSummary, Bookmark]),
+        # Counters above are per worker process; these say which one answered
+        "worker": {"pid": os.getpid(), "shared_state": shared_state.stats()}
+    }
+
 @router.post("/bookmarks/", response_model=dict, tags=["bookmarks"])
 async def create_new_bookmark(bookmark_data: BookmarkCreate):
     """
@@ -70,16 +265,73 @@ async def create_new_bookmark(bookmark_data: BookmarkCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/bookmarks/", response_model=List[dict], tags=["bookmarks"])
+@router.get("/bookmarks/", response_model=List[dict], response_class=RawJSONResponse, tags=["bookmarks"])
 async def list_bookmarks(
-    tag: Optional[str] = Query(None, description="Filter bookmarks by tag")
+    tag: Optional[str] = Query(None, description="Filter bookmarks by tag"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of bookmarks to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,url"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Retrieve bookmarks
+    Retrieve bookmarks, newest first
     
     - **tag**: Optional tag to filter bookmarks
+    - **after**: Return bookmarks older than this cursor
+    - **limit**: Page size
+    - **fields**: Optional projection; `id` is always included
+    - Answers 304 to a matching `If-None-Match` without querying the database
+    """
+    etag = make_etag("bookmarks", await collection_versions.tag(Bookmark), tag, after, limit, fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, LIST_CACHE_CONTROL)
+    try:
+        bookmarks, next_cursor = await get_bookmarks(tag, after, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=503, detail="Bookmarks are temporarily unavailable")
+    headers = {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return RawJSONResponse(bookmarks, headers=headers)
+
+@router.post("/bookmarks/import", tags=["bookmarks"])
+async def import_bookmark_file(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(ndjson|html)$", description="ndjson or html; detected from the body when omitted")
+):
+    """
+    Import bookmarks from the request body: NDJSON (one BookmarkCreate object
+    per line) or a Netscape bookmark file exported by a browser
+
+    - Bookmarks whose normalized URL is already stored, or repeated in the file, are skipped
+    - Invalid records are skipped and reported with their line number
+    - Answers 409 while another import is running
     """
-    return await get_bookmarks(tag)
+    try:
+        report = await import_bookmarks(request.stream(), fmt, request.headers.get("content-type"))
+    except BookmarkImportInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return RawJSONResponse(report, status_code=500 if "error" in report else 200)
+
+@router.get("/bookmarks/export", tags=["bookmarks"])
+async def export_bookmark_file(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|html)$", description="ndjson or html (Netscape bookmark file)"),
+    tag: Optional[str] = Query(None, description="Only export bookmarks with this tag")
+):
+    """
+    Download all bookmarks, oldest first, streamed as they are read
+    """
+    if fmt == "html":
+        media_type, filename = "text/html; charset=utf-8", "bookmarks.html"
+    else:
+        media_type, filename = "application/x-ndjson", "bookmarks.ndjson"
+    return StreamingResponse(
+        export_bookmarks(fmt, tag),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.delete("/bookmarks/{bookmark_id}", tags=["bookmarks"])
 async def remove_bookmark(bookmark_id: str):
@@ -93,4 +345,37 @@ async def remove_bookmark(bookmark_id: str):
         raise HTTPException(status_code=404, detail="Bookmark not found")
     return {"message": "Bookmark deleted successfully"}
 
+@router.get("/search", tags=["search"])
+async def search(
+    q: str = Query(..., min_length=1, description="Search terms"),
+    types: Optional[List[str]] = Query(None, description="Limit results to summary, bookmark and/or note"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of hits to return"),
+    offset: int = Query(0, ge=0, description="Number of hits to skip")
+):
+    """
+    Full-text search across summaries, bookmarks and notes
 
+    - **q**: Search terms
+    - **types**: Optional result types to include
+    - Hits are ranked by relevance and carry a snippet with matches wrapped in `<mark>`
+    """
+    try:
+        return await search_documents(q, types, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@debug_router.get("/debug/query-plans", tags=["debug"])
+async def query_plans():
+    """
+    Show the query plans of the hot list and lookup queries
+
+    A plan that falls back to a collection scan means an index is missing.
+    """
+    return await explain_hot_queries()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: request and per-stage latency, OpenAI usage, DB latency, cache and queue gauges
+    """
+    return Response(content=metrics_payload(), media_type=CONTENT_TYPE_LATEST)
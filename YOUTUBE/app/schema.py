@@ -1,11 +1,27 @@
-from odmantic import Model, Field as OdmanticField
+from odmantic import Model, EmbeddedModel, Field as OdmanticField, Index
 from pydantic import BaseModel, HttpUrl, Field as PydanticField, ConfigDict
-from typing import List, Optional, Dict, Any
+from pymongo import IndexModel
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
+from app.search import SEARCH_FIELDS
+import os
+
+# Seconds a persisted summary cache entry lives; MongoDB drops older ones
+# through a TTL index and reads ignore them. 0 keeps entries forever.
+SUMMARY_CACHE_DB_TTL = int(os.environ.get("SUMMARY_CACHE_DB_TTL", str(30 * 24 * 3600)))
+
+def text_index(model_name: str) -> IndexModel:
+    """Text index backing /search, weighted like the mock engine's search index"""
+    _, weights = SEARCH_FIELDS[model_name]
+    return IndexModel([(field, "text") for field in weights], weights=weights, name="search_text")
 
 class Note(Model):
     content: str
 
+    model_config = {
+        "indexes": lambda: [text_index("Note")]
+    }
+
 class NoteCreate(BaseModel):
     content: str
 
@@ -13,12 +29,53 @@ class MindmapNode(BaseModel):
     name: str
     children: Optional[List['MindmapNode']] = None
 
+class SummaryChapter(EmbeddedModel):
+    """One timestamped chapter of a summary, with the hash of its transcript window"""
+    start: Optional[float] = None
+    end: Optional[float] = None
+    title: str
+    summary: str
+    window_hash: str
+    model: Optional[str] = None
+
 class YouTubeSummary(Model):
     url: str
     summary: str
+    video_id: Optional[str] = OdmanticField(default=None)
+    # LLM that wrote the summary; None for summaries stored before model routing
+    model: Optional[str] = OdmanticField(default=None)
+    created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+    # Set on every save; None on summaries stored before it existed (use created_at)
+    updated_at: Optional[datetime] = OdmanticField(default=None)
+    # Chapter mode results; chapters are reused while chapters_version matches
+    chapters: List[SummaryChapter] = OdmanticField(default_factory=list)
+    chapters_version: Optional[str] = OdmanticField(default=None)
+
+    model_config = {
+        "indexes": lambda: [
+            # One summary per video; older documents without a video_id are left out
+            IndexModel(
+                [("video_id", 1)],
+                unique=True,
+                partialFilterExpression={"video_id": {"$type": "string"}},
+                name="video_id_unique"
+            ),
+            IndexModel([("created_at", -1)], name="created_at_desc"),
+            text_index("YouTubeSummary"),
+        ]
+    }
+
+SummaryDetail = Literal["brief", "standard", "detailed"]
 
 class YouTubeSummaryCreate(BaseModel):
     url: str
+    detail: SummaryDetail = PydanticField("standard", description="Summary length: brief, standard or detailed")
+
+class YouTubeSummaryBatchCreate(BaseModel):
+    """Schema for summarizing many videos at once"""
+    urls: List[str] = PydanticField(default_factory=list, description="YouTube URLs or video IDs to summarize")
+    playlist_id: Optional[str] = PydanticField(None, description="Optional playlist whose videos are added to the batch")
+    detail: SummaryDetail = PydanticField("standard", description="Summary length: brief, standard or detailed")
 
 class BookmarkCreate(BaseModel):
     """Schema for creating a new bookmark"""
@@ -34,9 +91,66 @@ class Bookmark(Model):
     description: Optional[str] = OdmanticField(default=None)
     tags: List[str] = OdmanticField(default_factory=list)
     created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+    # Normalized URL used to skip duplicates on import; unset on bookmarks saved before it existed
+    url_key: Optional[str] = OdmanticField(default=None)
 
     model_config = ConfigDict(
         json_encoders={
             datetime: lambda v: v.isoformat()
-        }
+        },
+        indexes=lambda: [
+            # Multikey index serving the tag filter
+            Index(Bookmark.tags, name="tags"),
+            Index(Bookmark.url, name="url"),
+            Index(Bookmark.url_key, name="url_key"),
+            IndexModel([("created_at", -1)], name="created_at_desc"),
+            text_index("Bookmark"),
+        ]
     )
+
+class SummaryCacheEntry(Model):
+    """MongoDB model for persisted summary cache entries"""
+    key: str = OdmanticField(primary_field=True)
+    video_id: str = OdmanticField(index=True)
+    summary: str
+    prompt_version: str
+    model: str
+    created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+
+    model_config = {
+        "indexes": lambda: [
+            IndexModel([("created_at", 1)], name="created_at_ttl", expireAfterSeconds=SUMMARY_CACHE_DB_TTL)
+        ] if SUMMARY_CACHE_DB_TTL else []
+    }
+
+class SummaryEmbedding(Model):
+    """MongoDB model for the summary vectors behind /youtube-summary/{id}/related"""
+    summary_id: str = OdmanticField(primary_field=True)
+    embedder: str
+    dim: int
+    # Little-endian float32 array
+    vector: bytes
+    # Marker left when the summary is deleted, so other workers drop the vector too
+    deleted: bool = OdmanticField(default=False)
+    # Set again when the vector is replaced or deleted; other workers sync from it
+    created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+
+class SummaryJob(Model):
+    """MongoDB model for background summary jobs"""
+    url: str
+    detail: str = OdmanticField(default="standard")
+    status: str = OdmanticField(default="pending", index=True)
+    result: Optional[Dict[str, Any]] = OdmanticField(default=None)
+    error: Optional[str] = OdmanticField(default=None)
+    created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+    updated_at: datetime = OdmanticField(default_factory=datetime.utcnow)
+
+class Transcript(Model):
+    """MongoDB model for timed transcript segments, stored compressed"""
+    key: str = OdmanticField(primary_field=True)
+    video_id: str = OdmanticField(index=True)
+    language: str
+    codec: str
+    segments_blob: bytes
+    segment_count: int
+    created_at: datetime = OdmanticField(default_factory=datetime.utcnow)
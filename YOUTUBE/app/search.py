@@ -0,0 +1,138 @@
+from collections import Counter
+from html import escape
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+
+# Searchable collections: result type, text fields and their relative weights.
+# The same weights are used for the Mongo text indexes and the in-memory index.
+SEARCH_FIELDS = {
+    "YouTubeSummary": ("summary", {"summary": 1, "url": 2}),
+    "Bookmark": ("bookmark", {"title": 10, "tags": 5, "description": 2, "url": 2}),
+    "Note": ("note", {"content": 1}),
+}
+
+SNIPPET_LENGTH = 160
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "with"
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase text and split it into indexable terms
+    """
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+def field_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return str(value)
+
+class InvertedIndex:
+    """
+    In-memory BM25 index used by the mock database. A query only visits the
+    postings of its own terms, not every document.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[Tuple[str, str], float]] = {}
+        self.lengths: Dict[Tuple[str, str], float] = {}
+        self.documents: Dict[Tuple[str, str], dict] = {}
+        self.total_length = 0.0
+
+    def add(self, kind: str, doc_id: str, fields: dict, weights: dict):
+        """
+        Index a document, replacing any previous version of it
+        """
+        key = (kind, doc_id)
+        self.remove(kind, doc_id)
+
+        frequencies = Counter()
+        for field, weight in weights.items():
+            for term in tokenize(field_text(fields.get(field))):
+                frequencies[term] += weight
+
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[key] = frequency
+        length = float(sum(frequencies.values()))
+        self.lengths[key] = length
+        self.total_length += length
+        self.documents[key] = fields
+
+    def remove(self, kind: str, doc_id: str):
+        key = (kind, doc_id)
+        if key not in self.documents:
+            return
+        fields = self.documents.pop(key)
+        self.total_length -= self.lengths.pop(key)
+        for term in set(tokenize(" ".join(field_text(v) for v in fields.values()))):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, text: str, limit: int, offset: int = 0) -> List[Tuple[float, str, str, dict]]:
+        """
+        Return (score, kind, id, fields) for the best matches, best first
+        """
+        terms = set(tokenize(text))
+        if not terms or not self.documents:
+            return []
+
+        count = len(self.documents)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[Tuple[str, str], float] = {}
+        for term in terms:
+            postings = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[key] / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+        return [(score, kind, doc_id, self.documents[(kind, doc_id)]) for (kind, doc_id), score in best]
+
+def make_snippet(text: str, query: str, length: int = SNIPPET_LENGTH) -> str:
+    """
+    Cut a window of text around the first query term and wrap matches in <mark>
+    """
+    terms = set(tokenize(query))
+    if not text:
+        return ""
+
+    words = list(re.finditer(r"\w+", text))
+    start = 0
+    for match in words:
+        if match.group().lower() in terms:
+            start = max(0, match.start() - length // 3)
+            break
+    window = text[start:start + length]
+
+    pieces = []
+    last = 0
+    for match in re.finditer(r"\w+", window):
+        if match.group().lower() in terms:
+            pieces.append(escape(window[last:match.start()]))
+            pieces.append(f"<mark>{escape(match.group())}</mark>")
+            last = match.end()
+    pieces.append(escape(window[last:]))
+
+    snippet = "".join(pieces)
+    if start > 0:
+        snippet = "…" + snippet
+    if start + length < len(text):
+        snippet += "…"
+    return snippet
@@ -0,0 +1,318 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import abc
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Where state shared between worker processes lives: "local" keeps it in the
+# process (single worker), "sqlite:///path/to/state.db" shares it between
+# the workers of one host
+SHARED_STATE_URL = os.environ.get("SHARED_STATE_URL", "local")
+# Seconds a SQLite call waits for another process holding the write lock
+SHARED_STATE_TIMEOUT = float(os.environ.get("SHARED_STATE_TIMEOUT", "5"))
+
+class SharedState(abc.ABC):
+    """
+    Small key-value, counter, lease and token-bucket store used for state
+    that every worker process must agree on. Values are strings; keys with a
+    ttl expire on their own. `distributed` tells callers whether other
+    processes can see the state, so purely local layers can be skipped.
+    """
+
+    distributed = False
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete_prefix(self, prefix: str) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Take a lease unless another holder has an unexpired one; returns the
+        token to release it with, or None
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def release_lease(self, key: str, token: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def take_tokens(self, key: str, amount: float, capacity: float, rate: float) -> float:
+        """
+        Take amount from a token bucket refilled at rate per second; returns 0
+        on success, otherwise the seconds to wait before trying again
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def adjust_bucket(self, key: str, capacity: float, rate: float, credit: float = 0,
+                            cap_level: Optional[float] = None, pause_until: Optional[float] = None):
+        """
+        Give tokens back, lower the level to what the upstream reports, or pause
+        the bucket until a wall-clock time
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__, "distributed": self.distributed}
+
+class LocalState(SharedState):
+    """
+    In-process state for a single worker
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self.buckets: Dict[str, List[float]] = {}
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self.values[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._get(key, time.time())
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        now = time.time()
+        return [self._get(key, now) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.values[key] = (value, time.time() + ttl if ttl else None)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        now = time.time()
+        keys = [k for k in self.values if k.startswith(prefix)]
+        # Expired keys are dropped too but not counted
+        live = sum(1 for k in keys if self._get(k, now) is not None)
+        for key in keys:
+            self.values.pop(key, None)
+        return live
+
+    async def incr(self, key: str) -> int:
+        value = int(self._get(key, time.time()) or 0) + 1
+        self.values[key] = (str(value), None)
+        return value
+
+    async def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        if self._get(key, now) is not None:
+            return None
+        token = uuid.uuid4().hex
+        self.values[key] = (token, now + ttl)
+        return token
+
+    async def release_lease(self, key: str, token: str):
+        if self._get(key, time.time()) == token:
+            del self.values[key]
+
+    def _bucket(self, key: str, capacity: float, rate: float, now: float) -> List[float]:
+        level, updated, blocked_until = self.buckets.setdefault(key, [capacity, now, 0.0])
+        bucket = self.buckets[key]
+        bucket[0] = min(capacity, level + (now - updated) * rate)
+        bucket[1] = now
+        return bucket
+
+    async def take_tokens(self, key: str, amount: float, capacity: float, rate: float) -> float:
+        now = time.time()
+        bucket = self._bucket(key, capacity, rate, now)
+        if now < bucket[2]:
+            return bucket[2] - now
+        if bucket[0] >= amount:
+            bucket[0] -= amount
+            return 0.0
+        return (amount - bucket[0]) / rate
+
+    async def adjust_bucket(self, key: str, capacity: float, rate: float, credit: float = 0,
+                            cap_level: Optional[float] = None, pause_until: Optional[float] = None):
+        bucket = self._bucket(key, capacity, rate, time.time())
+        bucket[0] = min(capacity, bucket[0] + credit)
+        if cap_level is not None:
+            bucket[0] = min(bucket[0], cap_level)
+        if pause_until is not None:
+            bucket[2] = max(bucket[2], pause_until)
+
+class SQLiteState(SharedState):
+    """
+    State in a SQLite database in WAL mode, shared by the worker processes of
+    one host. Every operation is one short IMMEDIATE transaction run on a
+    dedicated thread, so read-modify-write operations are atomic across
+    processes. The connection is opened on first use, after the worker forked.
+    """
+
+    distributed = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self.conn: Optional[sqlite3.Connection] = None
+        self.operations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            conn = sqlite3.connect(self.path, timeout=SHARED_STATE_TIMEOUT, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+            )
+            self.conn = conn
+        return self.conn
+
+    def _transaction(self, operation, args):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(conn, time.time(), *args)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.operations += 1
+        # Drop expired keys now and then
+        if self.operations % 1000 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        return result
+
+    async def _run(self, operation, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._transaction, operation, args)
+
+    @staticmethod
+    def _get(conn, now, key):
+        row = conn.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(self._get, key)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return await self._run(lambda conn, now: [self._get(conn, now, key) for key in keys])
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        def operation(conn, now):
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None)
+            )
+        await self._run(operation)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        def operation(conn, now):
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            live = conn.execute(
+                "DELETE FROM kv WHERE key LIKE ? ESCAPE '\\' AND (expires_at IS NULL OR expires_at > ?)",
+                (escaped + "%", now)
+            ).rowcount
+            # Expired keys are dropped too but not counted
+            conn.execute("DELETE FROM kv WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",))
+            return live
+        return await self._run(operation)
+
+    async def incr(self, key: str) -> int:
+        def operation(conn, now):
+            value = int(self._get(conn, now, key) or 0) + 1
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, NULL)", (key, str(value)))
+            return value
+        return await self._run(operation)
+
+    async def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        def operation(conn, now):
+            if self._get(conn, now, key) is not None:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, token, now + ttl))
+            return token
+        return await self._run(operation)
+
+    async def release_lease(self, key: str, token: str):
+        await self._run(lambda conn, now: conn.execute("DELETE FROM kv WHERE key = ? AND value = ?", (key, token)))
+
+    @staticmethod
+    def _bucket(conn, now, key, capacity, rate) -> List[float]:
+        row = conn.execute("SELECT level, updated, blocked_until FROM buckets WHERE key = ?", (key,)).fetchone()
+        level, updated, blocked_until = row if row else (capacity, now, 0.0)
+        return [min(capacity, level + max(0.0, now - updated) * rate), now, blocked_until]
+
+    @staticmethod
+    def _save_bucket(conn, key, bucket):
+        conn.execute("INSERT OR REPLACE INTO buckets (key, level, updated, blocked_until) VALUES (?, ?, ?, ?)", (key, *bucket))
+
+    async def take_tokens(self, key: str, amount: float, capacity: float, rate: float) -> float:
+        def operation(conn, now):
+            bucket = self._bucket(conn, now, key, capacity, rate)
+            if now < bucket[2]:
+                wait = bucket[2] - now
+            elif bucket[0] >= amount:
+                bucket[0] -= amount
+                wait = 0.0
+            else:
+                wait = (amount - bucket[0]) / rate
+            self._save_bucket(conn, key, bucket)
+            return wait
+        return await self._run(operation)
+
+    async def adjust_bucket(self, key: str, capacity: float, rate: float, credit: float = 0,
+                            cap_level: Optional[float] = None, pause_until: Optional[float] = None):
+        def operation(conn, now):
+            bucket = self._bucket(conn, now, key, capacity, rate)
+            bucket[0] = min(capacity, bucket[0] + credit)
+            if cap_level is not None:
+                bucket[0] = min(bucket[0], cap_level)
+            if pause_until is not None:
+                bucket[2] = max(bucket[2], pause_until)
+            self._save_bucket(conn, key, bucket)
+        await self._run(operation)
+
+    async def close(self):
+        def operation():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, operation)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "path": self.path, "operations": self.operations}
+
+def create_shared_state(url: str = SHARED_STATE_URL) -> SharedState:
+    if url in ("", "local"):
+        return LocalState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+shared_state = create_shared_state()
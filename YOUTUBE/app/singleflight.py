@@ -0,0 +1,107 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+
+from app.metrics import SUMMARY_FLIGHTS_IN_FLIGHT
+from app.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# How long a worker may hold the cross-worker lease of a key; a worker that
+# dies while holding it blocks the key for at most this long
+SINGLEFLIGHT_LEASE_SECONDS = float(os.environ.get("SINGLEFLIGHT_LEASE_SECONDS", "300"))
+# How often a worker waiting on another worker's run checks for its result
+SINGLEFLIGHT_POLL_SECONDS = float(os.environ.get("SINGLEFLIGHT_POLL_SECONDS", "0.25"))
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one shared execution.
+    When several workers share state, a lease in the shared store also
+    coalesces calls made in different workers.
+    """
+
+    def __init__(self, state: Optional[SharedState] = None):
+        self.state = state or shared_state
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.remote_waits = 0
+        self.errors = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """
+        Run fn for key, or wait for the run already in flight for that key.
+        Every caller receives the same result or the same exception. lookup
+        returns the result another worker stored, or None; without it a
+        worker that waited on another worker runs fn itself afterwards.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(self._leased(key, fn, lookup) if self.state.distributed else fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+
+        # Shield the shared task so one caller going away doesn't cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _leased(self, key: str, fn: Callable[[], Awaitable[Any]], lookup: Optional[Callable[[], Awaitable[Any]]]) -> Any:
+        """
+        Run fn under the key's lease, or wait until the worker holding it is
+        done and use what it stored
+        """
+        lease_key = f"flight:{key}"
+        waited = False
+        while True:
+            try:
+                token = await self.state.acquire_lease(lease_key, SINGLEFLIGHT_LEASE_SECONDS)
+            except Exception as e:
+                # Duplicate work is better than no work
+                logger.error("Error taking lease for %s: %s", key, e)
+                return await fn()
+            if token is not None:
+                try:
+                    return await fn()
+                finally:
+                    try:
+                        await self.state.release_lease(lease_key, token)
+                    except Exception as e:
+                        logger.error("Error releasing lease for %s: %s", key, e)
+
+            if not waited:
+                waited = True
+                self.remote_waits += 1
+            await asyncio.sleep(SINGLEFLIGHT_POLL_SECONDS)
+            if lookup is not None:
+                result = await lookup()
+                if result is not None:
+                    return result
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "remote_waits": self.remote_waits,
+            "errors": self.errors
+        }
+
+summary_flights = SingleFlight()
+SUMMARY_FLIGHTS_IN_FLIGHT.set_function(lambda: len(summary_flights._inflight))
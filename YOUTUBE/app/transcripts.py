@@ -0,0 +1,254 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type
+import abc
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from app.db import db
+from app.schema import Transcript
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_LANGUAGE = os.environ.get("TRANSCRIPT_LANGUAGE", "en")
+# Where transcripts come from: "youtube", or "file" for offline testing and benchmarks
+TRANSCRIPT_PROVIDER = os.environ.get("TRANSCRIPT_PROVIDER", "youtube")
+# Directory read by the file provider, holding <video_id>.json or <video_id>.<language>.json
+TRANSCRIPT_DIR = os.environ.get("TRANSCRIPT_DIR", "transcripts")
+# Dedicated thread pool for the synchronous youtube-transcript-api calls
+TRANSCRIPT_WORKERS = int(os.environ.get("TRANSCRIPT_WORKERS", "8"))
+TRANSCRIPT_TIMEOUT = float(os.environ.get("TRANSCRIPT_TIMEOUT", "20"))
+# Requests per second sent to YouTube, with bursts of up to TRANSCRIPT_RATE_BURST
+TRANSCRIPT_RATE_LIMIT = float(os.environ.get("TRANSCRIPT_RATE_LIMIT", "5"))
+TRANSCRIPT_RATE_BURST = int(os.environ.get("TRANSCRIPT_RATE_BURST", "10"))
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def compress_segments(segments: List[dict]) -> Tuple[str, bytes]:
+    """
+    Serialize and compress transcript segments, preferring zstd when it is installed
+    """
+    raw = json.dumps(segments, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+def decompress_segments(codec: str, blob: bytes) -> List[dict]:
+    """
+    Decompress segments stored by compress_segments
+    """
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Transcript is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == "zlib":
+        raw = zlib.decompress(blob)
+    else:
+        raise ValueError(f"Unknown transcript codec: {codec}")
+    return json.loads(raw)
+
+def transcript_key(video_id: str, language: str) -> str:
+    return f"{video_id}:{language}"
+
+class RateLimiter:
+    """
+    Token bucket that makes callers wait for a free slot instead of failing
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class TranscriptProvider(abc.ABC):
+    """
+    Source of timed transcript segments: a list of {"text", "start", "duration"} dicts
+    """
+    name = "base"
+
+    @abc.abstractmethod
+    async def fetch(self, video_id: str, language: str) -> Optional[List[dict]]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class YouTubeTranscriptProvider(TranscriptProvider):
+    """
+    Fetches transcripts from YouTube on a dedicated, sized thread pool, with a
+    per-call timeout and a rate limit so bursts don't starve other blocking work
+    """
+    name = "youtube"
+
+    def __init__(
+        self,
+        workers: int = TRANSCRIPT_WORKERS,
+        timeout: float = TRANSCRIPT_TIMEOUT,
+        rate: float = TRANSCRIPT_RATE_LIMIT,
+        burst: int = TRANSCRIPT_RATE_BURST
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcripts")
+        # Waiting happens here rather than in the executor queue, so timeouts only cover the call itself
+        self.slots = asyncio.Semaphore(workers)
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst)
+
+    async def fetch(self, video_id: str, language: str) -> Optional[List[dict]]:
+        await self.slots.acquire()
+        try:
+            await self.limiter.acquire()
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(
+                self.executor,
+                lambda: YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
+            )
+        except BaseException:
+            self.slots.release()
+            raise
+        # A timed-out call keeps running in its thread, so its slot is only
+        # freed when the thread is done, not when the caller stops waiting
+        call.add_done_callback(self._call_done)
+        return await asyncio.wait_for(asyncio.shield(call), timeout=self.timeout)
+
+    def _call_done(self, call: asyncio.Future):
+        self.slots.release()
+        if not call.cancelled():
+            # Retrieved so that a call nobody waits for any more is not logged as unhandled
+            call.exception()
+
+    async def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class FileTranscriptProvider(TranscriptProvider):
+    """
+    Reads transcripts from JSON files, for offline testing and benchmarking
+    """
+    name = "file"
+
+    def __init__(self, directory: str = TRANSCRIPT_DIR):
+        self.directory = directory
+
+    def _read(self, video_id: str, language: str) -> Optional[List[dict]]:
+        for filename in (f"{video_id}.{language}.json", f"{video_id}.json"):
+            path = os.path.join(self.directory, filename)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f)
+        return None
+
+    async def fetch(self, video_id: str, language: str) -> Optional[List[dict]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read, video_id, language)
+
+TRANSCRIPT_PROVIDERS: Dict[str, Type[TranscriptProvider]] = {
+    "youtube": YouTubeTranscriptProvider,
+    "file": FileTranscriptProvider,
+}
+
+class Providers:
+    transcript: TranscriptProvider = None
+
+providers = Providers()
+
+def get_transcript_provider() -> TranscriptProvider:
+    """
+    Return the configured provider, creating it on first use
+    """
+    if providers.transcript is None:
+        if TRANSCRIPT_PROVIDER not in TRANSCRIPT_PROVIDERS:
+            raise ValueError(f"Unknown transcript provider: {TRANSCRIPT_PROVIDER}")
+        providers.transcript = TRANSCRIPT_PROVIDERS[TRANSCRIPT_PROVIDER]()
+    return providers.transcript
+
+def set_transcript_provider(provider: TranscriptProvider):
+    """
+    Replace the transcript provider, e.g. with a stub in benchmarks
+    """
+    providers.transcript = provider
+
+async def close_transcript_provider():
+    try:
+        if providers.transcript is not None:
+            await providers.transcript.close()
+    except Exception as e:
+        logger.error("Error closing transcript provider: %s", e)
+    finally:
+        providers.transcript = None
+
+async def fetch_youtube_transcript_segments(video_id: str, language: str = TRANSCRIPT_LANGUAGE) -> Optional[List[dict]]:
+    """
+    Fetch the timed transcript segments of a video from the transcript provider
+    """
+    try:
+        return await get_transcript_provider().fetch(video_id, language)
+    except asyncio.TimeoutError:
+        logger.warning("Timed out fetching transcript for %s", video_id)
+        return None
+    except Exception as e:
+        logger.error("Error fetching transcript for %s: %s", video_id, e)
+        return None
+
+async def load_transcript(video_id: str, language: str = TRANSCRIPT_LANGUAGE) -> Optional[Transcript]:
+    """
+    Load a stored transcript without decompressing its segments
+    """
+    try:
+        return await db.engine.find_one(Transcript, Transcript.key == transcript_key(video_id, language))
+    except Exception as e:
+        logger.error("Error loading transcript for %s: %s", video_id, e)
+        return None
+
+async def store_transcript(video_id: str, segments: List[dict], language: str = TRANSCRIPT_LANGUAGE) -> Optional[Transcript]:
+    """
+    Compress and save transcript segments, replacing any stored copy
+    """
+    codec, blob = compress_segments(segments)
+    try:
+        return await db.engine.save(Transcript(
+            key=transcript_key(video_id, language),
+            video_id=video_id,
+            language=language,
+            codec=codec,
+            segments_blob=blob,
+            segment_count=len(segments)
+        ))
+    except Exception as e:
+        logger.error("Error storing transcript for %s: %s", video_id, e)
+        return None
+
+async def get_transcript_segments(video_id: str, language: str = TRANSCRIPT_LANGUAGE) -> Optional[List[dict]]:
+    """
+    Return transcript segments from the transcript store, fetching and storing
+    them on a miss
+    """
+    stored = await load_transcript(video_id, language)
+    if stored is not None:
+        return decompress_segments(stored.codec, stored.segments_blob)
+
+    segments = await fetch_youtube_transcript_segments(video_id, language)
+    if segments:
+        await store_transcript(video_id, segments, language)
+    return segments
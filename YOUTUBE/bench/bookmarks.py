@@ -0,0 +1,134 @@
+"""
+Benchmark of bookmark import and export: imports a generated NDJSON or
+Netscape HTML file, then exports it again, reporting time and memory.
+
+    python -m bench.bookmarks --bookmarks 100000
+    python -m bench.bookmarks --bookmarks 100000 --format html
+    python -m bench.bookmarks --mode uvicorn --mongo-uri mongodb://localhost:27017/
+
+The file is generated while it is sent, with --duplicates of the bookmarks
+repeating an earlier URL in another form and --invalid of them broken. In
+asgi mode the memory reported is the Python heap peak of the whole process;
+in uvicorn mode it is the server's RSS before and after.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import httpx
+
+from bench.run import free_port, rss_kb, start_server, wait_until_up
+
+def ndjson_line(i: int, rng: random.Random, duplicates: float, invalid: float) -> bytes:
+    roll = rng.random()
+    if roll < invalid:
+        return b'{"title": "", "url": "not a url"}\n'
+    if roll < invalid + duplicates and i:
+        # The same page as an earlier bookmark, with tracking parameters and a trailing slash
+        return json.dumps({"title": f"Again {i}", "url": f"https://EXAMPLE.com/page/{rng.randrange(i)}/?utm_source=bench"}).encode() + b"\n"
+    return json.dumps({
+        "title": f"Bookmark {i}",
+        "url": f"https://example.com/page/{i}",
+        "description": "Generated by the bookmark benchmark",
+        "tags": [f"tag{i % 20}", "bench"]
+    }).encode() + b"\n"
+
+def html_entry(i: int, rng: random.Random, duplicates: float, invalid: float) -> bytes:
+    roll = rng.random()
+    if roll < invalid:
+        return b'<DT><A HREF="javascript:void(0)">Broken</A>\n'
+    url = f"https://EXAMPLE.com/page/{rng.randrange(i)}/?utm_source=bench" if roll < invalid + duplicates and i else f"https://example.com/page/{i}"
+    return (
+        f'<DT><A HREF="{url}" ADD_DATE="1700000000" TAGS="tag{i % 20},bench">Bookmark {i}</A>\n'
+        f"<DD>Generated by the bookmark benchmark\n"
+    ).encode()
+
+async def generate(args):
+    rng = random.Random(args.seed)
+    entry = html_entry if args.format == "html" else ndjson_line
+    if args.format == "html":
+        yield b"<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n<DT><H3>Bench</H3>\n<DL><p>\n"
+    lines = []
+    for i in range(args.bookmarks):
+        lines.append(entry(i, rng, args.duplicates, args.invalid))
+        if len(lines) == 500:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+    if args.format == "html":
+        yield b"</DL><p>\n</DL><p>\n"
+
+async def run(client: httpx.AsyncClient, args) -> dict:
+    content_type = "text/html" if args.format == "html" else "application/x-ndjson"
+    started = time.perf_counter()
+    response = await client.post("/bookmarks/import", content=generate(args), headers={"Content-Type": content_type}, timeout=None)
+    import_seconds = time.perf_counter() - started
+    report = response.json()
+
+    started = time.perf_counter()
+    exported = 0
+    async with client.stream("GET", "/bookmarks/export", params={"format": args.format}, timeout=None) as stream:
+        async for line in stream.aiter_lines():
+            exported += line.startswith("<DT>") if args.format == "html" else bool(line)
+    export_seconds = time.perf_counter() - started
+    return {"status": response.status_code, "report": report, "import_seconds": import_seconds,
+            "exported": exported, "export_seconds": export_seconds}
+
+def print_result(args, result: dict, memory: str):
+    report = result["report"]
+    print(f"import {args.bookmarks} {args.format}: {result['import_seconds']:.2f}s "
+          f"({args.bookmarks / result['import_seconds']:.0f}/s), status {result['status']}, "
+          f"imported {report.get('imported')}, duplicates {report.get('duplicates')}, invalid {report.get('invalid')}")
+    print(f"export {result['exported']}: {result['export_seconds']:.2f}s")
+    print(memory)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark bookmark import and export")
+    parser.add_argument("--bookmarks", type=int, default=100000, help="Bookmarks in the generated file")
+    parser.add_argument("--format", choices=("ndjson", "html"), default="ndjson")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="Fraction repeating an earlier URL")
+    parser.add_argument("--invalid", type=float, default=0.01, help="Fraction failing validation")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--mongo-uri", help="Use MongoDB instead of the mock database")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = {"LOG_LEVEL": "WARNING"}
+    if args.mongo_uri:
+        env.update({"MONGODB_URI": args.mongo_uri, "USE_MOCK_DB": "false"})
+    else:
+        env.update({"USE_MOCK_DB": "true", "MOCK_DB_PATH": ""})
+
+    if args.mode == "asgi":
+        os.environ.update(env)
+        from app.main import app
+
+        tracemalloc.start()
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                result = await run(client, args)
+        _, peak = tracemalloc.get_traced_memory()
+        print_result(args, result, f"python heap peak {peak / 2**20:.0f} MiB (the mock database holds every bookmark)")
+        return
+
+    port = free_port()
+    server = start_server("app.main:app", port, env)
+    try:
+        await wait_until_up(f"http://127.0.0.1:{port}/health")
+        before = rss_kb(server.pid)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            result = await run(client, args)
+        after = rss_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    print_result(args, result, f"server RSS {before / 1024:.0f} MiB before, {after / 1024:.0f} MiB after")
+
+if __name__ == "__main__":
+    asyncio.run(main())
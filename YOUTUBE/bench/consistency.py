@@ -0,0 +1,186 @@
+"""
+Cross-worker consistency check: starts the app with several uvicorn workers
+sharing state through SQLite, against the stub LLM, and verifies that the
+workers behave like one server.
+
+    python -m bench.consistency --workers 4
+    python -m bench.consistency --workers 4 --mongo-uri mongodb://localhost:27017/   # also checks jobs and summaries
+
+Every request opens its own connection so the kernel spreads them over the
+workers. Checks:
+
+- requests reach more than one worker
+- concurrent requests for one video make the LLM calls of a single request
+- a summary computed by one worker is served from cache by the others
+- all workers return the same list ETag, and all see it change after a write
+- the LLM request budget (--rpm) holds for all workers together
+- with --mongo-uri: a background job runs once and every worker reports its final state
+
+The mock database is private to each worker, so content checks need MongoDB.
+Exits non-zero when a check fails.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.run import free_port, start_server, wait_until_up
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def check(self, name: str, ok: bool, detail: str = ""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            self.failures += 1
+
+async def fresh(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send one request on a new connection"""
+    async with httpx.AsyncClient(timeout=120) as client:
+        return await client.request(method, url, **kwargs)
+
+async def llm_requests(llm_url: str) -> int:
+    return (await fresh("GET", f"{llm_url}/stats")).json()["requests"]
+
+async def summarize(base: str, video: str) -> httpx.Response:
+    return await fresh("POST", f"{base}/youtube-summary/", json={"url": f"https://youtu.be/{video}"})
+
+async def run_checks(args, base: str, llm_url: str, checker: Checker):
+    prefix = f"c{int(time.time()) % 100000:05d}"
+
+    stats = await asyncio.gather(*(fresh("GET", f"{base}/youtube-summary-stats/") for _ in range(args.requests * 2)))
+    pids = {r.json()["worker"]["pid"] for r in stats}
+    checker.check("requests reach several workers", len(pids) > 1 or args.workers == 1, f"{len(pids)} workers answered")
+    backends = {r.json()["worker"]["shared_state"]["backend"] for r in stats}
+    checker.check("workers share state", backends == {"SQLiteState"}, ", ".join(sorted(backends)))
+
+    # LLM calls made by one cold request, the baseline for the checks below
+    before = await llm_requests(llm_url)
+    response = await summarize(base, f"{prefix}base")
+    baseline = await llm_requests(llm_url) - before
+    checker.check("single summary", response.status_code == 200 and baseline > 0, f"{baseline} LLM calls")
+
+    before = await llm_requests(llm_url)
+    responses = await asyncio.gather(*(summarize(base, f"{prefix}burst") for _ in range(args.requests)))
+    calls = await llm_requests(llm_url) - before
+    summaries = {r.json().get("summary") for r in responses if r.status_code == 200}
+    checker.check(
+        "concurrent requests coalesce across workers",
+        calls == baseline and len(summaries) == 1 and all(r.status_code == 200 for r in responses),
+        f"{args.requests} requests, {calls} LLM calls, {len(summaries)} distinct summaries"
+    )
+
+    before = await llm_requests(llm_url)
+    responses = await asyncio.gather(*(summarize(base, f"{prefix}base") for _ in range(args.requests)))
+    calls = await llm_requests(llm_url) - before
+    checker.check("cached summary served by every worker", calls == 0, f"{calls} LLM calls")
+
+    async def list_etags() -> set:
+        responses = await asyncio.gather(*(fresh("GET", f"{base}/bookmarks/") for _ in range(args.requests)))
+        return {r.headers.get("etag") for r in responses}
+
+    etags = await list_etags()
+    checker.check("workers agree on the list ETag", len(etags) == 1, f"{len(etags)} distinct")
+    await fresh("POST", f"{base}/bookmarks/", json={
+        "title": "Consistency check", "url": f"https://example.com/{prefix}", "tags": ["consistency"]
+    })
+    after = await list_etags()
+    checker.check("every worker sees the write", len(after) == 1 and not after & etags, f"{len(after)} distinct")
+
+    if args.mongo_uri:
+        response = await fresh("POST", f"{base}/youtube-summary/", params={"background": "true"},
+                               json={"url": f"https://youtu.be/{prefix}job"})
+        job_id = response.json()["id"]
+        deadline = time.monotonic() + 60
+        statuses = []
+        while time.monotonic() < deadline:
+            polled = await asyncio.gather(*(fresh("GET", f"{base}/jobs/{job_id}") for _ in range(args.workers * 2)))
+            statuses = [r.json()["status"] for r in polled]
+            if "done" in statuses or "failed" in statuses:
+                await asyncio.sleep(0.5)
+                polled = await asyncio.gather(*(fresh("GET", f"{base}/jobs/{job_id}") for _ in range(args.workers * 2)))
+                statuses = [r.json()["status"] for r in polled]
+                break
+            await asyncio.sleep(0.5)
+        checker.check("every worker reports the finished job", set(statuses) == {"done"}, ", ".join(sorted(set(statuses))))
+
+        listed = await asyncio.gather(*(fresh("GET", f"{base}/youtube-summaries/", params={"limit": 100}) for _ in range(args.requests)))
+        ids = {tuple(sorted(s["id"] for s in r.json())) for r in listed}
+        checker.check("every worker lists the same summaries", len(ids) == 1, f"{len(ids)} distinct lists")
+
+    # Last, as it uses up the request budget: with one shared bucket, no more
+    # than rpm requests start in the first seconds, however many workers there are
+    before = await llm_requests(llm_url)
+    tasks = [asyncio.create_task(summarize(base, f"{prefix}rate{i}")) for i in range(args.rpm * 2)]
+    await asyncio.sleep(args.llm_latency + 1.5)
+    calls = await llm_requests(llm_url) - before
+    # Requests refill at rpm / 60 per second while we wait
+    allowed = args.rpm + int((args.llm_latency + 1.5) * args.rpm / 60) + 1
+    checker.check("LLM request budget is shared", calls <= allowed, f"{calls} LLM calls, at most {allowed} allowed")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that several workers behave like one server")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--requests", type=int, default=16, help="Concurrent requests per check")
+    parser.add_argument("--rpm", type=int, default=20, help="LLM requests per minute given to the app")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--mongo-uri", help="Run on MongoDB instead of the per-worker mock database")
+    args = parser.parse_args(argv)
+
+    state_dir = tempfile.mkdtemp(prefix="youtube-shared-state-")
+    llm_port = free_port()
+    app_port = free_port()
+    llm_url = f"http://127.0.0.1:{llm_port}"
+    base = f"http://127.0.0.1:{app_port}"
+
+    llm_server = start_server("bench.stub_llm:app", llm_port, {
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "STUB_LLM_JITTER": "0"
+    })
+    env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_URL": f"{llm_url}/v1/chat/completions",
+        "OPENAI_RPM": str(args.rpm),
+        "LOG_LEVEL": "WARNING",
+        "SHARED_STATE_URL": f"sqlite:///{os.path.join(state_dir, 'state.db')}",
+        "STUB_TRANSCRIPT_LATENCY": "0.2",
+        # Short transcripts: one LLM call per summary
+        "STUB_TRANSCRIPT_SEGMENTS": "20",
+    }
+    if args.mongo_uri:
+        env.update({"MONGODB_URI": args.mongo_uri, "USE_MOCK_DB": "false"})
+    else:
+        env.update({"USE_MOCK_DB": "true", "MOCK_DB_PATH": ""})
+    app_server = start_server("bench.stub_app:app", app_port, env, workers=args.workers)
+
+    checker = Checker()
+    try:
+        await wait_until_up(f"{llm_url}/stats")
+        await wait_until_up(f"{base}/health")
+        # Give every worker time to finish its startup
+        await asyncio.sleep(2)
+        await run_checks(args, base, llm_url, checker)
+    finally:
+        for server in (app_server, llm_server):
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # Still draining the requests held back by the rate limit check
+                server.kill()
+                server.wait()
+
+    print(f"{checker.failures} check(s) failed" if checker.failures else "all checks passed")
+    return 1 if checker.failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
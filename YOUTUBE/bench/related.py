@@ -0,0 +1,84 @@
+"""
+Benchmark of the related-summaries vector index: build time, query latency
+with and without IVF partitioning, and the recall of IVF against exact search.
+
+    python -m bench.related --vectors 100000 --queries 200
+    python -m bench.related --vectors 100000 --text   # embed synthetic summaries with hashed TF-IDF
+
+Vectors are drawn around random topic centers so that neighbours exist.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.embeddings import HashedTfidfEmbedder
+from app.related import VectorIndex
+
+WORDS = [f"w{i}" for i in range(5000)]
+
+def synthetic_vectors(count: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.random((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, count)] + 0.3 * rng.random((count, dim)).astype(np.float32)
+    # Sparse like term vectors
+    vectors[vectors < 0.9] = 0
+    return vectors
+
+def synthetic_summaries(count: int, topics: int, rng: np.random.Generator) -> list:
+    topic_words = [rng.choice(WORDS, 40) for _ in range(topics)]
+    return [
+        " ".join(rng.choice(topic_words[rng.integers(topics)], 120).tolist() + rng.choice(WORDS, 30).tolist())
+        for _ in range(count)
+    ]
+
+def measure(index: VectorIndex, queries: list, k: int):
+    latencies = []
+    results = []
+    for doc_id in queries:
+        started = time.perf_counter()
+        results.append(index.search(doc_id, k))
+        latencies.append(time.perf_counter() - started)
+    return results, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the related-summaries vector index")
+    parser.add_argument("--vectors", type=int, default=100000, help="Vectors to index")
+    parser.add_argument("--dim", type=int, default=256, help="Vector dimensions")
+    parser.add_argument("--topics", type=int, default=300, help="Topic clusters in the synthetic data")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per index")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--probes", type=int, default=8, help="IVF lists searched per query")
+    parser.add_argument("--text", action="store_true", help="Embed synthetic summaries instead of drawing vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    if args.text:
+        embedder = HashedTfidfEmbedder(args.dim)
+        vectors = embedder.embed(synthetic_summaries(args.vectors, args.topics, rng))
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, args.topics, rng)
+    print(f"{args.vectors} vectors x {args.dim} dims ({vectors.nbytes / 2**20:.0f} MiB float32) in {time.perf_counter() - started:.1f}s")
+    queries = [str(i) for i in rng.choice(args.vectors, args.queries, replace=False)]
+
+    exact = None
+    print(f"{'index':6} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    for name, ivf_min_vectors in (("exact", 0), ("ivf", 1)):
+        index = VectorIndex(args.dim, "idf", ivf_min_vectors=ivf_min_vectors, probes=args.probes)
+        for i, vector in enumerate(vectors):
+            index.add(str(i), vector)
+        started = time.perf_counter()
+        index.build()
+        build = time.perf_counter() - started
+        results, p50, p99 = measure(index, queries, args.k)
+        if exact is None:
+            exact = results
+        recall = np.mean([
+            len({i for i, _ in found} & {i for i, _ in truth}) / max(1, len(truth))
+            for found, truth in zip(results, exact)
+        ])
+        print(f"{name:6} {build:8.2f} {p50:8.2f} {p99:8.2f} {recall:7.3f}")
+
+if __name__ == "__main__":
+    main()
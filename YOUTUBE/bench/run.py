@@ -0,0 +1,285 @@
+"""
+Load test for the summarizer API against stub transcript and LLM backends.
+
+Examples, run from the YOUTUBE directory:
+
+    # In-process through the ASGI transport, on the mock database
+    python -m bench.run --mode asgi --concurrency 32 --requests 500
+
+    # Through a real uvicorn server, on a local MongoDB
+    python -m bench.run --mode uvicorn --engine mongo --mongo-uri mongodb://localhost:27017/
+
+    # Write machine-readable results for regression tracking
+    python -m bench.run --output bench-results.json
+
+Each endpoint reports p50/p95/p99 latency, throughput and memory use. The
+summary endpoint is driven with distinct video IDs by default, so every request
+takes the cold path (transcript fetch + LLM call); use --distinct-videos to
+exercise the cache and request coalescing instead.
+"""
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+ENDPOINTS = ("summary", "summaries", "bookmarks")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def rss_kb(pid: Optional[int] = None) -> Optional[int]:
+    """Resident memory of a process in KiB (Linux), or peak RSS of this process elsewhere"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+async def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def start_server(module: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning",
+         "--workers", str(workers)],
+        env={**os.environ, **env},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+def request_factory(endpoint: str, distinct_videos: int) -> Callable[[httpx.AsyncClient, int], "asyncio.Future"]:
+    if endpoint == "summary":
+        return lambda client, i: client.post(
+            "/youtube-summary/", json={"url": f"https://youtu.be/bench{i % distinct_videos:06d}"}
+        )
+    if endpoint == "summaries":
+        return lambda client, i: client.get("/youtube-summaries/")
+    if endpoint == "bookmarks":
+        return lambda client, i: client.get("/bookmarks/", params={"tag": f"tag{i % 10}"})
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+async def seed(client: httpx.AsyncClient, count: int):
+    """Create bookmarks and summaries so the list endpoints have data to page through"""
+    semaphore = asyncio.Semaphore(32)
+
+    async def create_bookmark(i: int):
+        async with semaphore:
+            await client.post("/bookmarks/", json={
+                "title": f"Bench bookmark {i}",
+                "url": f"https://example.com/bench/{i}",
+                "description": "Seeded by the benchmark harness",
+                "tags": [f"tag{i % 10}", "bench"]
+            })
+
+    await asyncio.gather(*[create_bookmark(i) for i in range(count)])
+    response = await client.post("/youtube-summaries/batch", json={
+        "urls": [f"https://youtu.be/seed{i:06d}" for i in range(count)]
+    }, timeout=None)
+    response.raise_for_status()
+
+async def drive(client: httpx.AsyncClient, endpoint: str, requests: int, concurrency: int, distinct_videos: int) -> dict:
+    """Send requests with a fixed number of concurrent clients and collect latencies"""
+    make_request = request_factory(endpoint, distinct_videos)
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def client_loop():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return {
+        "endpoint": endpoint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        }
+    }
+
+async def run_asgi(args, endpoints: List[str]) -> List[dict]:
+    # Imported here so the environment prepared in main() is seen by the app's settings
+    from bench.stub_app import app
+
+    results = []
+    tracemalloc.start()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if args.seed:
+                await seed(client, args.seed)
+            for endpoint in endpoints:
+                tracemalloc.reset_peak()
+                rss_before = rss_kb()
+                result = await drive(client, endpoint, args.requests, args.concurrency, args.distinct_videos)
+                _, peak = tracemalloc.get_traced_memory()
+                result["memory"] = {
+                    "python_peak_kb": peak // 1024,
+                    "rss_before_kb": rss_before,
+                    "rss_after_kb": rss_kb()
+                }
+                results.append(result)
+    tracemalloc.stop()
+    return results
+
+async def run_uvicorn(args, endpoints: List[str], env: dict) -> List[dict]:
+    port = args.port or free_port()
+    server = start_server("bench.stub_app:app", port, env, workers=args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        await wait_until_up(f"{base_url}/health")
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            if args.seed:
+                await seed(client, args.seed)
+            for endpoint in endpoints:
+                rss_before = rss_kb(server.pid)
+                result = await drive(client, endpoint, args.requests, args.concurrency, args.distinct_videos)
+                result["memory"] = {
+                    "server_rss_before_kb": rss_before,
+                    "server_rss_after_kb": rss_kb(server.pid)
+                }
+                results.append(result)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the summarizer API against stub upstreams")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi",
+                        help="Drive the app in-process through ASGI, or over HTTP through uvicorn")
+    parser.add_argument("--engine", choices=("mock", "mongo"), default="mock", help="Database engine")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/", help="MongoDB URI for --engine mongo")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Comma-separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--distinct-videos", type=int, default=None,
+                        help="Number of distinct videos for the summary endpoint (default: one per request)")
+    parser.add_argument("--seed", type=int, default=200, help="Bookmarks and summaries created before measuring")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM response time in seconds")
+    parser.add_argument("--transcript-latency", type=float, default=0.2, help="Stub transcript fetch time in seconds")
+    parser.add_argument("--transcript-segments", type=int, default=200, help="Caption segments per stub transcript")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (uvicorn mode)")
+    parser.add_argument("--port", type=int, default=None, help="Port for the app server (uvicorn mode)")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.distinct_videos is None:
+        args.distinct_videos = args.requests
+    return args
+
+async def main(argv=None):
+    args = parse_args(argv)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint: {endpoint}")
+
+    llm_port = free_port()
+    llm_server = start_server("bench.stub_llm:app", llm_port, {
+        "STUB_LLM_LATENCY": str(args.llm_latency),
+        "STUB_LLM_JITTER": "0"
+    })
+
+    env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_URL": f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+        "STUB_TRANSCRIPT_LATENCY": str(args.transcript_latency),
+        "STUB_TRANSCRIPT_SEGMENTS": str(args.transcript_segments),
+    }
+    if args.engine == "mongo":
+        env["MONGODB_URI"] = args.mongo_uri
+        env["USE_MOCK_DB"] = "false"
+    else:
+        env["USE_MOCK_DB"] = "true"
+        env["MOCK_DB_PATH"] = ""
+
+    try:
+        await wait_until_up(f"http://127.0.0.1:{llm_port}/stats")
+        if args.mode == "asgi":
+            os.environ.update(env)
+            results = await run_asgi(args, endpoints)
+        else:
+            results = await run_uvicorn(args, endpoints, env)
+    finally:
+        llm_server.terminate()
+        llm_server.wait(timeout=10)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results
+    }
+
+    for result in results:
+        latency = result["latency_ms"]
+        print(
+            f"{args.mode:8} {args.engine:6} {result['endpoint']:10} "
+            f"{result['throughput_rps']:9.1f} req/s  "
+            f"p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  p99 {latency['p99']:8.1f} ms  "
+            f"errors {result['errors']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return report
+
+if __name__ == "__main__":
+    asyncio.run(main())
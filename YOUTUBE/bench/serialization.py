@@ -0,0 +1,113 @@
+"""
+Microbenchmark of the list-endpoint read path: ODMantic models + fix_mongo_ids
++ FastAPI's jsonable_encoder and stdlib json (the previous path) against raw
+documents encoded by RawJSONResponse.
+
+    python -m bench.serialization --documents 5000 --limit 500
+    python -m bench.serialization --mongo-uri mongodb://localhost:27017/
+
+Reports CPU time per page and the memory allocated while building one page.
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from odmantic import query
+
+from app import db as database
+from app.crud import BOOKMARK_FIELDS, project, stored_fields
+from app.db import db, find_documents, fix_mongo_ids
+from app.responses import RawJSONResponse, orjson
+from app.schema import Bookmark
+
+async def legacy_page(limit: int) -> bytes:
+    """
+    The list path as it was: hydrate models, copy them into dicts, walk them
+    with fix_mongo_ids, then validate and encode through FastAPI
+    """
+    bookmarks = await db.engine.find(Bookmark, sort=query.desc(Bookmark.id), limit=limit + 1)
+    page = [
+        {
+            "id": str(getattr(b, "id", None)),
+            "title": b.title,
+            "url": b.url,
+            "description": b.description,
+            "tags": b.tags,
+            "created_at": b.created_at.isoformat()
+        }
+        for b in bookmarks[:limit]
+    ]
+    return JSONResponse(jsonable_encoder(fix_mongo_ids(page))).body
+
+async def raw_page(limit: int) -> bytes:
+    documents = await find_documents(
+        Bookmark, sort=query.desc(Bookmark.id), limit=limit + 1, projection=stored_fields(BOOKMARK_FIELDS)
+    )
+    return RawJSONResponse([project(d, BOOKMARK_FIELDS) for d in documents[:limit]]).body
+
+async def measure(fn, limit: int, iterations: int) -> dict:
+    await fn(limit)  # warm up
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for _ in range(iterations):
+        body = await fn(limit)
+    cpu = (time.process_time() - cpu_started) / iterations
+    wall = (time.perf_counter() - wall_started) / iterations
+
+    tracemalloc.start()
+    await fn(limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms": cpu * 1000, "wall_ms": wall * 1000, "peak_kb": peak / 1024, "bytes": len(body)}
+
+async def seed(count: int):
+    base = datetime.utcnow() - timedelta(days=1)
+    for i in range(count):
+        await db.engine.save(Bookmark(
+            title=f"Bookmark {i} about asynchronous Python web services",
+            url=f"https://example.com/articles/{i}",
+            description="A longer description of the bookmarked page, " * 4,
+            tags=[f"tag{i % 10}", "python", "bench"],
+            created_at=base + timedelta(seconds=i)
+        ))
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare the model-based and raw list read paths")
+    parser.add_argument("--documents", type=int, default=5000, help="Bookmarks to seed")
+    parser.add_argument("--limit", type=int, default=500, help="Page size")
+    parser.add_argument("--iterations", type=int, default=50, help="Pages built per path")
+    parser.add_argument("--mongo-uri", default=None, help="Benchmark against MongoDB instead of the mock database")
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        database.MONGODB_URI = args.mongo_uri
+        database.MONGODB_DB_NAME = "youtube_summaries_bench"
+        if not await database.connect_to_mongo():
+            raise SystemExit(f"Could not connect to {args.mongo_uri}")
+        await db.engine.remove(Bookmark)
+    else:
+        database.setup_mock_db()
+
+    try:
+        await seed(args.documents)
+        legacy = await measure(legacy_page, args.limit, args.iterations)
+        raw = await measure(raw_page, args.limit, args.iterations)
+    finally:
+        if args.mongo_uri:
+            await db.engine.remove(Bookmark)
+        await database.close_mongo_connection()
+
+    engine = "mongo" if args.mongo_uri else "mock"
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"{args.limit} bookmarks per page, {engine} database, raw path encoded with {encoder}")
+    print(f"{'path':8} {'cpu ms/page':>12} {'wall ms/page':>13} {'peak alloc KiB':>15} {'bytes':>9}")
+    for name, result in (("legacy", legacy), ("raw", raw)):
+        print(f"{name:8} {result['cpu_ms']:12.2f} {result['wall_ms']:13.2f} {result['peak_kb']:15.1f} {result['bytes']:9}")
+    print(f"cpu speedup x{legacy['cpu_ms'] / raw['cpu_ms']:.1f}, allocations x{legacy['peak_kb'] / raw['peak_kb']:.1f} lower")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+The summarizer app with a stub transcript provider, for benchmarks.
+
+    uvicorn bench.stub_app:app
+
+- STUB_TRANSCRIPT_LATENCY: seconds each transcript fetch takes (default 0.2)
+- STUB_TRANSCRIPT_SEGMENTS: number of caption segments per transcript (default 200)
+"""
+from typing import List, Optional
+import asyncio
+import os
+
+from app.main import app
+from app.transcripts import TranscriptProvider, set_transcript_provider
+
+STUB_TRANSCRIPT_LATENCY = float(os.environ.get("STUB_TRANSCRIPT_LATENCY", "0.2"))
+STUB_TRANSCRIPT_SEGMENTS = int(os.environ.get("STUB_TRANSCRIPT_SEGMENTS", "200"))
+
+class StubTranscriptProvider(TranscriptProvider):
+    """
+    Returns a generated transcript after a fixed delay
+    """
+    name = "stub"
+
+    def __init__(self, latency: float = STUB_TRANSCRIPT_LATENCY, segments: int = STUB_TRANSCRIPT_SEGMENTS):
+        self.latency = latency
+        self.segments = segments
+
+    async def fetch(self, video_id: str, language: str) -> Optional[List[dict]]:
+        await asyncio.sleep(self.latency)
+        return [
+            {
+                "text": f"In part {i} of video {video_id} the speaker talks about topic number {i % 17}",
+                "start": i * 3.0,
+                "duration": 3.0
+            }
+            for i in range(self.segments)
+        ]
+
+set_transcript_provider(StubTranscriptProvider())
+
+__all__ = ["app", "StubTranscriptProvider"]
@@ -0,0 +1,97 @@
+"""
+Stand-in for the OpenAI chat completions API, for offline load testing.
+
+Run it with:
+
+    uvicorn bench.stub_llm:app --port 9000
+
+and point the app at it with OPENAI_API_URL=http://127.0.0.1:9000/v1/chat/completions
+(any non-empty OPENAI_API_KEY works).
+
+Behaviour is tuned through environment variables:
+
+- STUB_LLM_LATENCY: seconds to wait before answering (default 0.5)
+- STUB_LLM_JITTER: extra random latency in seconds (default 0.1)
+- STUB_LLM_ERROR_RATE: fraction of requests answered with 429 (default 0)
+- STUB_LLM_RETRY_AFTER: Retry-After value sent with those 429s (default 1)
+- STUB_LLM_TOKEN_DELAY: seconds between streamed tokens when "stream" is set (default 0.02)
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+STUB_LLM_LATENCY = float(os.environ.get("STUB_LLM_LATENCY", "0.5"))
+STUB_LLM_JITTER = float(os.environ.get("STUB_LLM_JITTER", "0.1"))
+STUB_LLM_ERROR_RATE = float(os.environ.get("STUB_LLM_ERROR_RATE", "0"))
+STUB_LLM_RETRY_AFTER = os.environ.get("STUB_LLM_RETRY_AFTER", "1")
+STUB_LLM_TOKEN_DELAY = float(os.environ.get("STUB_LLM_TOKEN_DELAY", "0.02"))
+
+app = FastAPI()
+
+stats = {"requests": 0, "throttled": 0}
+
+def fake_summary(messages: list) -> str:
+    text = messages[-1]["content"] if messages else ""
+    words = text.split()
+    return "Stub summary: " + " ".join(words[-50:])
+
+async def stream_chunks(content: str, model: str):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    for word in content.split(" "):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(STUB_LLM_TOKEN_DELAY)
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats["requests"] += 1
+    body = await request.json()
+
+    if random.random() < STUB_LLM_ERROR_RATE:
+        stats["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests"}},
+            headers={"Retry-After": STUB_LLM_RETRY_AFTER}
+        )
+
+    await asyncio.sleep(STUB_LLM_LATENCY + random.uniform(0, STUB_LLM_JITTER))
+
+    content = fake_summary(body.get("messages", []))
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(content, body.get("model", "stub")), media_type="text/event-stream")
+
+    prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+    completion_tokens = len(content.split())
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return stats
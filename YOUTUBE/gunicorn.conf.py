@@ -0,0 +1,29 @@
+"""
+Multi-worker deployment with gunicorn managing uvicorn workers:
+
+    pip install gunicorn
+    SHARED_STATE_URL=sqlite:////var/run/youtube-summarizer/state.db gunicorn -c gunicorn.conf.py app.main:app
+
+Without gunicorn, `uvicorn app.main:app --workers N` runs the same app. Either
+way, set SHARED_STATE_URL so the workers share caches, in-flight summaries,
+LLM rate limits and list ETags, and use MongoDB: the mock database is private
+to each worker.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app in each worker, not in the master: the MongoDB client, HTTP
+# client, job workers and shared-state connection are all created per process
+preload_app = False
+
+# Summaries wait on transcript fetches and LLM calls, which can take a while
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
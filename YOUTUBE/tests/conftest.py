@@ -0,0 +1,47 @@
+import os
+import sys
+
+# Tests run on the in-memory mock database with process-local shared state
+os.environ.setdefault("USE_MOCK_DB", "true")
+os.environ.setdefault("MOCK_DB_PATH", "")
+os.environ.setdefault("SHARED_STATE_URL", "local")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.db import db, MockEngine
+from app.router import router
+
+@pytest.fixture
+def mock_db():
+    """
+    A fresh mock database for one test
+    """
+    previous = db.engine
+    db.engine = MockEngine()
+    yield db.engine
+    db.engine.close()
+    db.engine = previous
+
+@pytest.fixture
+def api():
+    """
+    Send one request to the API routes, without the application lifespan
+    """
+    app = FastAPI()
+    app.include_router(router)
+
+    def request(method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+        return asyncio.run(send())
+
+    return request
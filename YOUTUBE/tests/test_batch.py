@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult
+
+from app import crud
+from app.db import db, bulk_save, BulkSaveError
+from app.schema import YouTubeSummary
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    """
+    Replace the summary path with one that records calls and concurrency;
+    video IDs starting with "bad" fail
+    """
+    calls = []
+    running = [0, 0]
+
+    async def summarize_video(video_id, detail="standard"):
+        calls.append(video_id)
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if video_id.startswith("bad"):
+            raise RuntimeError("no transcript")
+        return f"Summary of {video_id}", "test-model"
+
+    monkeypatch.setattr(crud, "summarize_video", summarize_video)
+    return calls, running
+
+def read_lines(response) -> list:
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_videos_are_deduplicated_and_saved(mock_db, api, summarizer):
+    calls, _ = summarizer
+    urls = ["https://youtu.be/aaaaaaaaaaa", "https://www.youtube.com/watch?v=aaaaaaaaaaa&t=5", "bbbbbbbbbbb"]
+    lines = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": urls}))
+    assert sorted(calls) == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+    results = {line["video_id"]: line for line in lines[:-1]}
+    assert results["aaaaaaaaaaa"]["url"] == urls[0]
+    assert results["aaaaaaaaaaa"]["summary"] == "Summary of aaaaaaaaaaa"
+    assert lines[-1] == {"status": "done", "videos": 2, "saved": 2}
+
+    saved = asyncio.run(mock_db.find(YouTubeSummary))
+    assert sorted(str(s.id) for s in saved) == sorted(line["id"] for line in lines[:-1])
+
+def test_a_second_batch_updates_the_same_summaries(mock_db, api, summarizer):
+    first = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["aaaaaaaaaaa"]}))
+    second = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["https://youtu.be/aaaaaaaaaaa"]}))
+    assert second[0]["id"] == first[0]["id"]
+    saved = asyncio.run(mock_db.find(YouTubeSummary))
+    assert [(s.video_id, s.url) for s in saved] == [("aaaaaaaaaaa", "https://youtu.be/aaaaaaaaaaa")]
+
+def test_a_failed_video_does_not_stop_the_batch(mock_db, api, summarizer):
+    lines = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["badbadbad01", "ccccccccccc"]}))
+    results = {line["video_id"]: line for line in lines[:-1]}
+    assert results["badbadbad01"]["status"] == "error"
+    assert results["badbadbad01"]["detail"] == "no transcript"
+    assert results["ccccccccccc"]["status"] == "ok"
+    assert lines[-1]["saved"] == 1
+
+def test_playlist_videos_are_added_and_concurrency_is_bounded(mock_db, api, summarizer, monkeypatch):
+    calls, running = summarizer
+    monkeypatch.setattr(crud, "BATCH_SUMMARY_CONCURRENCY", 2)
+
+    async def playlist(playlist_id):
+        assert playlist_id == "PL1"
+        return [f"video{i:06d}" for i in range(6)]
+
+    monkeypatch.setattr(crud, "fetch_playlist_video_ids", playlist)
+    lines = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["video000000"], "playlist_id": "PL1"}))
+    assert len(calls) == 6
+    assert running[1] == 2
+    assert lines[-1]["videos"] == 6
+
+def test_batch_limits(mock_db, api, summarizer, monkeypatch):
+    assert api("POST", "/youtube-summaries/batch", json={}).status_code == 400
+    monkeypatch.setattr(crud, "BATCH_SUMMARY_MAX_VIDEOS", 2)
+    lines = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["a", "b", "c"]}))
+    assert lines == [{"status": "error", "detail": "A batch can contain at most 2 videos"}]
+    assert summarizer[0] == []
+
+class UniqueVideoEngine:
+    """
+    The mock engine behind MongoDB's bulk_write, with the unique video_id
+    index of the summary collection
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def get_collection(self, model):
+        return self
+
+    async def bulk_write(self, requests, ordered=True):
+        details = {"nUpserted": 0, "nMatched": 0, "nModified": 0, "writeErrors": []}
+        for i, request in enumerate(requests):
+            doc = request._doc
+            owners = await self.engine.find(YouTubeSummary, YouTubeSummary.video_id == doc["video_id"])
+            if any(owner.id != doc["_id"] for owner in owners):
+                details["writeErrors"].append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                continue
+            details["nMatched" if owners else "nUpserted"] += 1
+            self.engine.insert_raw(YouTubeSummary, [doc])
+        if details["writeErrors"]:
+            raise BulkWriteError(details)
+        return BulkWriteResult(details, True)
+
+def test_a_summary_created_during_the_batch_is_updated(mock_db, api, monkeypatch):
+    added = []
+    monkeypatch.setattr(db, "engine", UniqueVideoEngine(mock_db))
+    monkeypatch.setattr(crud.related_summaries, "add", lambda documents: asyncio.sleep(0, added.extend(documents)))
+
+    async def summarize_video(video_id, detail="standard"):
+        if video_id == "aaaaaaaaaaa":
+            # Another request saves this video's summary while the batch runs
+            await mock_db.save(YouTubeSummary(video_id=video_id, url="https://youtu.be/other", summary="Other"))
+        return f"Summary of {video_id}", "test-model"
+
+    monkeypatch.setattr(crud, "summarize_video", summarize_video)
+    lines = read_lines(api("POST", "/youtube-summaries/batch", json={"urls": ["aaaaaaaaaaa", "bbbbbbbbbbb"]}))
+    assert lines[-1] == {"status": "done", "videos": 2, "saved": 2}
+
+    saved = {s.video_id: s for s in asyncio.run(mock_db.find(YouTubeSummary))}
+    assert len(saved) == 2
+    assert saved["aaaaaaaaaaa"].summary == "Summary of aaaaaaaaaaa"
+    assert sorted(s.id for s in added) == sorted(s.id for s in saved.values())
+
+def test_bulk_save_reports_the_documents_it_wrote(mock_db, monkeypatch):
+    monkeypatch.setattr(db, "engine", UniqueVideoEngine(mock_db))
+
+    async def run():
+        await mock_db.save(YouTubeSummary(video_id="aaaaaaaaaaa", url="https://youtu.be/aaaaaaaaaaa", summary="A"))
+        documents = [
+            YouTubeSummary(video_id=video_id, url=f"https://youtu.be/{video_id}", summary="B")
+            for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb")
+        ]
+        with pytest.raises(BulkSaveError) as error:
+            await bulk_save(documents)
+        return documents, error.value
+
+    documents, error = asyncio.run(run())
+    assert error.saved == 1
+    assert error.written == documents[1:]
+    assert error.duplicates == documents[:1]
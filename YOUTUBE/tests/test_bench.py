@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from bench import run, stub_llm
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert run.percentile(values, 50) == 50.0
+    assert run.percentile(values, 95) == 95.0
+    assert run.percentile(values, 99) == 99.0
+    assert run.percentile([7.0], 99) == 7.0
+    assert run.percentile([], 50) == 0.0
+
+def test_distinct_videos_default_to_one_per_request():
+    args = run.parse_args(["--requests", "30"])
+    assert args.distinct_videos == 30
+    assert run.parse_args(["--requests", "30", "--distinct-videos", "3"]).distinct_videos == 3
+    with pytest.raises(ValueError):
+        run.request_factory("unknown", 1)
+
+def test_drive_counts_statuses_and_latencies():
+    app = FastAPI()
+
+    @app.get("/bookmarks/")
+    async def bookmarks(tag: str):
+        if tag == "tag0":
+            raise HTTPException(status_code=503)
+        return []
+
+    async def drive():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            return await run.drive(client, "bookmarks", requests=20, concurrency=4, distinct_videos=20)
+
+    result = asyncio.run(drive())
+    assert result["requests"] == 20
+    assert result["statuses"] == {"200": 18, "503": 2}
+    assert result["errors"] == 2
+    latency = result["latency_ms"]
+    assert 0 <= latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(stub_llm, "STUB_LLM_LATENCY", 0)
+    monkeypatch.setattr(stub_llm, "STUB_LLM_JITTER", 0)
+    monkeypatch.setattr(stub_llm, "STUB_LLM_TOKEN_DELAY", 0)
+
+    def post(body: dict) -> httpx.Response:
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_llm.app), base_url="http://llm") as client:
+                return await client.post("/v1/chat/completions", json=body)
+        return asyncio.run(send())
+
+    return post
+
+MESSAGES = [{"role": "user", "content": "Summarize: the quick brown fox"}]
+
+def test_stub_llm_answers_like_chat_completions(llm):
+    body = llm({"model": "stub-model", "messages": MESSAGES}).json()
+    assert body["model"] == "stub-model"
+    assert body["choices"][0]["message"]["content"].startswith("Stub summary:")
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+def test_stub_llm_streams_deltas(llm):
+    response = llm({"messages": MESSAGES, "stream": True})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [line[len("data: "):] for line in response.text.split("\n\n") if line]
+    assert frames[-1] == "[DONE]"
+    text = "".join(json.loads(f)["choices"][0]["delta"]["content"] for f in frames[:-1])
+    assert text.startswith("Stub summary:")
+
+def test_stub_llm_throttles_at_the_error_rate(llm, monkeypatch):
+    monkeypatch.setattr(stub_llm, "STUB_LLM_ERROR_RATE", 1.0)
+    response = llm({"messages": MESSAGES})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == stub_llm.STUB_LLM_RETRY_AFTER
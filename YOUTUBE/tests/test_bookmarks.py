@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.bookmark_io import bookmark_records, detect_format, normalize_url, parse_created_at
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def read_records(data: bytes, size: int, fmt=None, content_type=None) -> list:
+    async def collect():
+        return [r async for r in bookmark_records(chunked(data, size), fmt, content_type)]
+    return asyncio.run(collect())
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.com:443/a/b/?utm_source=x&b=2&a=1#frag", "https://example.com/a/b?a=1&b=2"),
+    ("http://user:pw@Host.com:8080/", "http://host.com:8080"),
+    ("https://example.com", "https://example.com"),
+    ("https://example.com/?q=1&fbclid=abc", "https://example.com?q=1"),
+    ("http://example.com:80/x", "http://example.com/x"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+def test_parse_created_at():
+    assert parse_created_at("1700000000") == datetime(2023, 11, 14, 22, 13, 20)
+    assert parse_created_at("2024-01-02T03:04:05+01:00") == datetime(2024, 1, 2, 2, 4, 5)
+    assert parse_created_at("yesterday") is None
+    assert parse_created_at(None) is None
+
+def test_detect_format():
+    assert detect_format("text/html; charset=utf-8", b"{") == "html"
+    assert detect_format("application/x-ndjson", b"<") == "ndjson"
+    assert detect_format(None, b"  <!DOCTYPE") == "html"
+    assert detect_format(None, b'{"url": "x"}') == "ndjson"
+
+NDJSON = '{"title": "Café", "url": "https://a.com"}\n\nnot json\n[1]\n{"title": "B", "url": "https://b.com"}'.encode()
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_ndjson_records_across_chunk_sizes(size):
+    records = read_records(NDJSON, size)
+    assert [(line, error is None) for line, _, error in records] == [(1, True), (3, False), (4, False), (5, True)]
+    assert records[0][1]["title"] == "Café"
+
+HTML = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+<DT><H3>Reading</H3>
+<DL><p>
+<DT><A HREF="https://a.com/" ADD_DATE="1700000000" TAGS="python,web">Ä &amp; B</A>
+<DD>First link
+<DT><A HREF="https://b.com/">B</A>
+</DL><p>
+<DT><A HREF="https://c.com/">C</A>
+</DL><p>
+""".encode()
+
+@pytest.mark.parametrize("size", [1, 5, 64, 10000])
+def test_netscape_records_across_chunk_sizes(size):
+    records = [record for _, record, _ in read_records(HTML, size, content_type="text/html")]
+    assert [r["url"] for r in records] == ["https://a.com/", "https://b.com/", "https://c.com/"]
+    assert records[0]["title"] == "Ä & B"
+    assert records[0]["tags"] == ["python", "web", "Reading"]
+    assert records[0]["description"] == "First link"
+    assert records[0]["created_at"] == "1700000000"
+    assert records[1]["tags"] == ["Reading"]
+    assert records[2]["tags"] == []
+
+def test_import_skips_duplicates_and_invalid_records(mock_db, api):
+    api("POST", "/bookmarks/", json={"title": "Existing", "url": "https://example.com/page"})
+    body = (
+        b'{"title": "Same page", "url": "https://EXAMPLE.com/page/?utm_source=feed"}\n'
+        b'{"title": "New", "url": "https://example.com/new"}\n'
+        b'{"title": "Again", "url": "https://example.com/new#top"}\n'
+        b'{"title": "", "url": "not a url"}\n'
+    )
+    report = api("POST", "/bookmarks/import", content=body).json()
+    assert (report["received"], report["imported"], report["duplicates"], report["invalid"]) == (4, 1, 2, 1)
+    assert report["errors"][0]["line"] == 4
+
+def test_export_round_trips_through_import(mock_db, api):
+    for i in range(3):
+        api("POST", "/bookmarks/", json={"title": f"B{i}", "url": f"https://example.com/{i}", "tags": ["t"]})
+    for fmt in ("ndjson", "html"):
+        exported = api("GET", "/bookmarks/export", params={"format": fmt})
+        assert exported.headers["content-disposition"].endswith(f'.{fmt}"')
+        report = api("POST", "/bookmarks/import", params={"format": fmt}, content=exported.content).json()
+        assert (report["received"], report["duplicates"]) == (3, 3)
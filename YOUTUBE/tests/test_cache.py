@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app import cache
+from app.cache import SummaryCache
+from app.schema import SummaryCacheEntry as Entry
+
+def test_local_layer_is_lru_with_ttl(monkeypatch):
+    summaries = SummaryCache(maxsize=2, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    summaries._set_local("a", "A", "m")
+    summaries._set_local("b", "B", "m")
+    assert summaries._get_local("a") == ("A", "m")
+    summaries._set_local("c", "C", "m")
+    # "b" was the least recently used
+    assert summaries._get_local("b") is None
+    assert summaries._get_local("a") == ("A", "m")
+    now[0] += 11
+    assert summaries._get_local("a") is None
+    assert summaries._get_local("c") is None
+
+def test_persisted_entries_outlive_the_local_layer(mock_db):
+    async def run():
+        summaries = SummaryCache()
+        await summaries.set("v1:3:r:standard", "v1", "Summary", "3", "m")
+        assert await SummaryCache().get("v1:3:r:standard") == ("Summary", "m")
+
+    asyncio.run(run())
+
+def test_expired_entries_are_ignored_and_removed(mock_db, monkeypatch):
+    monkeypatch.setattr(cache, "SUMMARY_CACHE_DB_TTL", 60)
+
+    async def run():
+        await mock_db.save(Entry(key="old", video_id="v1", summary="Old", prompt_version="3", model="m",
+                                 created_at=datetime.utcnow() - timedelta(seconds=120)))
+        assert await SummaryCache().get("old") is None
+        assert await mock_db.find(Entry) == []
+
+    asyncio.run(run())
+
+def test_prune_drops_other_prompt_versions_and_expired_entries(mock_db, monkeypatch):
+    monkeypatch.setattr(cache, "SUMMARY_CACHE_DB_TTL", 60)
+
+    async def run():
+        now = datetime.utcnow()
+        for key, version, age in (("keep", "3", 0), ("old-prompt", "2", 0), ("expired", "3", 120)):
+            await mock_db.save(Entry(key=key, video_id="v", summary="S", prompt_version=version, model="m",
+                                     created_at=now - timedelta(seconds=age)))
+        assert await SummaryCache().prune("3") == 2
+        assert [e.key for e in await mock_db.find(Entry)] == ["keep"]
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+from app import crud
+from app.chapters import format_timestamp, parse_chapter, window_segments
+
+def segment(start: float, text: str) -> dict:
+    return {"text": text, "start": start, "duration": 2.0}
+
+def test_windows_are_aligned_to_fixed_slots():
+    windows = window_segments([segment(0, "intro"), segment(250, "first"), segment(310, "second"), segment(900, "third")], seconds=300)
+    assert [(w["start"], w["text"]) for w in windows] == [(0, "intro first"), (310, "second"), (900, "third")]
+    assert windows[0]["end"] == 252.0
+
+def test_a_change_only_affects_its_own_window():
+    before = window_segments([segment(0, "a"), segment(400, "b")], seconds=300)
+    after = window_segments([segment(0, "a"), segment(400, "b changed")], seconds=300)
+    assert before[0]["hash"] == after[0]["hash"]
+    assert before[1]["hash"] != after[1]["hash"]
+
+def test_windows_split_on_tokens():
+    windows = window_segments([segment(i, "word " * 10) for i in range(5)], seconds=300, max_tokens=30)
+    assert len(windows) == 3
+
+def test_format_timestamp():
+    assert format_timestamp(65) == "1:05"
+    assert format_timestamp(3725) == "1:02:05"
+    assert format_timestamp(None) == "?"
+
+def test_parse_chapter_strips_labels():
+    title, summary = parse_chapter("Title: **Setting up**\nSummary: Installing the tools.", 0)
+    assert title.strip("*") == "Setting up"
+    assert summary == "Installing the tools."
+
+def test_transcript_emptied_by_cleaning_is_rejected_before_the_llm(mock_db, api, monkeypatch):
+    async def segments(video_id):
+        return [segment(0, "[Music]"), segment(5, "♪ ♪"), segment(9, "um")]
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("the LLM must not be called")
+
+    monkeypatch.setattr(crud, "fetch_youtube_transcript_segments", segments)
+    monkeypatch.setattr(crud, "summarize_chapter", no_llm)
+    monkeypatch.setattr(crud, "merge_chapters", no_llm)
+    response = api("POST", "/youtube-summary/chapters", json={"url": "https://youtu.be/dQw4w9WgXcQ"})
+    assert response.status_code == 422
+    assert "no text left" in response.json()["detail"]
@@ -0,0 +1,30 @@
+from app.chunking import chunk_segments, count_tokens, estimate_tokens, split_text
+
+def test_estimate_rounds_up_to_whole_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+def test_split_text_keeps_words_whole():
+    text = " ".join(f"word{i}" for i in range(50))
+    pieces = split_text(text, 20)
+    assert len(pieces) > 1
+    assert " ".join(pieces) == text
+    for piece in pieces:
+        assert sum(count_tokens(w) + 1 for w in piece.split()) <= 20
+
+def test_chunk_segments_keeps_segments_whole():
+    segments = [{"text": f"segment number {i} says something"} for i in range(10)]
+    size = count_tokens(segments[0]["text"]) + 1
+    chunks = chunk_segments(segments, max_tokens=size * 3)
+    assert len(chunks) == 4
+    assert chunks[0] == " ".join(s["text"] for s in segments[:3])
+    assert " ".join(chunks) == " ".join(s["text"] for s in segments)
+
+def test_chunk_segments_splits_oversized_segments_and_skips_blanks():
+    long_text = " ".join(["lengthy"] * 40)
+    chunks = chunk_segments([{"text": "intro"}, {"text": "  "}, {"text": long_text}, {"text": "outro"}], max_tokens=20)
+    assert chunks[0] == "intro"
+    assert chunks[-1] == "outro"
+    assert " ".join(chunks[1:-1]) == long_text
+    assert len(chunks) > 3
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from odmantic import query
+
+from app import db as db_module
+from app.crud import explain_hot_queries
+from app.db import SortedIndex, MockCollection, MockEngine, find_documents, iter_documents
+from app.schema import Bookmark, YouTubeSummary
+
+def test_sorted_index_puts_nulls_first():
+    index = SortedIndex()
+    for value, doc_id in ((3, "c"), (None, "n2"), (1, "a"), (None, "n1"), (2, "b")):
+        index.add(value, doc_id)
+    assert list(index.scan()) == ["n1", "n2", "a", "b", "c"]
+    assert list(index.scan(descending=True)) == ["c", "b", "a", "n2", "n1"]
+    assert list(index.scan({"$gte": 2})) == ["b", "c"]
+    assert list(index.scan({"$lt": 3}, descending=True)) == ["b", "a"]
+    index.remove(None, "n1")
+    index.remove(2, "b")
+    assert list(index.scan()) == ["n2", "a", "c"]
+
+def test_unindexed_sort_puts_nulls_first():
+    collection = MockCollection()
+    for doc_id, value in ((1, "b"), (2, None), (3, "a")):
+        collection.put({"_id": doc_id, "title": value})
+    assert [d["_id"] for d in collection.find((), sort={"title": 1})] == [2, 3, 1]
+    assert [d["_id"] for d in collection.find((), sort={"title": -1})] == [1, 3, 2]
+
+def test_sorted_queries_keep_documents_without_the_field(mock_db):
+    async def run():
+        now = datetime.utcnow().replace(microsecond=0)
+        for i in range(3):
+            await mock_db.save(YouTubeSummary(url=f"https://youtu.be/{i}", summary="s", created_at=now + timedelta(seconds=i)))
+        # Written by an older version without created_at
+        legacy = ObjectId()
+        mock_db._write({"op": "save", "collection": YouTubeSummary.__collection__,
+                        "doc": {"_id": legacy, "url": "https://youtu.be/legacy", "summary": "s"}})
+
+        ascending = await find_documents(YouTubeSummary, sort=query.asc(YouTubeSummary.created_at))
+        assert ascending[0]["_id"] == legacy and len(ascending) == 4
+        descending = await find_documents(YouTubeSummary, sort=query.desc(YouTubeSummary.created_at), limit=4)
+        assert descending[-1]["_id"] == legacy
+        recent = await find_documents(YouTubeSummary, YouTubeSummary.created_at >= now)
+        assert len(recent) == 3
+
+    asyncio.run(run())
+
+def test_iter_documents_pages_by_id(mock_db):
+    async def run():
+        for i in range(25):
+            await mock_db.save(Bookmark(title=f"B{i}", url=f"https://example.com/{i}", tags=["even" if i % 2 == 0 else "odd"]))
+        ids = [d["_id"] async for d in iter_documents(Bookmark, batch_size=4)]
+        assert len(ids) == 25 and ids == sorted(ids)
+        titles = [d["title"] async for d in iter_documents(Bookmark, Bookmark.tags.in_(["even"]), projection=["title"], batch_size=5)]
+        assert titles == [f"B{i}" for i in range(0, 25, 2)]
+
+    asyncio.run(run())
+
+def test_filtered_iteration_matches_each_candidate_once(mock_db, monkeypatch):
+    matched = []
+    match_query = db_module.match_query
+
+    def counting_match(doc, query):
+        if "$and" in query:
+            matched.append(doc["_id"])
+        return match_query(doc, query)
+
+    monkeypatch.setattr(db_module, "match_query", counting_match)
+
+    async def run():
+        bookmarks = [
+            Bookmark(title=f"B{i}", url=f"https://example.com/{i}", tags=["even" if i % 2 == 0 else "odd"])
+            for i in range(40)
+        ]
+        for bookmark in bookmarks:
+            await mock_db.save(bookmark)
+        pages = iter_documents(Bookmark, Bookmark.tags.in_(["even"]), batch_size=3)
+        first = await pages.__anext__()
+        # Changes between pages are seen by the later ones
+        await mock_db.delete(bookmarks[38])
+        return [first] + [d async for d in pages]
+
+    docs = asyncio.run(run())
+    assert [d["title"] for d in docs] == [f"B{i}" for i in range(0, 38, 2)]
+    # Every page resumes from the index position instead of matching again
+    assert len(matched) == len(set(matched)) == 19
+
+def test_log_is_compacted_while_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "MOCK_DB_COMPACT_MIN_RECORDS", 10)
+    path = str(tmp_path / "mock.log")
+
+    async def run():
+        engine = MockEngine(path)
+        bookmark = Bookmark(title="B0", url="https://example.com/0")
+        other = Bookmark(title="Other", url="https://example.com/other")
+        await engine.save(other)
+        for i in range(100):
+            bookmark.title = f"B{i}"
+            await engine.save(bookmark)
+        gone = Bookmark(title="Gone", url="https://example.com/gone")
+        await engine.save(gone)
+        await engine.delete(gone)
+        engine.close()
+
+        with open(path) as f:
+            records = len(f.readlines())
+        assert records <= 10
+        reopened = MockEngine(path)
+        titles = sorted(b.title for b in await reopened.find(Bookmark))
+        reopened.close()
+        assert titles == ["B99", "Other"]
+
+    asyncio.run(run())
+
+def test_hot_queries_use_an_index(mock_db):
+    plans = asyncio.run(explain_hot_queries())
+    assert plans["bookmarks_by_url_key"]["winningPlan"] == {"stage": "IXSCAN", "index": "url_key", "candidates": 0}
+    assert plans["bookmarks_by_url"]["winningPlan"]["index"] == "url"
+    assert all(plan["winningPlan"]["stage"] == "IXSCAN" for plan in plans.values())
@@ -0,0 +1,37 @@
+import asyncio
+
+from app import crud
+from app.http_cache import etag_matches, make_etag
+from app.schema import Bookmark
+
+def test_make_etag_depends_on_every_part():
+    assert make_etag("bookmarks", "e.1", None) == make_etag("bookmarks", "e.1", None)
+    assert make_etag("bookmarks", "e.1", None) != make_etag("bookmarks", "e.2", None)
+    assert make_etag("a", "bc") != make_etag("ab", "c")
+    assert make_etag("x").startswith('"') and make_etag("x").endswith('"')
+
+def test_etag_matches():
+    etag = make_etag("x")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+def test_list_revalidates_with_etag(mock_db, api):
+    asyncio.run(mock_db.save(Bookmark(title="One", url="https://example.com/1")))
+    first = api("GET", "/bookmarks/")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    again = api("GET", "/bookmarks/", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+def test_list_error_is_not_tagged(mock_db, api, monkeypatch):
+    async def failing(*args, **kwargs):
+        raise ConnectionError("database down")
+
+    monkeypatch.setattr(crud, "find_documents", failing)
+    for url in ("/bookmarks/", "/youtube-summaries/"):
+        response = api("GET", url)
+        assert response.status_code == 503
+        assert "etag" not in response.headers
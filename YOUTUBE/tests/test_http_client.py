@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app import http_client
+from app.http_client import http, parse_retry_after, post_with_retries, retry_delay, stream_with_retries
+
+URL = "https://llm.test/v1/chat/completions"
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Point the shared client at a scripted handler; retries are recorded
+    instead of slept through
+    """
+    delays = []
+
+    def no_wait(attempt, retry_after=None):
+        delays.append(retry_after)
+        return 0
+
+    monkeypatch.setattr(http_client, "retry_delay", no_wait)
+
+    def install(handler):
+        http.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return delays
+
+    yield install
+    asyncio.run(http_client.close_http_client())
+
+def scripted(*outcomes):
+    calls = []
+
+    def handler(request):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return handler, calls
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= parse_retry_after(later) <= 30
+
+def test_retry_delay_is_capped_and_honours_retry_after():
+    for attempt in range(12):
+        assert 0 <= retry_delay(attempt) <= http_client.HTTP_RETRY_MAX_DELAY
+    assert retry_delay(0, 5.0) >= 5.0
+
+def test_retries_429_until_success(upstream):
+    handler, calls = scripted(
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"ok": True})
+    )
+    delays = upstream(handler)
+    response = asyncio.run(post_with_retries(URL, json={}))
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert delays == [2.0, None]
+
+def test_returns_the_last_response_when_retries_run_out(upstream):
+    handler, calls = scripted(httpx.Response(503))
+    upstream(handler)
+    response = asyncio.run(post_with_retries(URL, max_retries=2, json={}))
+    assert response.status_code == 503
+    assert len(calls) == 3
+
+def test_client_errors_are_not_retried(upstream):
+    handler, calls = scripted(httpx.Response(400))
+    upstream(handler)
+    assert asyncio.run(post_with_retries(URL, json={})).status_code == 400
+    assert len(calls) == 1
+
+def test_transport_errors_are_retried_then_raised(upstream):
+    handler, calls = scripted(httpx.ConnectError("refused"))
+    upstream(handler)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(post_with_retries(URL, max_retries=1, json={}))
+    assert len(calls) == 2
+
+def test_streams_release_the_host_slot_during_backoff(upstream, monkeypatch):
+    def handler(request):
+        if b"stream" in request.content and not streamed:
+            streamed.append(request)
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    streamed = []
+    upstream(handler)
+    monkeypatch.setattr(http_client, "retry_delay", lambda attempt, retry_after=None: 0.2)
+    monkeypatch.setattr(http_client, "HTTP_PER_HOST_CONCURRENCY", 1)
+    http.host_limits = {}
+
+    async def stream():
+        async with stream_with_retries(URL, json={"stream": True}) as response:
+            return response.status_code
+
+    async def run():
+        streaming = asyncio.create_task(stream())
+        await asyncio.sleep(0.05)
+        # The stream is backing off after its 503: the only slot is free meanwhile
+        response = await asyncio.wait_for(post_with_retries(URL, json={}), 0.1)
+        assert response.status_code == 200
+        assert not streaming.done()
+        assert await streaming == 200
+
+    asyncio.run(run())
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app import jobs
+from app.jobs import JobQueue, JobQueueFull, JOB_DONE, JOB_PENDING, JOB_RUNNING
+from app.schema import SummaryJob, YouTubeSummaryCreate
+from app.shared_state import SQLiteState
+
+async def wait_for_jobs(engine, count: int, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        done = await engine.find(SummaryJob, SummaryJob.status == JOB_DONE)
+        if len(done) == count:
+            return done
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{len(done)} of {count} jobs finished")
+
+def test_restart_requeues_more_jobs_than_the_queue_holds(mock_db, monkeypatch):
+    async def build(summary_data):
+        await asyncio.sleep(0)
+        return {"url": summary_data.url}
+
+    monkeypatch.setattr(jobs, "build_youtube_summary", build)
+    # Smaller than the number of jobs, so most are evicted before they run
+    monkeypatch.setattr(jobs, "SUMMARY_JOB_HISTORY", 3)
+
+    async def run():
+        for i in range(25):
+            status = JOB_RUNNING if i % 5 == 0 else JOB_PENDING
+            await mock_db.save(SummaryJob(url=f"https://youtu.be/job{i:05d}", status=status))
+
+        queue = JobQueue(workers=2, maxsize=5)
+        await queue.start()
+        try:
+            done = await wait_for_jobs(mock_db, 25)
+        finally:
+            await queue.stop()
+        assert {job.result["url"] for job in done} == {f"https://youtu.be/job{i:05d}" for i in range(25)}
+
+    asyncio.run(run())
+
+def test_finished_jobs_evicted_from_history_are_not_run_again(mock_db, monkeypatch):
+    calls = []
+
+    async def build(summary_data):
+        calls.append(summary_data.url)
+        return {}
+
+    monkeypatch.setattr(jobs, "build_youtube_summary", build)
+
+    async def run():
+        job = SummaryJob(url="https://youtu.be/finished01", status=JOB_DONE)
+        await mock_db.save(job)
+        queue = JobQueue(workers=1, maxsize=5)
+        await queue.start()
+        try:
+            await queue.queue.put(str(job.id))
+            await queue.queue.join()
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert calls == []
+
+def test_concurrent_submits_beyond_the_queue_size_are_rejected(mock_db, monkeypatch):
+    save = mock_db.save
+
+    async def slow_save(document):
+        # Yield like a real database, so the submits interleave
+        await asyncio.sleep(0)
+        return await save(document)
+
+    monkeypatch.setattr(mock_db, "save", slow_save)
+
+    async def run():
+        queue = JobQueue(workers=0, maxsize=3)
+        await queue.start()
+        try:
+            results = await asyncio.gather(
+                *(queue.submit(YouTubeSummaryCreate(url=f"https://youtu.be/job{i:05d}")) for i in range(8)),
+                return_exceptions=True
+            )
+        finally:
+            await queue.stop()
+        submitted = [r for r in results if isinstance(r, SummaryJob)]
+        assert len(submitted) == 3
+        assert all(isinstance(r, JobQueueFull) for r in results if r not in submitted)
+        assert queue.queue.qsize() == 3
+        # Rejected jobs are not left behind as pending
+        saved = await mock_db.find(SummaryJob)
+        assert {job.id for job in saved} == {job.id for job in submitted}
+
+    asyncio.run(run())
+
+def test_jobs_of_a_dead_worker_are_swept_once_their_lease_expires(mock_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "SUMMARY_JOB_LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(jobs, "SUMMARY_JOB_SWEEP_SECONDS", 0.02)
+    calls = []
+
+    async def build(summary_data):
+        calls.append(summary_data.url)
+        if len(calls) == 1:
+            # The first worker never finishes, as if its process had died
+            await asyncio.Event().wait()
+        return {"url": summary_data.url}
+
+    monkeypatch.setattr(jobs, "build_youtube_summary", build)
+
+    async def run():
+        job = SummaryJob(url="https://youtu.be/orphaned01")
+        await mock_db.save(job)
+        path = str(tmp_path / "state.db")
+        first = JobQueue(workers=1, maxsize=5, state=SQLiteState(path))
+        second = JobQueue(workers=1, maxsize=5, state=SQLiteState(path))
+        await first.start()
+        try:
+            while not calls:
+                await asyncio.sleep(0.01)
+            # The second worker requeues the job on startup, but the lease held
+            # by the first one makes it drop the job
+            await second.start()
+            await asyncio.sleep(0.1)
+            assert len(calls) == 1
+            [done] = await wait_for_jobs(mock_db, 1)
+        finally:
+            await second.stop()
+            await first.stop()
+            await first.state.close()
+            await second.state.close()
+        assert done.result == {"url": "https://youtu.be/orphaned01"}
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+def test_sweep_skips_recent_and_leased_jobs(mock_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "SUMMARY_JOB_SWEEP_SECONDS", 0)
+
+    async def run():
+        state = SQLiteState(str(tmp_path / "state.db"))
+        old = datetime.utcnow() - timedelta(seconds=jobs.SUMMARY_JOB_LEASE_SECONDS + 1)
+        orphaned = SummaryJob(url="https://youtu.be/orphaned01", status=JOB_RUNNING, updated_at=old)
+        leased = SummaryJob(url="https://youtu.be/leased0001", status=JOB_RUNNING, updated_at=old)
+        finished = SummaryJob(url="https://youtu.be/finished01", status=JOB_DONE, updated_at=old)
+        recent = SummaryJob(url="https://youtu.be/recent0001")
+        for job in (orphaned, leased, finished, recent):
+            await mock_db.save(job)
+        await state.acquire_lease(f"job:{leased.id}", 60)
+
+        queue = JobQueue(workers=0, maxsize=5, state=state)
+        queue.queue = asyncio.Queue(maxsize=5)
+        assert await queue.sweep() == 1
+        # Still waiting in this worker's queue: not queued a second time
+        assert await queue.sweep() == 0
+        assert queue.queue.get_nowait() == str(orphaned.id)
+        assert queue.queue.empty()
+        await state.close()
+
+    asyncio.run(run())
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import llm_limits
+from app.llm_limits import (
+    BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN,
+    CircuitBreaker, LLMRateLimiter, LLMUnavailable, TokenBucket, parse_duration
+)
+
+class Clock:
+    """
+    Stands in for time.monotonic; sleeping advances it instead of waiting
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_limits.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(llm_limits.asyncio, "sleep", clock.sleep)
+    return clock
+
+def test_parse_duration():
+    assert parse_duration("1s") == 1.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("2") == 2.0
+    assert parse_duration(None) is None
+
+def test_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(60)
+        assert clock.sleeps == []
+        await bucket.acquire(1)
+        assert clock.sleeps == [1.0]
+        # More than the whole bucket waits for a full bucket, not forever
+        await bucket.acquire(500)
+        assert clock.sleeps == [1.0, 60.0]
+
+    asyncio.run(run())
+
+def test_pause_blocks_callers(clock):
+    bucket = TokenBucket(60)
+    bucket.pause(5)
+
+    async def run():
+        await bucket.acquire(1)
+
+    asyncio.run(run())
+    assert clock.sleeps == [5.0]
+
+def test_upstream_limits_shrink_but_never_grow_the_bucket(clock):
+    bucket = TokenBucket(100)
+    bucket.observe(limit=50, remaining=10)
+    assert (bucket.capacity, bucket.level) == (50, 10)
+    bucket.observe(limit=1000, remaining=None)
+    assert bucket.capacity == 100
+    bucket.credit(500)
+    assert bucket.level == 100
+
+def test_throttled_response_pauses_both_buckets(clock):
+    limiter = LLMRateLimiter(rpm=60, tpm=6000)
+    limiter.observe(httpx.Response(429, headers={"retry-after": "3"}))
+    assert limiter.requests.blocked_until == limiter.tokens.blocked_until == clock.now + 3
+
+    limiter.observe(httpx.Response(429, headers={"x-ratelimit-reset-requests": "2s", "x-ratelimit-reset-tokens": "6m0s"}))
+    assert limiter.tokens.blocked_until == clock.now + 360
+    assert limiter.throttled == 2
+
+    limiter.observe(httpx.Response(200, headers={"x-ratelimit-limit-tokens": "3000", "x-ratelimit-remaining-tokens": "100"}))
+    assert (limiter.tokens.capacity, limiter.tokens.level) == (3000, 100)
+    limiter.settle(reserved=500, used=200)
+    assert limiter.tokens.level == 400
+
+def test_breaker_opens_and_probes_after_cooldown(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    for status in (500, None, 400, 429, 503):
+        breaker.check()
+        breaker.record(status)
+    # The 400 reset the count; 429 and 503 only make two failures
+    assert breaker.state == BREAKER_CLOSED
+    breaker.record(502)
+    assert breaker.state == BREAKER_OPEN
+
+    clock.now += 10
+    with pytest.raises(LLMUnavailable) as rejected:
+        breaker.check()
+    assert rejected.value.retry_after == pytest.approx(20)
+
+    clock.now += 20
+    breaker.check()
+    assert breaker.state == BREAKER_HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(LLMUnavailable):
+        breaker.check()
+    breaker.record(500)
+    assert breaker.state == BREAKER_OPEN
+
+    clock.now += 30
+    breaker.check()
+    breaker.record(200)
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.stats() == {"state": BREAKER_CLOSED, "failures": 0, "rejected": 2}
+
+def test_breaker_with_no_threshold_never_opens(clock):
+    breaker = CircuitBreaker(failures=0)
+    for _ in range(10):
+        breaker.check()
+        breaker.record(None)
+    assert breaker.state == BREAKER_CLOSED
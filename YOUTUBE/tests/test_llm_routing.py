@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from app.llm_routing import ModelProfile, acceptable_summary, load_profiles, route, routing_version
+
+PROFILES = [
+    ModelProfile(name="small", model="small-model", max_input_tokens=4000, details=["brief", "standard"]),
+    ModelProfile(name="medium", model="medium-model", max_input_tokens=16000),
+    ModelProfile(name="large", model="large-model"),
+]
+
+def names(profiles):
+    return [p.name for p in profiles]
+
+@pytest.mark.parametrize("tokens, detail, expected", [
+    (1000, "standard", ["small", "medium", "large"]),
+    (4000, "brief", ["small", "medium", "large"]),
+    (4001, "standard", ["medium", "large"]),
+    (16001, "standard", ["large"]),
+    (1000, "detailed", ["medium", "large"]),
+])
+def test_route_picks_the_cheapest_profile_that_fits(tokens, detail, expected):
+    assert names(route(tokens, detail, PROFILES)) == expected
+
+def test_route_uses_the_largest_profile_when_nothing_fits():
+    bounded = [p for p in PROFILES if p.max_input_tokens]
+    assert names(route(50000, "standard", bounded)) == ["medium"]
+
+def test_route_ignores_the_detail_level_when_no_profile_serves_it():
+    only_brief = [ModelProfile(name="small", model="m", details=["brief"])]
+    assert names(route(10, "detailed", only_brief)) == ["small"]
+
+def test_routing_version_follows_the_routing_table():
+    assert routing_version(PROFILES) == routing_version([p.model_copy() for p in PROFILES])
+    changed = [PROFILES[0].model_copy(update={"max_input_tokens": 8000})] + PROFILES[1:]
+    assert routing_version(changed) != routing_version(PROFILES)
+    # Rate limits do not change which model writes a summary
+    assert routing_version([PROFILES[0].model_copy(update={"rpm": 1})] + PROFILES[1:]) == routing_version(PROFILES)
+
+def test_acceptable_summary_scales_with_the_detail_level():
+    assert not acceptable_summary(None)
+    assert not acceptable_summary("too short", "standard")
+    assert acceptable_summary(" ".join(["word"] * 40), "standard")
+    # A brief summary only needs a third of its 120 word target
+    assert acceptable_summary(" ".join(["word"] * 40), "brief")
+    assert not acceptable_summary(" ".join(["word"] * 39), "brief")
+
+def test_load_profiles_from_json_or_file(tmp_path, monkeypatch):
+    config = json.dumps([{"name": "local", "model": "llama", "url": "http://localhost:8080/v1/chat/completions", "api_key_env": "LOCAL_KEY"}])
+    monkeypatch.setenv("LOCAL_KEY", "secret")
+    [profile] = load_profiles(config)
+    assert profile.key() == "secret"
+    assert profile.details == ["brief", "standard", "detailed"]
+
+    path = tmp_path / "models.json"
+    path.write_text(config)
+    assert load_profiles(str(path)) == [profile]
+
+    with pytest.raises(ValueError):
+        load_profiles("[]")
+
+def test_default_profile_without_configuration():
+    [profile] = load_profiles("")
+    assert profile.name == "default"
+    assert profile.max_input_tokens == 0
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+import sys
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from app.log import JsonFormatter, RequestIdFilter, request_id_var
+from app.metrics import record_openai_usage
+from app.middleware import RequestContextMiddleware
+
+def request_count(route: str, status: str) -> float:
+    return REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": "GET", "route": route, "status": status}
+    ) or 0.0
+
+def traced_app():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"request_id": request_id_var.get()}
+
+    def get(url: str, **kwargs) -> httpx.Response:
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(url, **kwargs)
+        return asyncio.run(send())
+
+    return get
+
+def test_request_ids_are_echoed_or_generated():
+    get = traced_app()
+    given = get("/items/1", headers={"X-Request-ID": "abc-123"})
+    assert given.headers["x-request-id"] == "abc-123"
+    assert given.json()["request_id"] == "abc-123"
+
+    for headers in ({}, {"X-Request-ID": "not a valid id"}):
+        response = get("/items/1", headers=headers)
+        generated = response.headers["x-request-id"]
+        assert len(generated) == 32 and generated != "abc-123"
+        assert response.json()["request_id"] == generated
+    assert request_id_var.get() == "-"
+
+def test_latency_is_recorded_by_route_template():
+    get = traced_app()
+    before = request_count("/items/{item_id}", "200")
+    get("/items/1")
+    get("/items/2")
+    assert request_count("/items/{item_id}", "200") == before + 2
+    assert request_count("/items/1", "200") == 0
+
+def test_json_log_lines_carry_request_id_and_extra_fields():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "saved %d items", (3,), None)
+    record.duration_ms = 12.5
+    token = request_id_var.set("req-1")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "saved 3 items"
+    assert entry["request_id"] == "req-1"
+    assert entry["level"] == "INFO"
+    assert entry["duration_ms"] == 12.5
+    assert "args" not in entry
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        failed = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+    assert "ValueError: boom" in json.loads(JsonFormatter().format(failed))["exc_info"]
+
+def test_metrics_endpoint_exposes_openai_usage(api):
+    record_openai_usage("test-model", {"prompt_tokens": 7, "completion_tokens": 3})
+    response = api("GET", "/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'openai_tokens_total{kind="prompt",model="test-model"}' in response.text
+    assert "summary_stage_duration_seconds" in response.text
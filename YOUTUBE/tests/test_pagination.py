@@ -0,0 +1,46 @@
+import asyncio
+
+from app.schema import YouTubeSummary
+
+def pages(api, url: str, **params) -> list:
+    """
+    Follow X-Next-Cursor through every page, returning the items of each
+    """
+    result = []
+    while True:
+        response = api("GET", url, params=params)
+        assert response.status_code == 200
+        result.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return result
+        params["after"] = cursor
+
+def test_keyset_pages_cover_every_bookmark_once(mock_db, api):
+    for i in range(7):
+        api("POST", "/bookmarks/", json={"title": f"B{i}", "url": f"https://example.com/{i}"})
+    result = pages(api, "/bookmarks/", limit=3, fields="id,title")
+    assert [len(page) for page in result] == [3, 3, 1]
+    assert [b["title"] for page in result for b in page] == [f"B{i}" for i in reversed(range(7))]
+    assert all(set(b) == {"id", "title"} for page in result for b in page)
+
+def test_tag_filter_pages(mock_db, api):
+    for i in range(5):
+        api("POST", "/bookmarks/", json={"title": f"B{i}", "url": f"https://example.com/{i}", "tags": ["even" if i % 2 == 0 else "odd"]})
+    result = pages(api, "/bookmarks/", tag="even", limit=2)
+    assert [b["title"] for page in result for b in page] == ["B4", "B2", "B0"]
+
+def test_summary_pages(mock_db, api):
+    async def seed():
+        for i in range(5):
+            await mock_db.save(YouTubeSummary(url=f"https://youtu.be/{i}", summary=f"S{i}"))
+    asyncio.run(seed())
+    result = pages(api, "/youtube-summaries/", limit=2, fields="url")
+    assert [len(page) for page in result] == [2, 2, 1]
+    assert [s["url"] for page in result for s in page] == [f"https://youtu.be/{i}" for i in reversed(range(5))]
+    assert set(result[0][0]) == {"id", "url"}
+
+def test_invalid_cursor_and_limit_are_rejected(mock_db, api):
+    assert api("GET", "/bookmarks/", params={"after": "not-a-cursor"}).status_code == 400
+    assert api("GET", "/youtube-summaries/", params={"after": "not-a-cursor"}).status_code == 400
+    assert api("GET", "/bookmarks/", params={"limit": 0}).status_code == 422
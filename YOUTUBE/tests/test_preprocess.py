@@ -0,0 +1,60 @@
+from app.chunking import count_tokens
+from app.preprocess import clean_caption, dedupe_captions, prepare_transcript, select_salient, split_sentences
+
+def test_clean_caption_strips_markers_timestamps_and_fillers():
+    assert clean_caption("[Music] um so at 1:23 we  start ♪ la la ♪") == "so at we start"
+    assert clean_caption(">> (applause)") == ""
+
+def test_dedupe_drops_repeats_and_rolling_overlap():
+    segments = [
+        {"text": "hello there everyone", "start": 0},
+        {"text": "hello there everyone", "start": 1},
+        {"text": "there everyone welcome back", "start": 2},
+        {"text": "everyone", "start": 3},
+    ]
+    kept, dropped = dedupe_captions(segments)
+    assert [s["text"] for s in kept] == ["hello there everyone", "welcome back", "everyone"]
+    assert kept[1]["start"] == 2
+    assert dropped == 1
+
+def test_split_sentences_regroups_punctuated_captions():
+    segments = [
+        {"text": "First sentence starts", "start": 0},
+        {"text": "and ends here. Second one", "start": 2},
+        {"text": "is short.", "start": 4},
+    ]
+    assert split_sentences(segments) == [
+        {"text": "First sentence starts and ends here.", "start": 0},
+        {"text": "Second one is short.", "start": 2},
+    ]
+
+def test_split_sentences_keeps_unpunctuated_captions():
+    segments = [{"text": f"line {i}", "start": i} for i in range(6)]
+    assert split_sentences(segments) == segments
+
+def test_select_salient_prefers_recurring_topics_in_order():
+    units = [
+        {"text": "python async tutorial"},
+        {"text": "my cat walked by"},
+        {"text": "python async await"},
+        {"text": "async python tasks"},
+    ]
+    budget = sum(count_tokens(u["text"]) + 1 for u in units) - 1
+    chosen = select_salient(units, budget)
+    assert units[1] not in chosen
+    assert chosen == [units[0], units[2], units[3]]
+
+def test_prepare_transcript_reports_savings():
+    segments = [{"text": "[Music]", "start": 0}, {"text": "um welcome", "start": 1}, {"text": "welcome", "start": 2}]
+    cleaned, report = prepare_transcript(segments)
+    assert cleaned == [{"text": "welcome", "start": 1}]
+    assert report["duplicate_segments"] == 1
+    assert report["tokens_saved"] == report["tokens_before"] - report["tokens_after"] > 0
+    assert not report["trimmed"]
+
+def test_prepare_transcript_trims_to_budget():
+    segments = [{"text": f"Sentence {i} is about databases.", "start": i} for i in range(40)]
+    cleaned, report = prepare_transcript(segments, budget=50)
+    assert report["trimmed"]
+    assert report["tokens_after"] <= 50
+    assert [s["start"] for s in cleaned] == sorted(s["start"] for s in cleaned)
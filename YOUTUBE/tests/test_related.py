@@ -0,0 +1,112 @@
+import asyncio
+
+import numpy as np
+
+from app import related
+from app.related import RelatedSummaries, VectorIndex
+from app.schema import SummaryEmbedding, YouTubeSummary
+
+def unit(*values) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+def test_search_orders_by_cosine_similarity():
+    index = VectorIndex(3)
+    index.add("a", unit(1, 0, 0))
+    index.add("b", unit(0.9, 0.1, 0))
+    index.add("c", unit(0, 1, 0))
+    index.add("d", unit(0, 0, 1))
+    index.build()
+    results = index.search("a", 3)
+    assert results[0][0] == "b"
+    assert results[0][1] > results[1][1]
+    assert "a" not in [i for i, _ in results]
+
+def test_changes_after_a_snapshot_are_found():
+    index = VectorIndex(3, rebuild_seconds=3600)
+    index.add("a", unit(1, 0, 0))
+    index.add("c", unit(0, 1, 0))
+    index.build()
+    index.add("b", unit(1, 0.1, 0))
+    assert index.search("a", 1)[0][0] == "b"
+    index.remove("b")
+    assert index.search("a", 1)[0][0] == "c"
+
+def test_rows_changed_during_a_build_stay_pending():
+    index = VectorIndex(3)
+    index.add("a", unit(1, 0, 0))
+    index.add("c", unit(0, 1, 0))
+    state = index.snapshot()
+    # Written while the build runs in its thread
+    index.add("b", unit(1, 0.1, 0))
+    index.apply(index.compute(*state))
+    assert index.changed == {index.rows["b"]}
+    assert index.search("a", 1)[0][0] == "b"
+
+def test_failed_build_gives_its_rows_back():
+    index = VectorIndex(3)
+    index.add("a", unit(1, 0, 0))
+    index.snapshot()
+    index.abort()
+    assert index.changed == {index.rows["a"]}
+
+def test_ivf_search_finds_the_nearest_neighbours():
+    rng = np.random.default_rng(1)
+    vectors = rng.random((400, 16), dtype=np.float32)
+    exact = VectorIndex(16, ivf_min_vectors=0)
+    ivf = VectorIndex(16, ivf_min_vectors=100, probes=20)
+    for i, vector in enumerate(vectors):
+        exact.add(str(i), vector)
+        ivf.add(str(i), vector)
+    exact.build()
+    ivf.build()
+    assert ivf.lists
+    assert ivf.search("0", 5) == exact.search("0", 5)
+
+def summary(video_id: str, text: str) -> YouTubeSummary:
+    return YouTubeSummary(video_id=video_id, url=f"https://youtu.be/{video_id}", summary=text)
+
+def test_summaries_are_embedded_on_save_before_the_index_loads(mock_db):
+    async def run():
+        service = RelatedSummaries()
+        saved = [summary("v1", "python asyncio event loop"), summary("v2", "python asyncio tasks"),
+                 summary("v3", "baking sourdough bread")]
+        for s in saved:
+            await mock_db.save(s)
+        await service.add(saved)
+        assert service.index is None
+        assert len(await mock_db.find(SummaryEmbedding)) == 3
+
+        matches = await service.related(str(saved[0].id), 2)
+        assert matches[0][0] == str(saved[1].id)
+
+        await service.remove(str(saved[1].id))
+        assert str(saved[1].id) not in [i for i, _ in await service.related(str(saved[0].id), 2)]
+
+    asyncio.run(run())
+
+def test_deletions_by_another_worker_are_synced(mock_db, monkeypatch):
+    class Versions:
+        version = 0
+
+        async def get(self, model):
+            return self.version
+
+    versions = Versions()
+    monkeypatch.setattr(related, "collection_versions", versions)
+    monkeypatch.setattr(related.shared_state, "distributed", True, raising=False)
+
+    async def run():
+        first, second = RelatedSummaries(), RelatedSummaries()
+        saved = [summary("w1", "python asyncio event loop"), summary("w2", "python asyncio tasks"),
+                 summary("w3", "baking sourdough bread")]
+        for s in saved:
+            await mock_db.save(s)
+        await first.add(saved)
+        await first.load()
+        await second.load()
+
+        await second.remove(str(saved[1].id))
+        versions.version += 1
+        assert str(saved[1].id) not in [i for i, _ in await first.related(str(saved[0].id), 2)]
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app import responses
+from app.db import find_documents
+from app.responses import RawJSONResponse, dumps
+from app.schema import Bookmark
+
+DOCUMENT = {
+    "_id": ObjectId("65a000000000000000000001"),
+    "title": "Café",
+    "tags": ["a", "b"],
+    "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+    "description": None
+}
+
+EXPECTED = {
+    "_id": "65a000000000000000000001",
+    "title": "Café",
+    "tags": ["a", "b"],
+    "created_at": "2024-01-02T03:04:05.678000",
+    "description": None
+}
+
+def test_bson_values_are_encoded():
+    assert json.loads(dumps(DOCUMENT)) == EXPECTED
+    assert json.loads(RawJSONResponse([DOCUMENT]).body) == [EXPECTED]
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+def test_stdlib_fallback_matches(monkeypatch):
+    encoded = dumps(DOCUMENT)
+    monkeypatch.setattr(responses, "orjson", None)
+    assert dumps(DOCUMENT) == encoded
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+def test_find_documents_returns_projected_raw_documents(mock_db):
+    async def run():
+        await mock_db.save(Bookmark(title="T", url="https://example.com", tags=["x"]))
+        return await find_documents(Bookmark, projection=["_id", "title"]), await find_documents(Bookmark)
+
+    projected, full = asyncio.run(run())
+    assert set(projected[0]) == {"_id", "title"}
+    assert isinstance(projected[0]["_id"], ObjectId)
+    assert isinstance(full[0]["created_at"], datetime)
+
+def test_list_items_match_the_created_bookmark(mock_db, api):
+    created = api("POST", "/bookmarks/", json={"title": "T", "url": "https://example.com/", "tags": ["x"]}).json()
+    listed = api("GET", "/bookmarks/").json()
+    assert listed == [created]
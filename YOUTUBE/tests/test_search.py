@@ -0,0 +1,36 @@
+from app.search import InvertedIndex, make_snippet, tokenize
+
+WEIGHTS = {"title": 10, "description": 1}
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("The Quick, brown FOX of 2024") == ["quick", "brown", "fox", "2024"]
+
+def test_search_ranks_weighted_fields_first():
+    index = InvertedIndex()
+    index.add("bookmark", "1", {"title": "Cooking", "description": "python snakes"}, WEIGHTS)
+    index.add("bookmark", "2", {"title": "Python tips", "description": "tips"}, WEIGHTS)
+    index.add("bookmark", "3", {"title": "Gardening", "description": "roses"}, WEIGHTS)
+    results = index.search("python", limit=10)
+    assert [doc_id for _, _, doc_id, _ in results] == ["2", "1"]
+    assert results[0][0] > results[1][0]
+    assert index.search("python", limit=1, offset=1)[0][2] == "1"
+    assert index.search("the", limit=10) == []
+
+def test_add_replaces_and_remove_drops_postings():
+    index = InvertedIndex()
+    index.add("note", "1", {"title": "old words"}, WEIGHTS)
+    index.add("note", "1", {"title": "new words"}, WEIGHTS)
+    assert index.search("old", limit=10) == []
+    assert [r[2] for r in index.search("new", limit=10)] == ["1"]
+    index.remove("note", "1")
+    assert index.postings == {}
+    assert index.total_length == 0
+    assert index.search("new", limit=10) == []
+
+def test_snippet_marks_terms_and_escapes_html():
+    text = "intro " * 40 + "<b>Python</b> rocks"
+    snippet = make_snippet(text, "python", length=40)
+    assert snippet.startswith("…")
+    assert "<mark>Python</mark>" in snippet
+    assert "&lt;b&gt;" in snippet
+    assert make_snippet("", "python") == ""
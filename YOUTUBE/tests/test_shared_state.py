@@ -0,0 +1,154 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from app import singleflight
+from app.cache import SummaryCache
+from app.http_cache import CollectionVersions
+from app.llm_limits import TokenBucket
+from app.schema import Bookmark
+from app.shared_state import LocalState, SharedState, SQLiteState, create_shared_state
+from app.singleflight import SingleFlight
+
+@contextlib.asynccontextmanager
+async def workers(tmp_path, count: int = 2):
+    """
+    Shared-state instances on one SQLite file, each with its own connection
+    and thread like the worker processes of one host
+    """
+    path = str(tmp_path / "state.db")
+    states = [SQLiteState(path) for _ in range(count)]
+    try:
+        yield states
+    finally:
+        for state in states:
+            await state.close()
+
+@pytest.fixture(params=["local", "sqlite"])
+def state(request, tmp_path):
+    return LocalState() if request.param == "local" else SQLiteState(str(tmp_path / "state.db"))
+
+def test_create_shared_state(tmp_path):
+    assert isinstance(create_shared_state("local"), LocalState)
+    assert isinstance(create_shared_state(f"sqlite:///{tmp_path}/s.db"), SQLiteState)
+    with pytest.raises(ValueError):
+        create_shared_state("redis://localhost")
+    # A backend has to implement every operation
+    with pytest.raises(TypeError):
+        SharedState()
+
+def test_values_counters_and_expiry(state):
+    async def run():
+        await state.set("summary:a:1", "x")
+        await state.set("summary:b:1", "y", ttl=0.05)
+        await state.set("other", "z")
+        assert await state.get_many(["summary:a:1", "summary:b:1", "missing"]) == ["x", "y", None]
+        await asyncio.sleep(0.1)
+        assert await state.get("summary:b:1") is None
+        assert [await state.incr("n") for _ in range(3)] == [1, 2, 3]
+        assert await state.delete_prefix("summary:") == 1
+        assert await state.get("other") == "z"
+        await state.close()
+
+    asyncio.run(run())
+
+def test_leases(state):
+    async def run():
+        token = await state.acquire_lease("job:1", 10)
+        assert token is not None
+        assert await state.acquire_lease("job:1", 10) is None
+        # Only the holder's token releases it
+        await state.release_lease("job:1", "someone else")
+        assert await state.acquire_lease("job:1", 10) is None
+        await state.release_lease("job:1", token)
+        assert await state.acquire_lease("job:1", 0.05) is not None
+        await asyncio.sleep(0.1)
+        assert await state.acquire_lease("job:1", 10) is not None
+        await state.close()
+
+    asyncio.run(run())
+
+def test_token_buckets(state):
+    async def run():
+        assert await state.take_tokens("bucket", 2, capacity=2, rate=1) == 0
+        wait = await state.take_tokens("bucket", 1, capacity=2, rate=1)
+        assert 0 < wait <= 1
+        await state.adjust_bucket("bucket", capacity=2, rate=1, credit=1)
+        assert await state.take_tokens("bucket", 1, capacity=2, rate=1) == 0
+        await state.close()
+
+    asyncio.run(run())
+
+def test_cached_summary_is_shared_between_workers(tmp_path, mock_db):
+    async def run():
+        async with workers(tmp_path) as (first, second):
+            cache_a, cache_b = SummaryCache(state=first), SummaryCache(state=second)
+            await cache_a.set("v1:3:r:standard", "v1", "Summary", "3", "model-a")
+            assert await cache_b.get("v1:3:r:standard") == ("Summary", "model-a")
+            assert cache_b.shared_hits == 1 and cache_b.db_hits == 0
+
+            await cache_b.invalidate("v1")
+            assert await cache_a.get_shared("v1:3:r:standard") is None
+
+    asyncio.run(run())
+
+def test_single_flight_lease_coalesces_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_POLL_SECONDS", 0.01)
+    runs = []
+    # Stands in for the summary cache both workers read
+    stored = {}
+
+    async def summarize():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        stored["v1"] = "summary"
+        return "summary"
+
+    async def lookup():
+        return stored.get("v1")
+
+    async def run():
+        async with workers(tmp_path) as (first, second):
+            flights_a, flights_b = SingleFlight(first), SingleFlight(second)
+            results = await asyncio.gather(
+                flights_a.do("v1", summarize, lookup),
+                flights_b.do("v1", summarize, lookup),
+            )
+            assert results == ["summary", "summary"]
+            assert len(runs) == 1
+            assert flights_a.remote_waits + flights_b.remote_waits == 1
+            # The lease is released afterwards
+            assert await second.acquire_lease("flight:v1", 1) is not None
+
+    asyncio.run(run())
+
+def test_rate_limit_budget_is_shared_between_workers(tmp_path):
+    async def run():
+        async with workers(tmp_path) as (first, second):
+            bucket_a = TokenBucket(6, "llm:test:requests", state=first)
+            bucket_b = TokenBucket(6, "llm:test:requests", state=second)
+            for bucket in (bucket_a, bucket_b, bucket_a, bucket_b, bucket_a, bucket_b):
+                await asyncio.wait_for(bucket.acquire(), 1)
+            # Six per minute between them: the seventh request waits about ten seconds
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(bucket_b.acquire(), 0.2)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(bucket_a.acquire(), 0.2)
+
+    asyncio.run(run())
+
+def test_collection_versions_are_shared_between_workers(tmp_path):
+    async def run():
+        async with workers(tmp_path) as (first, second):
+            versions_a, versions_b = CollectionVersions(first), CollectionVersions(second)
+            await versions_a.start()
+            await versions_b.start()
+            tag = await versions_a.tag(Bookmark)
+            assert await versions_b.tag(Bookmark) == tag
+
+            await versions_a.bump(Bookmark)
+            assert await versions_b.get(Bookmark) == 1
+            assert await versions_b.tag(Bookmark) == await versions_a.tag(Bookmark) != tag
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_run():
+    async def run():
+        flights = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert len(runs) == 1
+        assert flights.stats()["coalesced"] == 4
+        assert flights.stats()["in_flight"] == 0
+
+        # A later call runs again
+        await flights.do("key", work)
+        assert len(runs) == 2
+
+    asyncio.run(run())
+
+def test_errors_reach_every_caller():
+    async def run():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flights.stats()["errors"] == 1
+
+    asyncio.run(run())
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def run():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "result"
+
+    asyncio.run(run())
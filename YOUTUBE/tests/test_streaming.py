@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import http_client, router
+from app.crud import stream_openai_request
+from app.http_client import http
+
+class Body(httpx.AsyncByteStream):
+    """
+    SSE body that records whether the consumer closed it
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for line in self.lines:
+            self.sent += 1
+            yield (line + "\n").encode()
+
+    async def aclose(self):
+        self.closed = True
+
+def delta(text: str) -> str:
+    return "data: " + json.dumps({"choices": [{"delta": {"content": text}}]})
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(http_client, "retry_delay", lambda attempt, retry_after=None: 0)
+
+    def install(*responses):
+        calls = []
+
+        def handler(request):
+            calls.append(json.loads(request.content))
+            return responses[min(len(calls), len(responses)) - 1]()
+
+        http.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return calls
+
+    yield install
+    asyncio.run(http_client.close_http_client())
+
+def collect(agen, take=None):
+    async def run():
+        parts = []
+        async for part in agen:
+            parts.append(part)
+            if take is not None and len(parts) == take:
+                await agen.aclose()
+                break
+        return parts
+    return asyncio.run(run())
+
+def test_deltas_are_yielded_until_done(upstream):
+    lines = [
+        ": keep-alive",
+        "data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}),
+        delta("Hel"),
+        "",
+        delta("lo"),
+        "data: [DONE]",
+        delta("ignored"),
+    ]
+    calls = upstream(lambda: httpx.Response(200, stream=Body(lines)))
+    assert collect(stream_openai_request([{"role": "user", "content": "hi"}])) == ["Hel", "lo"]
+    assert calls[0]["stream"] is True
+
+def test_stream_is_retried_before_the_first_byte(upstream):
+    calls = upstream(
+        lambda: httpx.Response(429, headers={"Retry-After": "1"}),
+        lambda: httpx.Response(200, stream=Body([delta("ok"), "data: [DONE]"]))
+    )
+    assert collect(stream_openai_request([])) == ["ok"]
+    assert len(calls) == 2
+
+def test_an_upstream_error_yields_nothing(upstream):
+    upstream(lambda: httpx.Response(400, json={"error": "bad request"}))
+    assert collect(stream_openai_request([])) == []
+
+def test_closing_the_stream_early_closes_the_upstream_response(upstream):
+    body = Body([delta(str(i)) for i in range(100)] + ["data: [DONE]"])
+    upstream(lambda: httpx.Response(200, stream=body))
+    assert collect(stream_openai_request([]), take=2) == ["0", "1"]
+    assert body.closed
+    assert body.sent < 100
+
+def read_events(text: str) -> list:
+    events = []
+    for frame in text.split("\n\n"):
+        if not frame:
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_events_are_framed_as_sse(api, monkeypatch):
+    async def fake_stream(summary_data):
+        yield "token", {"text": "Hello\nworld"}
+        yield "done", {"id": "1", "url": summary_data.url, "summary": "Hello\nworld"}
+
+    monkeypatch.setattr(router, "stream_youtube_summary", fake_stream)
+    response = api("POST", "/youtube-summary/stream", json={"url": "https://youtu.be/abc"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert read_events(response.text) == [
+        ("token", {"text": "Hello\nworld"}),
+        ("done", {"id": "1", "url": "https://youtu.be/abc", "summary": "Hello\nworld"}),
+    ]
+
+def test_a_failure_mid_stream_ends_with_an_error_event(api, monkeypatch):
+    async def failing_stream(summary_data):
+        yield "token", {"text": "Hel"}
+        raise RuntimeError("transcript service down")
+
+    monkeypatch.setattr(router, "stream_youtube_summary", failing_stream)
+    response = api("POST", "/youtube-summary/stream", json={"url": "https://youtu.be/abc"})
+    assert read_events(response.text) == [
+        ("token", {"text": "Hel"}),
+        ("error", {"detail": "transcript service down"}),
+    ]
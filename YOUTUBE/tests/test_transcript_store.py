@@ -0,0 +1,49 @@
+import asyncio
+import zlib
+
+import pytest
+
+from app import transcripts
+from app.schema import Transcript
+from app.transcripts import compress_segments, decompress_segments, get_transcript_segments, transcript_key
+
+SEGMENTS = [{"text": f"line {i} ünïcode", "start": i * 2.5, "duration": 2.5} for i in range(200)]
+
+@pytest.fixture
+def fetched(monkeypatch):
+    calls = []
+
+    async def fetch(video_id, language):
+        calls.append((video_id, language))
+        return SEGMENTS if video_id != "missing" else None
+
+    monkeypatch.setattr(transcripts, "fetch_youtube_transcript_segments", fetch)
+    return calls
+
+def test_segments_round_trip_compressed():
+    codec, blob = compress_segments(SEGMENTS)
+    assert codec in ("zstd", "zlib")
+    assert len(blob) < len(repr(SEGMENTS)) // 4
+    assert decompress_segments(codec, blob) == SEGMENTS
+
+def test_zlib_blobs_stay_readable():
+    codec, blob = "zlib", zlib.compress(b'[{"text":"hi","start":0}]')
+    assert decompress_segments(codec, blob) == [{"text": "hi", "start": 0}]
+    with pytest.raises(ValueError):
+        decompress_segments("lz4", blob)
+
+def test_transcripts_are_fetched_once_per_video_and_language(mock_db, fetched):
+    async def run():
+        assert await get_transcript_segments("abc", "en") == SEGMENTS
+        assert await get_transcript_segments("abc", "en") == SEGMENTS
+        assert await get_transcript_segments("abc", "de") == SEGMENTS
+        return {t.key: t for t in await mock_db.find(Transcript)}
+
+    stored = asyncio.run(run())
+    assert fetched == [("abc", "en"), ("abc", "de")]
+    assert set(stored) == {transcript_key("abc", "en"), transcript_key("abc", "de")} == {"abc:en", "abc:de"}
+    assert (stored["abc:en"].video_id, stored["abc:en"].language, stored["abc:en"].segment_count) == ("abc", "en", len(SEGMENTS))
+
+def test_missing_transcripts_are_not_stored(mock_db, fetched):
+    assert asyncio.run(get_transcript_segments("missing", "en")) is None
+    assert asyncio.run(mock_db.find(Transcript)) == []
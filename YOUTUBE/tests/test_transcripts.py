@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+import pytest
+
+from app import transcripts
+from app.transcripts import TranscriptProvider, YouTubeTranscriptProvider, compress_segments, decompress_segments
+
+def test_compressed_segments_round_trip():
+    segments = [{"text": "héllo", "start": 0.0, "duration": 1.5}, {"text": "world", "start": 1.5, "duration": 2.0}]
+    codec, blob = compress_segments(segments)
+    assert decompress_segments(codec, blob) == segments
+
+def test_timed_out_call_keeps_its_slot_until_the_thread_finishes(monkeypatch):
+    def get_transcript(video_id, languages):
+        time.sleep(0.3 if video_id == "slow" else 0)
+        return [{"text": video_id, "start": 0, "duration": 1}]
+
+    monkeypatch.setattr(transcripts.YouTubeTranscriptApi, "get_transcript", staticmethod(get_transcript))
+
+    async def run():
+        provider = YouTubeTranscriptProvider(workers=1, timeout=0.1, rate=0)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await provider.fetch("slow", "en")
+            # The thread is still busy, so the slot is still taken
+            assert provider.slots.locked()
+            # Waits for the slot, not in the executor queue, so its timeout covers only its own call
+            assert (await provider.fetch("fast", "en"))[0]["text"] == "fast"
+            assert not provider.slots.locked()
+        finally:
+            await provider.close()
+
+    asyncio.run(run())
+
+def test_providers_must_implement_fetch():
+    class Incomplete(TranscriptProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        TranscriptProvider()
+    with pytest.raises(TypeError):
+        Incomplete()